@@ -1,20 +1,27 @@
 import openpyxl
+import tempfile
 from datetime import datetime
 
+from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.admin import SimpleListFilter
-from django.http import HttpResponse
+from django.db.models import Count
+from django.http import FileResponse
 from django.shortcuts import redirect
 from django.template.response import TemplateResponse
 from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 from budgie_user.mixins import BudgieUserMixin
 from .forms import BirdForm
-from .mixins import AdminExportCsvMixin, AdminExportAllCsvMixin
+from .mixins import EXPORT_CHUNK_SIZE, AdminExportCsvMixin, AdminExportAllCsvMixin
 from .models import Bird, Breeder, ColorProperty, BirdProxy, BirdPhoto
 from .pdf_helper import render_bird_tree_pdf
+from .services.facet_cache import FacetCacheChangeList, invalidate_facet_counts
+from .services.pedigree_loader import PedigreeLoader
+from .services.thumbnails import thumbnail_or_original_url, thumbnail_url
 
 
 class BirdPhotoInline(admin.StackedInline):
@@ -22,31 +29,71 @@ class BirdPhotoInline(admin.StackedInline):
     extra = 1
 
 
-class BirdFatherFilter(SimpleListFilter):
-    title = _("father")
-    parameter_name = "father"
+class BirdParentFilter(SimpleListFilter):
+    """
+    Filter on a parent, only offering the users' birds that actually have
+    offspring through ``parameter_name`` (father or mother).
+    """
+
+    offspring_relation = None
 
     def lookups(self, request, model_admin):
-        males = Bird.objects.filter(gender=Bird.Gender.MALE)
-        return [(b.pk, str(b)) for b in males]
+        birds = Bird.objects.all()
+        if not request.user.is_superuser:
+            birds = birds.filter(user=request.user)
+        return (
+            birds.annotate(offspring=Count(self.offspring_relation))
+            .filter(offspring__gt=0)
+            .order_by("ring_number")
+            .values_list("pk", "ring_number")
+        )
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(father__pk=self.value())
+            return queryset.filter(
+                **{"{}__pk".format(self.parameter_name): self.value()}
+            )
         return queryset
 
 
-class BirdMotherFilter(SimpleListFilter):
+class BirdFatherFilter(BirdParentFilter):
+    title = _("father")
+    parameter_name = "father"
+    offspring_relation = "ancestor_father"
+
+
+class BirdMotherFilter(BirdParentFilter):
     title = _("mother")
     parameter_name = "mother"
+    offspring_relation = "ancestor_mother"
+
+
+class BirdInbreedingFilter(SimpleListFilter):
+    title = _("Inbreeding")
+    parameter_name = "inbreeding"
+
+    # Half-siblings give 6.25%, full siblings or parent and child 25%
+    coefficient_filters = {
+        "none": {"inbreeding_coefficient": 0},
+        "low": {"inbreeding_coefficient__gt": 0, "inbreeding_coefficient__lt": 0.0625},
+        "moderate": {
+            "inbreeding_coefficient__gte": 0.0625,
+            "inbreeding_coefficient__lt": 0.125,
+        },
+        "high": {"inbreeding_coefficient__gte": 0.125},
+    }
 
     def lookups(self, request, model_admin):
-        males = Bird.objects.filter(gender=Bird.Gender.FEMALE)
-        return [(b.pk, str(b)) for b in males]
+        return [
+            ("none", _("Not inbred")),
+            ("low", _("Below 6.25 percent")),
+            ("moderate", _("6.25 to 12.5 percent")),
+            ("high", _("12.5 percent or more")),
+        ]
 
     def queryset(self, request, queryset):
-        if self.value():
-            return queryset.filter(mother__pk=self.value())
+        if self.value() in self.coefficient_filters:
+            return queryset.filter(**self.coefficient_filters[self.value()])
         return queryset
 
 
@@ -58,6 +105,7 @@ class BirdAdmin(
 
     inlines = [BirdPhotoInline]
 
+    # Every column reads fields of the bird itself, so rows don't cost queries
     list_display = [
         "ring_number",
         "gender",
@@ -66,6 +114,7 @@ class BirdAdmin(
         "split_props",
         "date_of_birth",
         "current_age",
+        "inbreeding",
         "image_tag",
         "family_tree",
     ]
@@ -76,12 +125,13 @@ class BirdAdmin(
         "split_property",
         BirdFatherFilter,
         BirdMotherFilter,
+        BirdInbreedingFilter,
         "is_owned",
         "is_for_sale",
     ]
-    search_fields = ["ring_number", "gender"]
+    search_fields = ["ring_number", "gender", "color_description"]
     search_help_text = _(
-        "Search for ring numbers. "
+        "Search for ring numbers or colors. "
         "You can also narrow down your search using the filters on the right."
     )
     date_hierarchy = "date_of_birth"
@@ -158,6 +208,17 @@ class BirdAdmin(
         ]
         return additional_bird_admin_urls + urls
 
+    def get_changelist(self, request, **kwargs):
+        return FacetCacheChangeList
+
+    def _update_birds(self, queryset, **values):
+        # Updates on a queryset don't send the signals that invalidate the facet
+        # counts. The users are read first, the update can empty a filtered queryset.
+        user_ids = set(queryset.values_list("user_id", flat=True).distinct())
+        queryset.update(**values)
+        for user_id in user_ids:
+            invalidate_facet_counts(user_id)
+
     def get_readonly_fields(self, request, obj=None):
         """
         This makes sure the admin doesn't give away the other usernames to non-admins.
@@ -169,10 +230,18 @@ class BirdAdmin(
     @admin.display(description=_("Photo"))
     def image_tag(self, obj):
         """Render the image tag of the birds photo"""
-        return mark_safe(
-            '<img src="{}" height="48" class="birdpreview" />'.format(obj.photo.url)
+        # The original is shown until `manage.py generate_thumbnails` has run
+        return format_html(
+            '<img src="{}" height="48" class="birdpreview" '
+            "onerror=\"this.onerror=null; this.src='{}';\" />",
+            thumbnail_url(obj.photo, "changelist"),
+            obj.photo.url,
         )
 
+    @admin.display(description=_("Inbreeding"), ordering="inbreeding_coefficient")
+    def inbreeding(self, obj):
+        return "{:.2f}%".format(obj.inbreeding_coefficient * 100)
+
     @admin.display(description=_("Age"))
     def current_age(self, obj):
         """Calculate the age of the bird"""
@@ -215,17 +284,17 @@ class BirdAdmin(
             )
         )
 
-    @admin.display(description=_("Color properties"))
+    @admin.display(description=_("Color properties"), ordering="color_property_names")
     def color_props(self, obj):
-        return obj.color_props()
+        return obj.color_property_names
 
-    @admin.display(description=_("Split properties"))
+    @admin.display(description=_("Split properties"), ordering="split_property_names")
     def split_props(self, obj):
-        return obj.split_props()
+        return obj.split_property_names
 
     @admin.action(description=_("Mark as owned"))
     def mark_as_owned(self, request, queryset):
-        queryset.update(is_owned=True)
+        self._update_birds(queryset, is_owned=True)
         messages.add_message(
             request, messages.SUCCESS, _("Selected birds are marked as owned")
         )
@@ -239,21 +308,30 @@ class BirdAdmin(
         return self._export_family_tree_pdf(queryset, include_notes=True)
 
     def _export_family_tree_pdf(self, queryset, include_notes):
-        pdf = render_bird_tree_pdf(
-            queryset.select_related("father", "mother"), include_notes=include_notes
-        )
-        response = HttpResponse(pdf, content_type="application/pdf")
-        if queryset.count() == 1:
-            bird = queryset.first()
-            safe_name = "{}-family-tree.pdf".format(bird.ring_number or bird.pk)
-            response["Content-Disposition"] = 'attachment; filename="{}"'.format(
-                safe_name.replace("/", "_")
-            )
+        birds = list(queryset)
+        if len(birds) == 1:
+            filename = "{}-family-tree.pdf".format(birds[0].ring_number or birds[0].pk)
         else:
-            response["Content-Disposition"] = (
-                'attachment; filename="bird-family-trees.pdf"'
-            )
-        return response
+            filename = "bird-family-trees.pdf"
+        return self._family_tree_pdf_response(birds, include_notes, filename)
+
+    def _family_tree_pdf_response(self, birds, include_notes, filename):
+        # The response streams the file and closes (and so removes) it afterwards
+        pdf_file = tempfile.TemporaryFile()
+        render_bird_tree_pdf(
+            birds,
+            include_notes=include_notes,
+            processes=settings.PDF_RENDER_PROCESSES,
+            output=pdf_file,
+        )
+        pdf_file.seek(0)
+
+        return FileResponse(
+            pdf_file,
+            as_attachment=True,
+            filename=filename.replace("/", "_"),
+            content_type="application/pdf",
+        )
 
     def _get_bird_for_family_tree(self, request, object_id):
         try:
@@ -267,25 +345,33 @@ class BirdAdmin(
         if bird is None:
             return redirect(reverse("admin:budgie_bird_bird_changelist"))
 
-        pdf = render_bird_tree_pdf(
-            Bird.objects.filter(pk=bird.pk).select_related("father", "mother"),
-            include_notes=include_notes,
-        )
-        response = HttpResponse(pdf, content_type="application/pdf")
-        safe_name = "{}-family-tree.pdf".format(bird.ring_number or bird.pk)
-        response["Content-Disposition"] = 'attachment; filename="{}"'.format(
-            safe_name.replace("/", "_")
+        return self._family_tree_pdf_response(
+            [bird],
+            include_notes,
+            "{}-family-tree.pdf".format(bird.ring_number or bird.pk),
         )
-        return response
 
     @admin.action(description=_("Mark as for sale"))
     def mark_as_for_sale(self, request, queryset):
-        queryset.update(is_for_sale=True)
+        self._update_birds(queryset, is_for_sale=True)
         messages.add_message(
             request, messages.SUCCESS, _("Selected birds are marked as for sale")
         )
 
-    def convert_bird_to_treantjs_data(self, bird):
+    def convert_bird_to_treantjs_data(
+        self, bird, loader=None, lineage=frozenset(), photo_urls=None
+    ):
+        if loader is None:
+            loader = PedigreeLoader()
+            bird = loader.load([bird])[0]
+        if photo_urls is None:
+            photo_urls = {}
+
+        # Photos uploaded before the thumbnails existed are shown as they are.
+        # Many birds have the same (default) photo, so it is looked up once.
+        if bird.photo.name not in photo_urls:
+            photo_urls[bird.photo.name] = thumbnail_or_original_url(bird.photo, "tree")
+
         tree_data = {
             "HTMLclass": "pyBudgie_{}".format(bird.gender),
             "text": {
@@ -293,14 +379,18 @@ class BirdAdmin(
                 "desc": "{}: {}".format(_("Date of birth"), bird.date_of_birth or ""),
                 "contact": bird.descriptive_color(),
             },
-            "image": bird.photo.url,
+            "image": photo_urls[bird.photo.name],
         }
 
         children = []
-        if bird.father:
-            children.append(self.convert_bird_to_treantjs_data(bird.father))
-        if bird.mother:
-            children.append(self.convert_bird_to_treantjs_data(bird.mother))
+        lineage = lineage | {bird.pk}
+        for parent in loader.parents(bird):
+            if parent and parent.pk not in lineage:
+                children.append(
+                    self.convert_bird_to_treantjs_data(
+                        parent, loader, lineage, photo_urls
+                    )
+                )
 
         if children:
             tree_data["children"] = children
@@ -313,10 +403,16 @@ class BirdAdmin(
         if bird is None:
             return redirect(reverse("admin:budgie_bird_bird_changelist"))
 
+        loader = PedigreeLoader()
+        bird = loader.load([bird])[0]
         context = dict(
             self.admin_site.each_context(request),  # Common admin things
             bird=bird,
-            family_tree_data=mark_safe(self.convert_bird_to_treantjs_data(bird)),
+            inbreeding=self.inbreeding(bird),
+            family_tree_data=mark_safe(
+                self.convert_bird_to_treantjs_data(bird, loader)
+            ),
+            inbreed_tree_data=mark_safe(bird.family_tree_for_inbreed(loader)),
         )
         return TemplateResponse(
             request, "budgie_bird/admin/bird_familytree.html", context
@@ -372,147 +468,70 @@ class ExportBirdAdmin(admin.ModelAdmin):
                 request, "budgie_bird/admin/bird_export.html", context
             )
 
-        queryset = self.model.objects.filter(user=request.user)
+        queryset = self.model.objects.filter(user=request.user).select_related(
+            "father", "mother", "breeder", "owner"
+        )
 
-        # Maak een nieuw Excel-werkboek en werkblad
-        excel_workbook = openpyxl.Workbook()
-        excel_sheet = excel_workbook.active
+        # Write-only workbooks keep the rows on disk instead of in memory
+        excel_workbook = openpyxl.Workbook(write_only=True)
+        excel_sheet = excel_workbook.create_sheet()
 
         # Definieer de veldnamen/headers
-        headers = [
-            "Ringnummer",
-            "Kleur",
-            "Kleurcategorie",
-            "Kleurslagen",
-            "Split voor",
-            "Vader",
-            "Moeder",
-            "Geboren",
-            "Kweker",
-            "Eigenaar",
-            "Geslacht",
-            "In bezit",
-            "Te Koop",
-            "Notities",
-        ]
-
-        # Headers
-        for col_num, header in enumerate(headers, 1):
-            excel_sheet.cell(row=1, column=col_num, value=header)
+        excel_sheet.append(
+            [
+                "Ringnummer",
+                "Kleur",
+                "Kleurcategorie",
+                "Kleurslagen",
+                "Split voor",
+                "Vader",
+                "Moeder",
+                "Geboren",
+                "Kweker",
+                "Eigenaar",
+                "Geslacht",
+                "In bezit",
+                "Te Koop",
+                "Notities",
+            ]
+        )
 
         # Bird data
-        for row_num, bird in enumerate(queryset, 2):
-            column_num = 0
-
-            # Ring number
-            column_num += 1
-            excel_sheet.cell(row=row_num, column=column_num, value=bird.ring_number)
-
-            # Color name full-out
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num, column=column_num, value=bird.descriptive_color()
-            )
-
-            # Color (catalog) category
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num, column=column_num, value=bird.get_color_display()
-            )
-
-            # Color properties
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=bird.color_props(),
-            )
-
-            # Split properties
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=bird.split_props(),
-            )
-
-            # Father
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=self.get_model_string_or_empty(bird.father),
-            )
-
-            # Mother
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=self.get_model_string_or_empty(bird.mother),
+        for bird in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            excel_sheet.append(
+                [
+                    bird.ring_number,
+                    bird.descriptive_color(),
+                    bird.get_color_display(),
+                    bird.color_property_names,
+                    bird.split_property_names,
+                    self.get_model_string_or_empty(bird.father),
+                    self.get_model_string_or_empty(bird.mother),
+                    bird.date_of_birth,
+                    self.get_model_string_or_empty(bird.breeder),
+                    self.get_model_string_or_empty(bird.owner),
+                    bird.get_gender_display(),
+                    str(self.get_value_yes_no(bird.is_owned)),
+                    str(self.get_value_yes_no(bird.is_for_sale)),
+                    bird.notes,
+                ]
             )
 
-            # Date of birth
-            column_num += 1
-            excel_sheet.cell(row=row_num, column=column_num, value=bird.date_of_birth)
+        # The response streams the file and closes (and so removes) it afterwards
+        export_file = tempfile.TemporaryFile()
+        excel_workbook.save(export_file)
+        export_file.seek(0)
 
-            # Breeder
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=self.get_model_string_or_empty(bird.breeder),
-            )
-
-            # Owner
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=self.get_model_string_or_empty(bird.owner),
-            )
-
-            # Sex
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num, column=column_num, value=bird.get_gender_display()
-            )
-
-            # Is this bird owned by the account holder?
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=str(self.get_value_yes_no(bird.is_owned)),
-            )
-
-            # Is this bird for sale?
-            column_num += 1
-            excel_sheet.cell(
-                row=row_num,
-                column=column_num,
-                value=str(self.get_value_yes_no(bird.is_for_sale)),
-            )
-
-            # Notes about the bird
-            column_num += 1
-            excel_sheet.cell(row=row_num, column=column_num, value=bird.notes)
-
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = (
-            "attachment; filename={filename}-{timestamp}.xlsx".format(
+        return FileResponse(
+            export_file,
+            as_attachment=True,
+            filename="{filename}-{timestamp}.xlsx".format(
                 filename=_("bird_export"),
                 timestamp=str(datetime.now().strftime("%Y-%m-%d")),
-            )
+            ),
+            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
 
-        # Save this Excel workbook to the response
-        excel_workbook.save(response)
-
-        return response
-
     def get_urls(self):
         urls = super().get_urls()
         my_urls = [
@@ -6,3 +6,6 @@ class BudgieBirdConfig(AppConfig):
     default_auto_field = "django.db.models.AutoField"
     name = "budgie_bird"
     verbose_name = _("Bird Administration")
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,50 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from budgie_bird.models import Bird
+from budgie_bird.pdf_helper import page_texts, render_bird_tree_pdf
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare drawing the family tree PDF of many birds in one process "
+        "with drawing it in several processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only export the birds of this username")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes, defaults to the number of CPUs",
+        )
+        parser.add_argument(
+            "--include-notes", action="store_true", help="Export with the notes"
+        )
+
+    def handle(self, *args, **options):
+        birds = Bird.objects.order_by("pk")
+        if options["user"]:
+            birds = birds.filter(user__username=options["user"])
+        birds = list(birds)
+
+        results = []
+        for processes in (1, options["processes"]):
+            start = time.perf_counter()
+            pdf = render_bird_tree_pdf(
+                birds, include_notes=options["include_notes"], processes=processes
+            )
+            elapsed = time.perf_counter() - start
+            results.append(pdf)
+            self.stdout.write(
+                "{} process(es): {} page(s) in {:.2f}s, {:.0f} KB".format(
+                    processes, len(birds), elapsed, len(pdf) / 1024
+                )
+            )
+
+        self.stdout.write(
+            "Same pages: {}".format(page_texts(results[0]) == page_texts(results[1]))
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from budgie_bird.models import Bird, BirdPhoto
+from budgie_bird.services.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the thumbnails of the bird photos that don't have them yet, "
+        "new uploads get them when they are saved"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Make the thumbnails again, also when they already exist",
+        )
+
+    def handle(self, *args, **options):
+        photos = {}
+        for bird in Bird.objects.only("photo").iterator():
+            photos.setdefault(bird.photo.name, bird.photo)
+        for bird_photo in BirdPhoto.objects.only("image").iterator():
+            photos.setdefault(bird_photo.image.name, bird_photo.image)
+
+        generated = 0
+        for name, image_file in photos.items():
+            if generate_thumbnails(image_file, force=options["force"]):
+                generated += 1
+                self.stdout.write("{}: thumbnails made".format(name))
+        self.stdout.write(
+            "Made the thumbnails of {} of {} photo(s)".format(generated, len(photos))
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from budgie_bird.models import Bird
+from budgie_bird.services.color_cache import refresh_color_cache
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_user.models import BudgieUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the color notation of all birds again, after changes that skip "
+        "the signals, like update() or bulk_update() of birds or color properties"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", help="Only rebuild the birds of this username"
+        )
+
+    def handle(self, *args, **options):
+        users = BudgieUser.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(username__in=options["user"])
+
+        for user in users:
+            updated = refresh_color_cache(Bird.objects.filter(user=user))
+            invalidate_facet_counts(user.pk)
+            self.stdout.write(
+                "{}: updated the color notation of {} bird(s)".format(user, updated)
+            )
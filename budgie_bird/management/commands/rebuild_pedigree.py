@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from budgie_bird.models import Bird
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_bird.services.inbreeding import update_inbreeding_coefficients
+from budgie_bird.services.pedigree import rebuild_ancestor_links
+from budgie_user.models import BudgieUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized pedigree (ancestor table) and the inbreeding "
+        "coefficients of all birds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", help="Only rebuild the birds of this username"
+        )
+
+    def handle(self, *args, **options):
+        users = BudgieUser.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(username__in=options["user"])
+
+        for user in users:
+            bird_ids = Bird.objects.filter(user=user).values_list("pk", flat=True)
+            rebuilt = rebuild_ancestor_links(bird_ids)
+            update_inbreeding_coefficients(rebuilt)
+            invalidate_facet_counts(user.pk)
+            self.stdout.write(
+                "{}: rebuilt the pedigree of {} bird(s)".format(user, len(rebuilt))
+            )
@@ -0,0 +1,114 @@
+import os
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from budgie_bird.models import Bird
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_bird.services.kinship import inbreeding_coefficient_array
+from budgie_user.models import BudgieUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the inbreeding coefficients of all birds, "
+        "the flocks of different users are calculated in parallel"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", help="Only recompute the birds of this username"
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes, defaults to the number of CPUs",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of birds per database update",
+        )
+
+    def load_graph(self, user):
+        """The whole pedigree of a flock as compact arrays, in a single query"""
+        bird_ids, father_ids, mother_ids = array("q"), array("q"), array("q")
+        stored = array("d")
+        rows = (
+            Bird.objects.filter(user=user)
+            .order_by("pk")
+            .values_list("pk", "father_id", "mother_id", "inbreeding_coefficient")
+        )
+        for bird_id, father_id, mother_id, coefficient in rows.iterator():
+            bird_ids.append(bird_id)
+            father_ids.append(father_id or 0)
+            mother_ids.append(mother_id or 0)
+            stored.append(coefficient)
+        return (bird_ids, father_ids, mother_ids), stored
+
+    def save_flock(self, user, graph, stored, coefficients, batch_size):
+        changed = [
+            Bird(pk=bird_id, inbreeding_coefficient=coefficient)
+            for bird_id, coefficient, old in zip(graph[0], coefficients, stored)
+            if coefficient != old
+        ]
+        with transaction.atomic():
+            Bird.objects.bulk_update(
+                changed, ["inbreeding_coefficient"], batch_size=batch_size
+            )
+        invalidate_facet_counts(user.pk)
+        self.stdout.write(
+            "{}: {} bird(s), {} updated".format(user, len(graph[0]), len(changed))
+        )
+        return len(graph[0])
+
+    def handle(self, *args, **options):
+        users = BudgieUser.objects.order_by("pk")
+        if options["user"]:
+            users = users.filter(username__in=options["user"])
+
+        start = time.perf_counter()
+        total = 0
+        processes = options["processes"]
+        # One flock at a time is loaded, as many are calculated as there are
+        # processes. The calculation (in kinship) doesn't use Django, so the
+        # workers can be started in any way, also without forking this process.
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                pending = deque()
+                for user in users.iterator():
+                    graph, stored = self.load_graph(user)
+                    future = executor.submit(inbreeding_coefficient_array, *graph)
+                    pending.append((user, graph, stored, future))
+                    if len(pending) > processes:
+                        user, graph, stored, future = pending.popleft()
+                        total += self.save_flock(
+                            user, graph, stored, future.result(), options["batch_size"]
+                        )
+                for user, graph, stored, future in pending:
+                    total += self.save_flock(
+                        user, graph, stored, future.result(), options["batch_size"]
+                    )
+        else:
+            for user in users.iterator():
+                graph, stored = self.load_graph(user)
+                total += self.save_flock(
+                    user,
+                    graph,
+                    stored,
+                    inbreeding_coefficient_array(*graph),
+                    options["batch_size"],
+                )
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            "Recomputed {} bird(s) in {:.2f}s ({:.0f} birds/s)".format(
+                total, elapsed, total / elapsed if elapsed else total
+            )
+        )
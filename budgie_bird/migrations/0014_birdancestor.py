@@ -0,0 +1,155 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from collections import defaultdict, deque
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of the services at the time of this migration, so later
+# changes to them don't change what this migration does
+MAX_PEDIGREE_DEPTH = 64
+SIDES = ("father", "mother")
+
+
+def topological_order(parents):
+    """Parents before their children, birds in a loop at the end"""
+    children = defaultdict(list)
+    pending = {}
+    for bird_id, parent_ids in parents.items():
+        known_parents = {
+            parent_id
+            for parent_id in parent_ids
+            if parent_id in parents and parent_id != bird_id
+        }
+        pending[bird_id] = len(known_parents)
+        for parent_id in known_parents:
+            children[parent_id].append(bird_id)
+
+    queue = deque(bird_id for bird_id, count in pending.items() if not count)
+    order = []
+    while queue:
+        bird_id = queue.popleft()
+        order.append(bird_id)
+        for child_id in children[bird_id]:
+            pending[child_id] -= 1
+            if not pending[child_id]:
+                queue.append(child_id)
+
+    ordered = set(order)
+    order.extend(bird_id for bird_id in parents if bird_id not in ordered)
+    return order
+
+
+def build_ancestor_links(parents):
+    """{id: {(ancestor_id, depth, side)}} for every bird in ``parents``"""
+    links = {}
+    result = {}
+    for bird_id in topological_order(parents):
+        rows = set()
+        for side, parent_id in zip(SIDES, parents[bird_id]):
+            if parent_id is None or parent_id == bird_id:
+                continue
+            rows.add((parent_id, 1, side))
+            for ancestor_id, depth in links.get(parent_id, ()):
+                if ancestor_id != bird_id and depth < MAX_PEDIGREE_DEPTH:
+                    rows.add((ancestor_id, depth + 1, side))
+        result[bird_id] = rows
+        links[bird_id] = {(ancestor_id, depth) for ancestor_id, depth, _ in rows}
+    return result
+
+
+def fill_pedigree(apps, schema_editor):
+    Bird = apps.get_model("budgie_bird", "Bird")
+    BirdAncestor = apps.get_model("budgie_bird", "BirdAncestor")
+
+    parents = {
+        bird_id: (father_id, mother_id)
+        for bird_id, father_id, mother_id in Bird.objects.values_list(
+            "pk", "father_id", "mother_id"
+        )
+    }
+    links = build_ancestor_links(parents)
+    BirdAncestor.objects.bulk_create(
+        (
+            BirdAncestor(
+                bird_id=bird_id, ancestor_id=ancestor_id, depth=depth, side=side
+            )
+            for bird_id, rows in links.items()
+            for ancestor_id, depth, side in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_bird", "0013_alter_birdphoto_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BirdAncestor",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "depth",
+                    models.PositiveSmallIntegerField(
+                        help_text="1 is a parent, 2 a grandparent",
+                        verbose_name="Generation",
+                    ),
+                ),
+                (
+                    "side",
+                    models.CharField(
+                        choices=[("father", "father"), ("mother", "mother")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="budgie_bird.bird",
+                    ),
+                ),
+                (
+                    "bird",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="budgie_bird.bird",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Pedigree link",
+                "verbose_name_plural": "Pedigree links",
+                "indexes": [
+                    models.Index(
+                        fields=["bird", "depth"], name="budgie_bird_bird_id_1f3d4c_idx"
+                    ),
+                    models.Index(
+                        fields=["ancestor", "depth"],
+                        name="budgie_bird_ancesto_374f23_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("bird", "ancestor", "depth", "side"),
+                        name="unique_bird_ancestor_path",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_pedigree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,129 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from collections import defaultdict, deque
+
+from django.db import migrations, models
+
+# A frozen copy of the services at the time of this migration, so later
+# changes to them don't change what this migration does
+
+
+def topological_order(parents):
+    """Parents before their children, birds in a loop at the end"""
+    children = defaultdict(list)
+    pending = {}
+    for bird_id, parent_ids in parents.items():
+        known_parents = {
+            parent_id
+            for parent_id in parent_ids
+            if parent_id in parents and parent_id != bird_id
+        }
+        pending[bird_id] = len(known_parents)
+        for parent_id in known_parents:
+            children[parent_id].append(bird_id)
+
+    queue = deque(bird_id for bird_id, count in pending.items() if not count)
+    order = []
+    while queue:
+        bird_id = queue.popleft()
+        order.append(bird_id)
+        for child_id in children[bird_id]:
+            pending[child_id] -= 1
+            if not pending[child_id]:
+                queue.append(child_id)
+
+    ordered = set(order)
+    order.extend(bird_id for bird_id in parents if bird_id not in ordered)
+    return order
+
+
+def inbreeding_coefficients(parents):
+    """Wright's inbreeding coefficient for every bird in ``parents``"""
+    order = topological_order(parents)
+    index = {bird_id: position for position, bird_id in enumerate(order)}
+
+    def parent_index(parent_id, position):
+        parent_position = index.get(parent_id, -1)
+        # A loop in the pedigree is cut where it points to a younger bird
+        return parent_position if parent_position < position else -1
+
+    sire = [parent_index(parents[bird_id][0], pos) for pos, bird_id in enumerate(order)]
+    dam = [parent_index(parents[bird_id][1], pos) for pos, bird_id in enumerate(order)]
+    inbreeding = [0.0] * len(order)
+    memo = {}
+
+    def lookup(a, b):
+        if a < 0 or b < 0:
+            return 0.0
+        if a == b:
+            return 0.5 * (1.0 + inbreeding[a])
+        return memo.get((a, b) if a > b else (b, a))
+
+    def kinship(a, b):
+        value = lookup(a, b)
+        if value is not None:
+            return value
+        stack = [(a, b) if a > b else (b, a)]
+        while stack:
+            key = stack[-1]
+            if key in memo:
+                stack.pop()
+                continue
+            younger, older = key
+            values = []
+            for parent in (sire[younger], dam[younger]):
+                value = lookup(parent, older)
+                if value is None:
+                    stack.append((parent, older) if parent > older else (older, parent))
+                else:
+                    values.append(value)
+            if len(values) == 2:
+                memo[key] = 0.5 * (values[0] + values[1])
+                stack.pop()
+        return lookup(a, b)
+
+    for position in range(len(order)):
+        inbreeding[position] = kinship(sire[position], dam[position])
+    return {bird_id: inbreeding[position] for bird_id, position in index.items()}
+
+
+def fill_inbreeding_coefficients(apps, schema_editor):
+    Bird = apps.get_model("budgie_bird", "Bird")
+
+    parents = {
+        bird_id: (father_id, mother_id)
+        for bird_id, father_id, mother_id in Bird.objects.values_list(
+            "pk", "father_id", "mother_id"
+        )
+    }
+    Bird.objects.bulk_update(
+        [
+            Bird(pk=bird_id, inbreeding_coefficient=coefficient)
+            for bird_id, coefficient in inbreeding_coefficients(parents).items()
+            if coefficient
+        ],
+        ["inbreeding_coefficient"],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_bird", "0014_birdancestor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bird",
+            name="inbreeding_coefficient",
+            field=models.FloatField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Calculated from the pedigree whenever the parents change",
+                verbose_name="Inbreeding coefficient",
+            ),
+        ),
+        migrations.RunPython(fill_inbreeding_coefficients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import translation
+
+# A frozen copy of the services at the time of this migration, so later
+# changes to them don't change what this migration does
+COLOR_CACHE_FIELDS = [
+    "color_property_names",
+    "split_property_names",
+    "color_description",
+]
+COLOR_CACHE_LENGTH = 255
+
+
+def describe_color(color_names, color, split_names):
+    return "{props} {color} {sep} {split}".format(
+        props=color_names,
+        color=color,
+        sep="/" if split_names else "",
+        split=split_names,
+    ).strip()
+
+
+def fill_color_cache(apps, schema_editor):
+    Bird = apps.get_model("budgie_bird", "Bird")
+
+    birds = []
+    with translation.override(settings.LANGUAGE_CODE):
+        for bird in Bird.objects.prefetch_related("color_property", "split_property"):
+            # The historical model has no methods, the choices aren't translated
+            bird.color_property_names = " ".join(
+                prop.color_name for prop in bird.color_property.all()
+            )[:COLOR_CACHE_LENGTH]
+            bird.split_property_names = " ".join(
+                prop.color_name for prop in bird.split_property.all()
+            )[:COLOR_CACHE_LENGTH]
+            color = bird.get_color_display()
+            bird.color_description = describe_color(
+                bird.color_property_names,
+                translation.gettext(color) if color else "",
+                bird.split_property_names,
+            )[:COLOR_CACHE_LENGTH]
+            birds.append(bird)
+    Bird.objects.bulk_update(birds, COLOR_CACHE_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_bird", "0015_bird_inbreeding_coefficient"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bird",
+            name="color_description",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                max_length=255,
+                verbose_name="Color description",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bird",
+            name="color_property_names",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=255,
+                verbose_name="Color properties",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bird",
+            name="split_property_names",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                max_length=255,
+                verbose_name="Split properties",
+            ),
+        ),
+        migrations.RunPython(fill_color_cache, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_bird", "0016_bird_color_cache"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["user", "father"], name="budgie_bird_user_id_f446bb_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["user", "mother"], name="budgie_bird_user_id_456618_idx"
+            ),
+        ),
+    ]
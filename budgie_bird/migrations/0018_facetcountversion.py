@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_bird", "0017_bird_parent_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FacetCountVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scope", models.CharField(max_length=20, unique=True)),
+                ("version", models.CharField(max_length=32)),
+            ],
+        ),
+    ]
@@ -4,8 +4,10 @@ from django.conf import settings
 from django.db import models
 from django.db.models import Q
 from django.db.models.functions import Lower
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 
+from budgie_bird.services.color_cache import COLOR_CACHE_LENGTH, describe_color
 from budgie_user.models import BudgieUser
 
 
@@ -126,10 +128,42 @@ class Bird(models.Model):
         default=settings.BIRD_PICTURE_DEFAULT,
         upload_to=settings.BIRD_PICTURE_UPLOAD_LOCATION,
     )
+    inbreeding_coefficient = models.FloatField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name=_("Inbreeding coefficient"),
+        help_text=_("Calculated from the pedigree whenever the parents change"),
+    )
+    # Kept up to date by signals, so the color notation can be shown without queries
+    color_property_names = models.CharField(
+        max_length=COLOR_CACHE_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name=_("Color properties"),
+    )
+    split_property_names = models.CharField(
+        max_length=COLOR_CACHE_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name=_("Split properties"),
+    )
+    color_description = models.CharField(
+        max_length=COLOR_CACHE_LENGTH,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_("Color description"),
+    )
 
     class Meta:
         ordering = ["ring_number"]
         unique_together = [["user", "ring_number"]]
+        indexes = [
+            # For the parent filters, which look up the offspring per user
+            models.Index(fields=["user", "father"]),
+            models.Index(fields=["user", "mother"]),
+        ]
         verbose_name = _("Bird")
         verbose_name_plural = _("Birds")
 
@@ -137,49 +171,147 @@ class Bird(models.Model):
         return self.ring_number
 
     def color_props(self):
-        return " ".join(
-            x.color_name for x in self.color_property.all().order_by("rank")
-        )
+        # ColorProperty is ordered by rank, also when it has been prefetched
+        return " ".join(x.color_name for x in self.color_property.all())
 
     def split_props(self):
-        return " ".join(
-            x.color_name for x in self.split_property.all().order_by("rank")
-        )
+        return " ".join(x.color_name for x in self.split_property.all())
 
     def descriptive_color(self):
-        return "{props} {color} {sep} {split}".format(
-            props=self.color_props(),
-            color=self.get_color_display(),
-            sep="/" if self.split_props() else "",
-            split=self.split_props(),
-        ).strip()
-
-    def get_ancestors(self):
-        """Recursive method to return the family tree"""
-        ancestors = {}
-        tree = {
-            "bird": self,
-            "ancestors": {
-                "father": self.father.get_ancestors() if self.father else None,
-                "mother": self.mother.get_ancestors() if self.mother else None,
-            },
-        }
-        ancestors.update(tree)
-        return ancestors
-
-    def family_tree_for_inbreed(self):
-        def _get_tree(bird):
-            if bird is None:
+        """The color notation, from the stored property names"""
+        return describe_color(
+            self.color_property_names,
+            self.get_color_display(),
+            self.split_property_names,
+        )
+
+    def update_color_names(self):
+        """
+        Store the current color and split property names, and the description
+        in the default language for sorting and searching. Returns whether
+        anything changed, the caller saves the fields.
+        """
+        old_values = (
+            self.color_property_names,
+            self.split_property_names,
+            self.color_description,
+        )
+        self.color_property_names = self.color_props()[:COLOR_CACHE_LENGTH]
+        self.split_property_names = self.split_props()[:COLOR_CACHE_LENGTH]
+        self.update_color_description()
+        return old_values != (
+            self.color_property_names,
+            self.split_property_names,
+            self.color_description,
+        )
+
+    def update_color_description(self):
+        with translation.override(settings.LANGUAGE_CODE):
+            self.color_description = self.descriptive_color()[:COLOR_CACHE_LENGTH]
+
+    def pedigree_birds(self, generations=None):
+        """All ancestors (and the bird itself) by pk, loaded in one query"""
+        links = self.ancestor_links.select_related("ancestor")
+        if generations is not None:
+            links = links.filter(depth__lte=generations)
+
+        birds = {link.ancestor_id: link.ancestor for link in links}
+        birds[self.pk] = self
+        return birds
+
+    def get_ancestors(self, generations=None):
+        """Return the family tree, built from the materialized pedigree"""
+        birds = self.pedigree_birds(generations)
+
+        def _get_tree(bird, depth, lineage):
+            if bird is None or bird.pk in lineage:
                 return None
 
+            parents = {"father": None, "mother": None}
+            if generations is None or depth < generations:
+                lineage = lineage | {bird.pk}
+                parents = {
+                    "father": _get_tree(birds.get(bird.father_id), depth + 1, lineage),
+                    "mother": _get_tree(birds.get(bird.mother_id), depth + 1, lineage),
+                }
+            return {"bird": bird, "ancestors": parents}
+
+        return _get_tree(self, 0, frozenset())
+
+    def get_descendants(self):
+        """All birds that have this bird somewhere in their pedigree"""
+        return Bird.objects.filter(ancestor_links__ancestor=self).distinct()
+
+    def family_tree_for_inbreed(self, loader=None):
+        """
+        The pedigree in the JSON notation of the inbreeding calculator. Pass the
+        PedigreeLoader of the current request to reuse the birds it already loaded.
+        """
+        birds = loader.birds if loader is not None else self.pedigree_birds()
+
+        def _get_tree(bird, lineage):
+            if bird is None or bird.pk in lineage:
+                return None
+
+            lineage = lineage | {bird.pk}
             tree = {"name": bird.ring_number}
-            if bird.father:
-                tree.update({"s": _get_tree(bird.father)})
-            if bird.mother:
-                tree.update({"d": _get_tree(bird.mother)})
+            if bird.father_id in birds:
+                tree.update({"s": _get_tree(birds[bird.father_id], lineage)})
+            if bird.mother_id in birds:
+                tree.update({"d": _get_tree(birds[bird.mother_id], lineage)})
             return tree
 
-        return json.dumps(_get_tree(self))
+        return json.dumps(_get_tree(birds.get(self.pk, self), frozenset()))
+
+
+class BirdAncestor(models.Model):
+    """Materialized pedigree: one row for every ancestor of a bird, per generation
+    and side of the family, so whole pedigrees and descendants load in one query"""
+
+    class Side(models.TextChoices):
+        """The parent through which the ancestor is related"""
+
+        FATHER = "father", _("father")
+        MOTHER = "mother", _("mother")
+
+    bird = models.ForeignKey(
+        Bird, on_delete=models.CASCADE, related_name="ancestor_links"
+    )
+    ancestor = models.ForeignKey(
+        Bird, on_delete=models.CASCADE, related_name="descendant_links"
+    )
+    depth = models.PositiveSmallIntegerField(
+        verbose_name=_("Generation"), help_text=_("1 is a parent, 2 a grandparent")
+    )
+    side = models.CharField(choices=Side.choices, max_length=10)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bird", "ancestor", "depth", "side"],
+                name="unique_bird_ancestor_path",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["bird", "depth"]),
+            models.Index(fields=["ancestor", "depth"]),
+        ]
+        verbose_name = _("Pedigree link")
+        verbose_name_plural = _("Pedigree links")
+
+    def __str__(self):
+        return "{} > {} ({})".format(self.bird_id, self.ancestor_id, self.depth)
+
+
+class FacetCountVersion(models.Model):
+    """Version stamp of the cached facet counts of a user, or "all" for superusers.
+    It is kept in the database so every process sees when the counts are stale"""
+
+    scope = models.CharField(max_length=20, unique=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return "{}: {}".format(self.scope, self.version)
 
 
 class BirdPhoto(models.Model):
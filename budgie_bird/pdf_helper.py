@@ -1,17 +1,27 @@
 import ssl
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from itertools import islice, repeat
 from urllib.error import HTTPError, URLError
 from urllib.parse import urlparse
 from urllib.request import urlopen
 
+import django
+from django.apps import apps
 from django.conf import settings
+from django.utils import translation
 from django.utils.translation import gettext as _
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A3, landscape
 from reportlab.lib.utils import ImageReader, simpleSplit
 from reportlab.pdfgen import canvas
 
+from budgie_bird.services.photo_cache import cache_thumbnail, get_cached_thumbnail
+from budgie_bird.services.thumbnails import THUMBNAIL_SIZES, thumbnail_name
+
 
 CARD_WIDTH = 165
 CARD_HEIGHT = 94
@@ -20,18 +30,21 @@ COLUMN_GAP = 38
 ROW_GAP = 24
 PAGE_MARGIN = 36
 TITLE_HEIGHT = 40
+PHOTO_SIZE = 52
+# Photos are scaled down to this, enough to print them sharp at PHOTO_SIZE points
+PHOTO_PIXELS = THUMBNAIL_SIZES["pdf"]
 
 
-def _build_tree(bird, ancestors=None):
+def _build_tree(bird, loader, ancestors=None):
     ancestors = set() if ancestors is None else ancestors
     if bird.pk in ancestors:
         return {"bird": bird, "children": []}
 
     next_ancestors = ancestors | {bird.pk}
     children = []
-    for parent in (bird.father, bird.mother):
+    for parent in loader.parents(bird):
         if parent:
-            children.append(_build_tree(parent, next_ancestors))
+            children.append(_build_tree(parent, loader, next_ancestors))
     return {"bird": bird, "children": children}
 
 
@@ -64,12 +77,9 @@ def _draw_wrapped_text(pdf, text, x, y, width, font="Helvetica", size=8, leading
     return y
 
 
-def _draw_bird_photo(pdf, bird, left, bottom, card_height):
-    if not bird.photo or not bird.photo.name:
-        return False
-
-    max_size = min(52, card_height - 16)
-    photo_url = bird.photo.url
+def _open_photo(storage, name):
+    """The stored file, or None when it can't be found"""
+    photo_url = storage.url(name)
     parsed_url = urlparse(photo_url)
 
     try:
@@ -77,35 +87,145 @@ def _draw_bird_photo(pdf, bird, left, bottom, card_height):
             urlopen_options = {"timeout": 10}
             if settings.DEBUG:
                 urlopen_options["context"] = ssl._create_unverified_context()
-            photo_file = urlopen(photo_url, **urlopen_options)
-        else:
-            photo_file = bird.photo.storage.open(bird.photo.name, "rb")
+            return urlopen(photo_url, **urlopen_options)
+        return storage.open(name, "rb")
     except HTTPError as exc:
         if exc.code == 404:
-            return False
+            return None
         raise
     except (URLError, OSError):
+        return None
+
+
+def _photo_modified_time(photo):
+    try:
+        return photo.storage.get_modified_time(photo.name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def _make_thumbnail(photo_file):
+    with Image.open(BytesIO(photo_file.read())) as image:
+        image.thumbnail((PHOTO_PIXELS, PHOTO_PIXELS))
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA")
+        output = BytesIO()
+        image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def load_photo_thumbnail(photo):
+    """
+    The photo as a small PNG, or None when it can't be loaded. Thumbnails are
+    cached on disk by the name and modification time of the stored photo.
+    """
+    if not photo or not photo.name:
+        return None
+
+    modified_time = _photo_modified_time(photo)
+    if modified_time is not None:
+        thumbnail = get_cached_thumbnail(photo.name, modified_time)
+        if thumbnail is not None:
+            return thumbnail
+
+    # The original is only downloaded when it has no PDF thumbnail (yet)
+    photo_file = _open_photo(photo.storage, thumbnail_name(photo.name, "pdf"))
+    if photo_file is None:
+        photo_file = _open_photo(photo.storage, photo.name)
+    if photo_file is None:
+        return None
+    try:
+        with photo_file:
+            thumbnail = _make_thumbnail(photo_file)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    if modified_time is not None:
+        cache_thumbnail(photo.name, modified_time, thumbnail)
+    return thumbnail
+
+
+def prefetch_photos(birds):
+    """
+    Load the photos of all birds at the same time, instead of one by one while
+    drawing. Returns the thumbnails (or None) by the storage name of the photo.
+    """
+    photos = {}
+    for bird in birds:
+        if bird.photo and bird.photo.name:
+            photos.setdefault(bird.photo.name, bird.photo)
+    if not photos:
+        return {}
+
+    workers = min(len(photos), settings.PDF_PHOTO_FETCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(photos, pool.map(load_photo_thumbnail, photos.values())))
+
+
+def _register_photo_forms(pdf, photos):
+    """
+    Register every photo once per document, as a form of 1 by 1 point that every
+    card scales into place. Returns the form name and the size of the photos.
+    """
+    forms = {}
+    # In a fixed order, so every renderer of the same export gives them the same name
+    for name in sorted(name for name, thumbnail in photos.items() if thumbnail):
+        image = ImageReader(BytesIO(photos[name]))
+        form_name = "photo{}".format(len(forms))
+        pdf.beginForm(form_name, upperx=1, uppery=1)
+        pdf.drawImage(image, 0, 0, width=1, height=1, mask="auto")
+        pdf.endForm()
+        forms[name] = (form_name, *image.getSize())
+    return forms
+
+
+def _draw_bird_photo(pdf, bird, left, bottom, card_height, photos=None, forms=None):
+    if not bird.photo or not bird.photo.name:
         return False
 
-    with photo_file:
-        image = ImageReader(photo_file)
+    if forms is not None:
+        if bird.photo.name not in forms:
+            return False
+        form_name, image_width, image_height = forms[bird.photo.name]
+    else:
+        if photos is None:
+            thumbnail = load_photo_thumbnail(bird.photo)
+        else:
+            thumbnail = photos.get(bird.photo.name)
+        if thumbnail is None:
+            return False
+        image = ImageReader(BytesIO(thumbnail))
         image_width, image_height = image.getSize()
-        scale = min(max_size / image_width, max_size / image_height)
-        width = image_width * scale
-        height = image_height * scale
+
+    max_size = min(PHOTO_SIZE, card_height - 16)
+    scale = min(max_size / image_width, max_size / image_height)
+    width = image_width * scale
+    height = image_height * scale
+    x = left + CARD_WIDTH - width - 8
+    y = bottom + card_height - height - 8
+
+    if forms is None:
         pdf.drawImage(
             image,
-            left + CARD_WIDTH - width - 8,
-            bottom + card_height - height - 8,
+            x,
+            y,
             width=width,
             height=height,
             preserveAspectRatio=True,
             mask="auto",
         )
+    else:
+        pdf.saveState()
+        pdf.translate(x, y)
+        pdf.scale(width, height)
+        pdf.doForm(form_name)
+        pdf.restoreState()
     return True
 
 
-def _draw_bird_card(pdf, node, left, bottom, card_height, include_notes):
+def _draw_bird_card(
+    pdf, node, left, bottom, card_height, include_notes, photos=None, forms=None
+):
     bird = node["bird"]
     gender_colors = {
         "male": colors.HexColor("#1976d2"),
@@ -119,7 +239,7 @@ def _draw_bird_card(pdf, node, left, bottom, card_height, include_notes):
     pdf.roundRect(left, bottom, CARD_WIDTH, card_height, 6, fill=1, stroke=1)
 
     text_x = left + 8
-    has_photo = _draw_bird_photo(pdf, bird, left, bottom, card_height)
+    has_photo = _draw_bird_photo(pdf, bird, left, bottom, card_height, photos, forms)
     text_width = CARD_WIDTH - 74 if has_photo else CARD_WIDTH - 16
     text_y = bottom + card_height - 16
     text_y = _draw_wrapped_text(
@@ -155,8 +275,8 @@ def _draw_bird_card(pdf, node, left, bottom, card_height, include_notes):
         )
 
 
-def _draw_tree_page(pdf, bird, include_notes):
-    tree = _build_tree(bird)
+def _draw_tree_page(pdf, tree, include_notes, photos=None, forms=None):
+    bird = tree["bird"]
     nodes, leaf_count = _position_tree(tree)
     max_depth = max(node["depth"] for node in nodes)
     note_lines = 0
@@ -226,19 +346,124 @@ def _draw_tree_page(pdf, bird, include_notes):
 
     for node in nodes:
         _draw_bird_card(
-            pdf, node, node["left"], node["bottom"], card_height, include_notes
+            pdf,
+            node,
+            node["left"],
+            node["bottom"],
+            card_height,
+            include_notes,
+            photos,
+            forms,
         )
 
 
-def render_bird_tree_pdf(birds, include_notes=False):
-    output = BytesIO()
-    pdf = canvas.Canvas(output, pagesize=landscape(A3))
-    pdf.setTitle(_("Bird family tree"))
-    pdf.setPageCompression(0)
+def _tree_photos(trees, photos):
+    """The photos that are shown in ``trees``"""
+    names = set()
+    nodes = list(trees)
+    while nodes:
+        node = nodes.pop()
+        if node["bird"].photo:
+            names.add(node["bird"].photo.name)
+        nodes.extend(node["children"])
+    return {name: photos[name] for name in names if name in photos}
 
-    for bird in birds:
-        _draw_tree_page(pdf, bird, include_notes)
-        pdf.showPage()
 
+def _draw_pages(pdf_file, trees, include_notes, photos, compress):
+    pdf = canvas.Canvas(pdf_file, pagesize=landscape(A3))
+    pdf.setTitle(_("Bird family tree"))
+    pdf.setPageCompression(1 if compress else 0)
+    forms = _register_photo_forms(pdf, photos) if compress else None
+    for tree in trees:
+        _draw_tree_page(pdf, tree, include_notes, photos, forms)
+        pdf.showPage()
     pdf.save()
-    return output.getvalue()
+
+
+def _init_page_worker(language):
+    # Worker processes that are spawned don't share the setup of this process
+    if not apps.ready:
+        django.setup()
+    translation.activate(language)
+
+
+def _render_part(trees, include_notes, photos, compress):
+    part = BytesIO()
+    _draw_pages(part, trees, include_notes, photos, compress)
+    return part.getvalue()
+
+
+def _draw_pages_in_parallel(
+    pdf_file, trees, include_notes, photos, compress, processes
+):
+    """
+    Every worker makes a PDF of a part of the trees, after which the parts are
+    merged into one PDF in ``pdf_file``.
+    """
+    # A few parts per process, so a process with large trees doesn't hold up the rest
+    chunk_size = max(1, len(trees) // (processes * 4))
+    remaining = iter(trees)
+    chunks = list(iter(lambda: list(islice(remaining, chunk_size)), []))
+    writer = PdfWriter()
+    with ProcessPoolExecutor(
+        max_workers=min(processes, len(chunks)),
+        initializer=_init_page_worker,
+        initargs=(translation.get_language(),),
+    ) as pool:
+        parts = pool.map(
+            _render_part,
+            chunks,
+            repeat(include_notes),
+            (_tree_photos(chunk, photos) for chunk in chunks),
+            repeat(compress),
+        )
+        for part in parts:
+            writer.append(PdfReader(BytesIO(part)))
+
+    writer.add_metadata({"/Title": _("Bird family tree")})
+    if compress:
+        # Every part stores the photos it shows, the merged PDF only needs them once.
+        # Duplicates are found a level per pass: the masks, the images using
+        # them and then the forms drawing those images.
+        for _pass in range(3):
+            writer.compress_identical_objects(
+                remove_duplicates=True, remove_unreferenced=True
+            )
+    writer.write(pdf_file)
+
+
+def page_texts(pdf):
+    """The text on every page of ``pdf``, to compare PDFs made in other ways"""
+    return [page.extract_text() for page in PdfReader(BytesIO(pdf)).pages]
+
+
+def render_bird_tree_pdf(
+    birds, include_notes=False, compress=True, processes=1, output=None
+):
+    """
+    The family trees of the birds, a page per bird. With ``compress`` the pages
+    are compressed and every photo is stored once, however often it is shown.
+    With more than one of ``processes`` the pages are drawn by that many
+    processes, each making a PDF of a part of the trees, which are merged
+    afterwards. The PDF is written to the file ``output`` when given,
+    otherwise it is returned.
+    """
+    # Imported here, so spawned page workers can import this module before setup
+    from budgie_bird.services.pedigree_loader import PedigreeLoader
+
+    # All pedigrees are loaded up front, one query per generation
+    loader = PedigreeLoader()
+    trees = [_build_tree(bird, loader) for bird in loader.load(birds)]
+    # The photos of all trees are downloaded together, before drawing starts
+    photos = prefetch_photos(loader.birds.values())
+
+    pdf_file = BytesIO() if output is None else output
+    if processes > 1 and len(trees) > 1:
+        _draw_pages_in_parallel(
+            pdf_file, trees, include_notes, photos, compress, processes
+        )
+    else:
+        _draw_pages(pdf_file, trees, include_notes, photos, compress)
+
+    if output is None:
+        return pdf_file.getvalue()
@@ -0,0 +1,33 @@
+COLOR_CACHE_FIELDS = [
+    "color_property_names",
+    "split_property_names",
+    "color_description",
+]
+
+# The maximum length of the stored names and description
+COLOR_CACHE_LENGTH = 255
+
+
+def describe_color(color_names, color, split_names):
+    """The descriptive color notation, e.g. "Opaline Sky Blue / Spangle" """
+    return "{props} {color} {sep} {split}".format(
+        props=color_names,
+        color=color,
+        sep="/" if split_names else "",
+        split=split_names,
+    ).strip()
+
+
+def refresh_color_cache(queryset):
+    """
+    Store the current color and split property names of the birds in the
+    queryset, for when their properties changed. Returns the number of birds
+    that were updated.
+    """
+    changed = []
+    birds = queryset.prefetch_related("color_property", "split_property")
+    for bird in birds.iterator(chunk_size=1000):
+        if bird.update_color_names():
+            changed.append(bird)
+    queryset.model.objects.bulk_update(changed, COLOR_CACHE_FIELDS, batch_size=500)
+    return len(changed)
@@ -0,0 +1,79 @@
+import hashlib
+import uuid
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.cache import cache
+
+from budgie_bird.models import FacetCountVersion
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# These parameters don't change the counts, only what is shown of the results
+IGNORED_PARAMETERS = {"o", "p", "_facets", "_to_field", "_popup"}
+
+
+def facet_version(scope):
+    """The version stamp of the facet counts of a user, or "all" for superusers"""
+    return FacetCountVersion.objects.get_or_create(
+        scope=str(scope), defaults={"version": uuid.uuid4().hex}
+    )[0].version
+
+
+def invalidate_facet_counts(user_id):
+    """Birds or color properties of the user changed, so their counts did too"""
+    # The stamps are in the database, the cache of the web server can be local to
+    # its process while the import worker or a management command changes birds
+    FacetCountVersion.objects.filter(scope__in=[str(user_id), "all"]).update(
+        version=uuid.uuid4().hex
+    )
+
+
+class FacetCacheChangeList(ChangeList):
+    """
+    ChangeList that caches the facet counts of every filter per user. The
+    counts are stored under a version stamp that signals replace whenever
+    the birds or color properties of the user change.
+    """
+
+    def get_filters(self, request):
+        filter_specs, *rest = super().get_filters(request)
+        for spec in filter_specs:
+            if hasattr(spec, "get_facet_queryset"):
+                spec.get_facet_queryset = self._cached_facets(
+                    request, spec, spec.get_facet_queryset
+                )
+        return (filter_specs, *rest)
+
+    def _cache_key(self, request, spec):
+        scope = "all" if request.user.is_superuser else request.user.pk
+        own_parameters = set(spec.expected_parameters())
+        parameters = sorted(
+            (name, request.GET.getlist(name))
+            for name in request.GET
+            if name not in own_parameters and name not in IGNORED_PARAMETERS
+        )
+        fingerprint = hashlib.sha256(
+            repr(
+                (
+                    type(spec).__name__,
+                    getattr(spec, "field_path", None),
+                    getattr(spec, "parameter_name", None),
+                    parameters,
+                )
+            ).encode()
+        ).hexdigest()
+        # The stamp is read once for all filters of the page
+        if not hasattr(self, "_facet_version"):
+            self._facet_version = facet_version(scope)
+        return "bird_facets:{}:{}:{}".format(scope, self._facet_version, fingerprint)
+
+    def _cached_facets(self, request, spec, get_facet_queryset):
+        def cached_facet_queryset(changelist):
+            cache_key = self._cache_key(request, spec)
+            counts = cache.get(cache_key)
+            if counts is None:
+                counts = get_facet_queryset(changelist)
+                cache.set(cache_key, counts, FACET_CACHE_TIMEOUT)
+            return counts
+
+        return cached_facet_queryset
@@ -0,0 +1,61 @@
+from budgie_bird.models import Bird, BirdAncestor
+from budgie_bird.services.kinship import build_kinship, inbreeding_coefficients
+
+
+def update_inbreeding_coefficients(bird_ids):
+    """
+    Recalculate and store the inbreeding coefficient of the given birds, using
+    only their own pedigrees. Returns {id: coefficient} of those birds.
+    """
+    bird_ids = set(bird_ids)
+    if not bird_ids:
+        return {}
+
+    pedigree_ids = bird_ids | set(
+        BirdAncestor.objects.filter(bird_id__in=bird_ids).values_list(
+            "ancestor_id", flat=True
+        )
+    )
+    rows = Bird.objects.filter(pk__in=pedigree_ids).values_list(
+        "pk", "father_id", "mother_id", "inbreeding_coefficient"
+    )
+    stored = {}
+    parents = {}
+    for bird_id, father_id, mother_id, coefficient in rows:
+        parents[bird_id] = (father_id, mother_id)
+        stored[bird_id] = coefficient
+
+    coefficients = {
+        bird_id: coefficient
+        for bird_id, coefficient in inbreeding_coefficients(parents).items()
+        if bird_id in bird_ids
+    }
+    Bird.objects.bulk_update(
+        [
+            Bird(pk=bird_id, inbreeding_coefficient=coefficient)
+            for bird_id, coefficient in coefficients.items()
+            if coefficient != stored[bird_id]
+        ],
+        ["inbreeding_coefficient"],
+        batch_size=500,
+    )
+    return coefficients
+
+
+def pair_inbreeding_coefficients(parents, males, females):
+    """
+    The inbreeding coefficient that the offspring of every male x female pair
+    would have, which is the kinship of the pair. All pairs share one kinship
+    table. Returns (coefficient, male_id, female_id) tuples, lowest first.
+    """
+    kinship, index = build_kinship(parents)
+    female_indexes = [(female_id, index[female_id]) for female_id in females]
+    pairs = []
+    for male_id in males:
+        male_index = index[male_id]
+        pairs.extend(
+            (kinship(male_index, female_index), male_id, female_id)
+            for female_id, female_index in female_indexes
+        )
+    pairs.sort()
+    return pairs
@@ -0,0 +1,140 @@
+"""
+Kinship and inbreeding calculations on plain ids, without the database. The
+management commands run them in worker processes, which don't set up Django.
+"""
+
+from array import array
+from collections import defaultdict, deque
+
+
+def topological_order(parents):
+    """
+    Order the bird ids of ``parents`` ({id: (father_id, mother_id)}) so that
+    parents always come before their children. Birds that are part of a
+    (faulty) loop in the pedigree are put at the end.
+    """
+    children = defaultdict(list)
+    pending = {}
+    for bird_id, parent_ids in parents.items():
+        known_parents = {
+            parent_id
+            for parent_id in parent_ids
+            if parent_id in parents and parent_id != bird_id
+        }
+        pending[bird_id] = len(known_parents)
+        for parent_id in known_parents:
+            children[parent_id].append(bird_id)
+
+    queue = deque(bird_id for bird_id, count in pending.items() if not count)
+    order = []
+    while queue:
+        bird_id = queue.popleft()
+        order.append(bird_id)
+        for child_id in children[bird_id]:
+            pending[child_id] -= 1
+            if not pending[child_id]:
+                queue.append(child_id)
+
+    if len(order) < len(parents):
+        ordered = set(order)
+        order.extend(bird_id for bird_id in parents if bird_id not in ordered)
+    return order
+
+
+class Kinship:
+    """
+    Memoized kinship (coancestry) coefficients between the birds of a pedigree.
+
+    Birds are referred to by their index in a topological order, so ``sire`` and
+    ``dam`` always point to a lower index, or -1 when the parent is unknown. The
+    kinship of a bird with an older bird is half the kinship of its parents with
+    that bird; the kinship of a bird with itself is (1 + F) / 2.
+    """
+
+    def __init__(self, sire, dam):
+        self.sire = sire
+        self.dam = dam
+        self.inbreeding = [0.0] * len(sire)
+        self._memo = {}
+
+    def _lookup(self, a, b):
+        if a < 0 or b < 0:
+            return 0.0
+        if a == b:
+            return 0.5 * (1.0 + self.inbreeding[a])
+        return self._memo.get((a, b) if a > b else (b, a))
+
+    def __call__(self, a, b):
+        value = self._lookup(a, b)
+        if value is not None:
+            return value
+
+        # Iterative instead of recursive, long pedigrees exceed the recursion limit
+        stack = [(a, b) if a > b else (b, a)]
+        while stack:
+            key = stack[-1]
+            if key in self._memo:
+                stack.pop()
+                continue
+
+            younger, older = key
+            values = []
+            for parent in (self.sire[younger], self.dam[younger]):
+                value = self._lookup(parent, older)
+                if value is None:
+                    stack.append((parent, older) if parent > older else (older, parent))
+                else:
+                    values.append(value)
+            if len(values) == 2:
+                self._memo[key] = 0.5 * (values[0] + values[1])
+                stack.pop()
+
+        return self._lookup(a, b)
+
+    def calculate_inbreeding(self):
+        """The inbreeding coefficient of a bird is the kinship of its parents"""
+        for index in range(len(self.sire)):
+            self.inbreeding[index] = self(self.sire[index], self.dam[index])
+        return self.inbreeding
+
+
+def build_kinship(parents):
+    """
+    Build a Kinship calculator for ``parents`` ({id: (father_id, mother_id)}).
+    Parents outside of ``parents`` count as unrelated founders. Returns the
+    calculator and the {id: index} mapping.
+    """
+    order = topological_order(parents)
+    index = {bird_id: position for position, bird_id in enumerate(order)}
+
+    def parent_index(parent_id, position):
+        parent_position = index.get(parent_id, -1)
+        # A loop in the pedigree is cut where it points to a younger bird
+        return parent_position if parent_position < position else -1
+
+    sire = [parent_index(parents[bird_id][0], pos) for pos, bird_id in enumerate(order)]
+    dam = [parent_index(parents[bird_id][1], pos) for pos, bird_id in enumerate(order)]
+    kinship = Kinship(sire, dam)
+    kinship.calculate_inbreeding()
+    return kinship, index
+
+
+def inbreeding_coefficients(parents):
+    """Wright's inbreeding coefficient for every bird in ``parents``"""
+    kinship, index = build_kinship(parents)
+    return {
+        bird_id: kinship.inbreeding[position] for bird_id, position in index.items()
+    }
+
+
+def inbreeding_coefficient_array(bird_ids, father_ids, mother_ids):
+    """
+    The inbreeding coefficients of a whole flock, given as parallel arrays in
+    which 0 is an unknown parent. Runs in worker processes, so no database access.
+    """
+    parents = {
+        bird_id: (father_id or None, mother_id or None)
+        for bird_id, father_id, mother_id in zip(bird_ids, father_ids, mother_ids)
+    }
+    coefficients = inbreeding_coefficients(parents)
+    return array("d", (coefficients[bird_id] for bird_id in bird_ids))
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from budgie_bird.models import Bird, BirdAncestor
+from budgie_bird.services.kinship import topological_order
+
+# Guards against ever-growing rows when someone creates a loop in the pedigree
+MAX_PEDIGREE_DEPTH = 64
+SIDES = (BirdAncestor.Side.FATHER, BirdAncestor.Side.MOTHER)
+
+
+def build_ancestor_links(parents, known_links=None):
+    """
+    Calculate the pedigree rows for every bird in ``parents``.
+
+    ``known_links`` holds the (ancestor_id, depth) pairs of parents which are
+    not part of ``parents`` themselves. Returns {id: {(ancestor_id, depth, side)}}.
+    """
+    links = dict(known_links or {})
+    result = {}
+    for bird_id in topological_order(parents):
+        rows = set()
+        for side, parent_id in zip(SIDES, parents[bird_id]):
+            if parent_id is None or parent_id == bird_id:
+                continue
+            rows.add((parent_id, 1, side))
+            for ancestor_id, depth in links.get(parent_id, ()):
+                if ancestor_id != bird_id and depth < MAX_PEDIGREE_DEPTH:
+                    rows.add((ancestor_id, depth + 1, side))
+        result[bird_id] = rows
+        links[bird_id] = {(ancestor_id, depth) for ancestor_id, depth, _ in rows}
+    return result
+
+
+def parent_links_changed(bird):
+    """Check whether the stored first generation differs from the birds parents"""
+    stored = set(
+        BirdAncestor.objects.filter(bird=bird, depth=1).values_list(
+            "ancestor_id", "side"
+        )
+    )
+    expected = {
+        (parent_id, side)
+        for side, parent_id in zip(SIDES, (bird.father_id, bird.mother_id))
+        if parent_id is not None and parent_id != bird.pk
+    }
+    return stored != expected
+
+
+def descendant_ids(bird_ids):
+    return set(
+        BirdAncestor.objects.filter(ancestor_id__in=bird_ids).values_list(
+            "bird_id", flat=True
+        )
+    )
+
+
+def rebuild_ancestor_links(bird_ids):
+    """Recalculate the pedigree rows of the given birds and all of their descendants"""
+    bird_ids = set(bird_ids)
+    if not bird_ids:
+        return []
+    bird_ids |= descendant_ids(bird_ids)
+
+    parents = {
+        bird_id: (father_id, mother_id)
+        for bird_id, father_id, mother_id in Bird.objects.filter(
+            pk__in=bird_ids
+        ).values_list("pk", "father_id", "mother_id")
+    }
+    outside_parent_ids = {
+        parent_id
+        for parent_ids in parents.values()
+        for parent_id in parent_ids
+        if parent_id is not None and parent_id not in parents
+    }
+    known_links = defaultdict(set)
+    for bird_id, ancestor_id, depth in BirdAncestor.objects.filter(
+        bird_id__in=outside_parent_ids
+    ).values_list("bird_id", "ancestor_id", "depth"):
+        known_links[bird_id].add((ancestor_id, depth))
+
+    links = build_ancestor_links(parents, known_links)
+    with transaction.atomic():
+        BirdAncestor.objects.filter(bird_id__in=parents).delete()
+        BirdAncestor.objects.bulk_create(
+            (
+                BirdAncestor(
+                    bird_id=bird_id, ancestor_id=ancestor_id, depth=depth, side=side
+                )
+                for bird_id, rows in links.items()
+                for ancestor_id, depth, side in rows
+            ),
+            batch_size=1000,
+        )
+    return list(parents)
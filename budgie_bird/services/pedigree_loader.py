@@ -0,0 +1,63 @@
+from budgie_bird.models import Bird
+
+
+class PedigreeLoader:
+    """
+    Loads pedigrees one generation at a time, with a single query per generation.
+
+    Every bird is kept in an identity map, so an ancestor that shows up in
+    several places of a (inbred) pedigree, or in several pedigrees that are
+    loaded by the same loader, is only fetched once. Use one loader per request.
+    """
+
+    def __init__(self):
+        self.birds = {}
+
+    def get_queryset(self):
+        return Bird.objects.select_related("breeder", "owner")
+
+    def load(self, birds, generations=None):
+        """
+        Load the given birds (instances or primary keys) and their ancestors,
+        ``generations`` back (everything when None). Returns the loaded birds
+        in the given order.
+        """
+        root_ids = [getattr(bird, "pk", bird) for bird in birds]
+        frontier = set(root_ids)
+        seen = set(frontier)
+        generation = 0
+        while frontier and (generations is None or generation <= generations):
+            missing = [pk for pk in frontier if pk not in self.birds]
+            if missing:
+                self.birds.update(
+                    (bird.pk, bird)
+                    for bird in self.get_queryset().filter(pk__in=missing)
+                )
+
+            parent_ids = set()
+            for pk in frontier:
+                bird = self.birds.get(pk)
+                if bird is not None:
+                    parent_ids.update(
+                        parent_id
+                        for parent_id in (bird.father_id, bird.mother_id)
+                        if parent_id is not None
+                    )
+            frontier = parent_ids - seen
+            seen |= frontier
+            generation += 1
+
+        return [self.birds[pk] for pk in root_ids if pk in self.birds]
+
+    def get(self, pk):
+        return self.birds.get(pk)
+
+    def father(self, bird):
+        return self.birds.get(bird.father_id)
+
+    def mother(self, bird):
+        return self.birds.get(bird.mother_id)
+
+    def parents(self, bird):
+        """The father and mother of a loaded bird, both can be None"""
+        return self.father(bird), self.mother(bird)
@@ -0,0 +1,124 @@
+"""On-disk cache for the small bird photos that are drawn on the PDF family trees."""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes of thumbnails per cache directory as far as this process knows
+_cache_sizes = {}
+_cache_sizes_lock = threading.Lock()
+
+
+def _cache_dir():
+    return Path(settings.PDF_PHOTO_CACHE_DIR)
+
+
+def _cache_path(name, modified_time):
+    """One file per photo, the version in the filename changes with the photo"""
+    photo_key = hashlib.sha256(name.encode("utf-8")).hexdigest()
+    version = hashlib.sha256(str(modified_time).encode("utf-8")).hexdigest()[:16]
+    return _cache_dir() / photo_key[:2] / f"{photo_key}-{version}.png"
+
+
+def _cache_enabled():
+    return bool(settings.PDF_PHOTO_CACHE_DIR) and (
+        settings.PDF_PHOTO_CACHE_MAX_SIZE > 0
+    )
+
+
+def get_cached_thumbnail(name, modified_time):
+    """The cached thumbnail of the stored photo ``name``, or None. A hit counts
+    as a use for the eviction."""
+    if not _cache_enabled():
+        return None
+    path = _cache_path(name, modified_time)
+    try:
+        thumbnail = path.read_bytes()
+        os.utime(path)
+    except OSError:
+        return None
+    return thumbnail
+
+
+def cache_thumbnail(name, modified_time, data):
+    """
+    Store the thumbnail, remove the ones of earlier versions of the photo and
+    evict the least recently used ones over the size limit. A thumbnail that
+    can't be stored is logged, the PDF is drawn anyway.
+    """
+    if not _cache_enabled():
+        return
+    path = _cache_path(name, modified_time)
+    photo_key = path.name.rsplit("-", 1)[0]
+    temp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so a reader never sees half a thumbnail
+        handle, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        replaced_size = path.stat().st_size if path.exists() else 0
+        os.replace(temp_path, path)
+        size = path.stat().st_size - replaced_size
+
+        for outdated in path.parent.glob(f"{photo_key}-*.png"):
+            if outdated != path:
+                size -= outdated.stat().st_size
+                outdated.unlink(missing_ok=True)
+    except OSError as error:
+        logger.warning("Could not cache the PDF thumbnail of %s: %s", name, error)
+        if temp_path:
+            Path(temp_path).unlink(missing_ok=True)
+        return
+    _add_to_cache_size(size)
+
+
+def _add_to_cache_size(size):
+    """
+    The size of the cache is counted once and then kept up to date, so the
+    thumbnails are only listed again when they have to be evicted.
+    """
+    max_size = settings.PDF_PHOTO_CACHE_MAX_SIZE
+    cache_dir = _cache_dir()
+    with _cache_sizes_lock:
+        if cache_dir in _cache_sizes:
+            _cache_sizes[cache_dir] += size
+        else:
+            _cache_sizes[cache_dir] = sum(
+                entry_size for _mtime, entry_size, _path in _entries()
+            )
+        if _cache_sizes[cache_dir] > max_size:
+            _cache_sizes[cache_dir] = evict_thumbnails(max_size)
+
+
+def _entries():
+    entries = []
+    for path in _cache_dir().glob("*/*.png"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict_thumbnails(max_size):
+    """
+    Remove the least recently used thumbnails until the cache fits ``max_size``
+    bytes. Returns the size of the thumbnails that are left.
+    """
+    entries = _entries()
+    total = sum(size for _mtime, size, _path in entries)
+    for _mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    return total
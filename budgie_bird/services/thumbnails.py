@@ -0,0 +1,90 @@
+"""Small versions of the bird photos, stored next to the original upload."""
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels, twice the size they are shown at for sharp screens
+THUMBNAIL_SIZES = {
+    "pdf": 216,
+    "tree": 180,
+    "changelist": 96,
+}
+# The variants are made from large to small, so this one is stored last
+_LAST_VARIANT = min(THUMBNAIL_SIZES, key=THUMBNAIL_SIZES.get)
+
+
+def thumbnail_name(name, variant):
+    """``bird_pics/robin.jpg`` becomes ``bird_pics/robin.changelist.webp``"""
+    return "{}.{}.webp".format(posixpath.splitext(name)[0], variant)
+
+
+def thumbnail_url(image_file, variant):
+    """The url of a thumbnail variant of an image field, None without an image"""
+    if not image_file or not image_file.name:
+        return None
+    return image_file.storage.url(thumbnail_name(image_file.name, variant))
+
+
+def thumbnail_or_original_url(image_file, variant):
+    """The url of a thumbnail variant, or of the image itself while it has none"""
+    if not image_file or not image_file.name:
+        return None
+    name = thumbnail_name(image_file.name, variant)
+    if image_file.storage.exists(name):
+        return image_file.storage.url(name)
+    return image_file.url
+
+
+def _open_image(image_file):
+    with image_file.storage.open(image_file.name, "rb") as file:
+        image = Image.open(BytesIO(file.read()))
+    largest = max(THUMBNAIL_SIZES.values())
+    image.draft(None, (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    return image
+
+
+def generate_thumbnails(image_file, force=False):
+    """
+    Store all thumbnail variants of an image field, unless they were already
+    made. Returns whether they were made, a missing or broken image is skipped
+    and an error while storing them is logged.
+    """
+    if not image_file or not image_file.name:
+        return False
+    storage = image_file.storage
+    if not force and storage.exists(thumbnail_name(image_file.name, _LAST_VARIANT)):
+        return False
+
+    try:
+        image = _open_image(image_file)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+
+    # This runs when a bird is saved, a failing storage must not stop that. The
+    # original is shown until `manage.py generate_thumbnails` makes them.
+    try:
+        for variant, size in sorted(THUMBNAIL_SIZES.items(), key=lambda item: -item[1]):
+            # Every variant is made from the previous, larger one
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            output = BytesIO()
+            image.save(output, format="WEBP", quality=80)
+            name = thumbnail_name(image_file.name, variant)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(output.getvalue()))
+    except Exception as error:
+        logger.warning(
+            "Could not store the thumbnails of %s: %s", image_file.name, error
+        )
+        return False
+    return True
@@ -0,0 +1,136 @@
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from budgie_bird.models import Bird, BirdPhoto, ColorProperty
+from budgie_bird.services.color_cache import COLOR_CACHE_FIELDS, refresh_color_cache
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_bird.services.inbreeding import update_inbreeding_coefficients
+from budgie_bird.services.pedigree import (
+    descendant_ids,
+    parent_links_changed,
+    rebuild_ancestor_links,
+)
+from budgie_bird.services.thumbnails import generate_thumbnails
+
+
+@receiver(post_save, sender=Bird)
+def update_pedigree_on_save(sender, instance, created, raw, **kwargs):
+    """Keep the materialized pedigree up to date when the parents change"""
+    if raw:
+        # Fixtures are loaded out of order, use `manage.py rebuild_pedigree`
+        return
+    if created and instance.father_id is None and instance.mother_id is None:
+        return
+    if parent_links_changed(instance):
+        coefficients = update_inbreeding_coefficients(
+            rebuild_ancestor_links([instance.pk])
+        )
+        # Keep the instance in line with the database, it may be saved again
+        instance.inbreeding_coefficient = coefficients.get(
+            instance.pk, instance.inbreeding_coefficient
+        )
+
+
+@receiver(pre_delete, sender=Bird)
+def collect_descendants_on_delete(sender, instance, origin=None, **kwargs):
+    # When a whole account is removed, its descendants are removed as well
+    if isinstance(origin, Bird) or getattr(origin, "model", None) is Bird:
+        instance._pedigree_descendant_ids = descendant_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Bird)
+def update_pedigree_on_delete(sender, instance, **kwargs):
+    """Descendants lose the ancestors they had through the removed bird"""
+    update_inbreeding_coefficients(
+        rebuild_ancestor_links(getattr(instance, "_pedigree_descendant_ids", []))
+    )
+
+
+@receiver(pre_save, sender=Bird)
+def update_color_description_on_save(sender, instance, **kwargs):
+    """The color itself can change with every save, the properties can't"""
+    instance.update_color_description()
+
+
+@receiver(m2m_changed, sender=Bird.color_property.through)
+@receiver(m2m_changed, sender=Bird.split_property.through)
+def update_color_names_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Store the names of the color and split properties on the bird"""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            if instance.update_color_names():
+                Bird.objects.filter(pk=instance.pk).update(
+                    **{field: getattr(instance, field) for field in COLOR_CACHE_FIELDS}
+                )
+    elif action == "pre_clear":
+        instance._color_cache_bird_ids = list(
+            sender.objects.filter(colorproperty=instance).values_list(
+                "bird_id", flat=True
+            )
+        )
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if action == "post_clear":
+            pk_set = getattr(instance, "_color_cache_bird_ids", [])
+        refresh_color_cache(Bird.objects.filter(pk__in=pk_set))
+
+
+def _birds_with_property(color_property):
+    return Bird.objects.filter(
+        Q(color_property=color_property) | Q(split_property=color_property)
+    ).distinct()
+
+
+@receiver(post_save, sender=ColorProperty)
+def update_color_names_on_rename(sender, instance, created, raw, **kwargs):
+    """A new name or rank changes the notation of every bird with the property"""
+    if not created and not raw:
+        refresh_color_cache(_birds_with_property(instance))
+
+
+@receiver(pre_delete, sender=ColorProperty)
+def collect_birds_on_property_delete(sender, instance, **kwargs):
+    instance._color_cache_bird_ids = list(
+        _birds_with_property(instance).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=ColorProperty)
+def update_color_names_on_property_delete(sender, instance, **kwargs):
+    refresh_color_cache(
+        Bird.objects.filter(pk__in=getattr(instance, "_color_cache_bird_ids", []))
+    )
+
+
+@receiver(post_save, sender=Bird)
+@receiver(post_delete, sender=Bird)
+@receiver(post_save, sender=ColorProperty)
+@receiver(post_delete, sender=ColorProperty)
+def invalidate_facet_counts_on_change(sender, instance, **kwargs):
+    invalidate_facet_counts(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Bird.color_property.through)
+@receiver(m2m_changed, sender=Bird.split_property.through)
+def invalidate_facet_counts_on_property_change(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_facet_counts(instance.user_id)
+
+
+@receiver(post_save, sender=Bird)
+def generate_photo_thumbnails(sender, instance, raw, **kwargs):
+    """A new upload has a new name, so it doesn't have thumbnails yet"""
+    if not raw:
+        generate_thumbnails(instance.photo)
+
+
+@receiver(post_save, sender=BirdPhoto)
+def generate_additional_photo_thumbnails(sender, instance, raw, **kwargs):
+    if not raw:
+        generate_thumbnails(instance.image)
@@ -1,22 +1,68 @@
+import base64
 import datetime
 import glob
 import os
+import re
+import zlib
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from unittest import mock
 from urllib.error import HTTPError
 
+import openpyxl
 from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
 from budgie_bird.forms import BirdForm
-from budgie_bird.models import Breeder, Bird, ColorProperty
-from budgie_bird.pdf_helper import _draw_bird_photo
+from budgie_bird.models import Breeder, Bird, BirdPhoto, ColorProperty
+from budgie_bird import pdf_helper
+from budgie_bird.pdf_helper import (
+    _draw_bird_photo,
+    page_texts,
+    prefetch_photos,
+    render_bird_tree_pdf,
+)
+from budgie_bird.services import photo_cache, thumbnails
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_bird.services.thumbnails import THUMBNAIL_SIZES, thumbnail_name
 from budgie_user.models import BudgieUser
 
 
+def _filter_choices(response, field_path):
+    """The choices with facet counts of a filter on the bird changelist"""
+    changelist = response.context["cl"]
+    spec = next(
+        spec
+        for spec in changelist.filter_specs
+        if getattr(spec, "field_path", None) == field_path
+    )
+    return [choice["display"] for choice in spec.choices(changelist)]
+
+
+def _inflate_stream(match):
+    data = match.group(1).strip()
+    if data.endswith(b"~>"):
+        data = base64.a85decode(data[:-2])
+    try:
+        return zlib.decompress(data)
+    except zlib.error:
+        return data
+
+
+def _pdf_content(pdf):
+    """The PDF with its compressed streams inflated, to search in the text"""
+    return re.sub(rb"stream\r?\n(.*?)endstream", _inflate_stream, pdf, flags=re.DOTALL)
+
+
 class BirdAppAdminTest(TestCase):
     fixtures = ["test_breeders.json"]
     bird_overview_url = reverse("admin:budgie_bird_bird_changelist")
@@ -102,8 +148,8 @@ class BirdAppAdminTest(TestCase):
         bird = mock.Mock()
         bird.photo = mock.Mock()
         bird.photo.name = "assets/budgie-silhouette.png"
-        bird.photo.url = "https://example.invalid/photo.png"
         bird.photo.storage = mock.Mock()
+        bird.photo.storage.url.return_value = "https://example.invalid/photo.png"
 
         with mock.patch(
             "budgie_bird.pdf_helper.urlopen",
@@ -113,6 +159,77 @@ class BirdAppAdminTest(TestCase):
         ):
             self.assertFalse(_draw_bird_photo(mock.Mock(), bird, 0, 0, 100))
 
+    def test_pdf_photos_are_fetched_once_and_cached_on_disk(self):
+        """Test that every photo of a PDF export is downloaded only once."""
+        father = Bird.objects.create(user=self.pybudgie_user, ring_number="FATHER")
+        mother = Bird.objects.create(user=self.pybudgie_user, ring_number="MOTHER")
+        chick = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="CHICK", father=father, mother=mother
+        )
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        with (
+            override_settings(PDF_PHOTO_CACHE_DIR=cache_dir.name),
+            mock.patch(
+                "budgie_bird.pdf_helper._open_photo", wraps=pdf_helper._open_photo
+            ) as open_photo,
+        ):
+            render_bird_tree_pdf([chick, father])
+            self.assertEqual(open_photo.call_count, 1)
+            render_bird_tree_pdf([chick])
+            self.assertEqual(open_photo.call_count, 1)
+
+            with mock.patch(
+                "budgie_bird.pdf_helper._photo_modified_time",
+                return_value=datetime.datetime(2026, 1, 1),
+            ):
+                photos = prefetch_photos([chick, father, mother])
+            self.assertEqual(open_photo.call_count, 2)
+
+        self.assertEqual(list(photos), [settings.BIRD_PICTURE_DEFAULT])
+        self.assertTrue(photos[settings.BIRD_PICTURE_DEFAULT].startswith(b"\x89PNG"))
+        # The thumbnail of the earlier version of the photo is removed
+        self.assertEqual(len(list(Path(cache_dir.name).glob("*/*.png"))), 1)
+
+    def test_pdf_export_works_when_the_photo_cache_is_unwritable(self):
+        """Test that a broken photo cache is logged and doesn't stop the export."""
+        chick = Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK")
+        not_a_dir = NamedTemporaryFile()
+        self.addCleanup(not_a_dir.close)
+
+        with (
+            override_settings(PDF_PHOTO_CACHE_DIR=not_a_dir.name),
+            self.assertLogs(photo_cache.logger, "WARNING") as logs,
+        ):
+            pdf = render_bird_tree_pdf([chick])
+
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertIn("Could not cache the PDF thumbnail", logs.output[0])
+
+    def test_pdf_photo_cache_evicts_over_the_size_limit(self):
+        """Test that the least recently used thumbnails make room for new ones."""
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        thumbnail = b"x" * 400
+
+        with override_settings(
+            PDF_PHOTO_CACHE_DIR=cache_dir.name, PDF_PHOTO_CACHE_MAX_SIZE=1024
+        ):
+            for name in ["first.png", "second.png", "third.png"]:
+                photo_cache.cache_thumbnail(name, 1, thumbnail)
+
+            self.assertLessEqual(
+                sum(
+                    path.stat().st_size for path in Path(cache_dir.name).glob("*/*.png")
+                ),
+                1024,
+            )
+            self.assertIsNone(photo_cache.get_cached_thumbnail("first.png", 1))
+            self.assertEqual(
+                photo_cache.get_cached_thumbnail("third.png", 1), thumbnail
+            )
+
     def test_admin_bird_add_by_admin(self):
         """Test if the admin can add a new bird"""
         self.setup_assign_breeders(self.pybudgie_admin)
@@ -292,6 +409,265 @@ class BirdAppAdminTest(TestCase):
             response, settings.BIRD_PICTURE_DEFAULT
         )  # We dont want the default
 
+        # The changelist shows the thumbnail that was made on upload
+        bird = Bird.objects.get(ring_number=self.bird_data["ring_number"])
+        self.assertContains(response, thumbnail_name(bird.photo.name, "changelist"))
+        for variant, size in THUMBNAIL_SIZES.items():
+            with (
+                bird.photo.storage.open(
+                    thumbnail_name(bird.photo.name, variant)
+                ) as file,
+                Image.open(file) as thumbnail,
+            ):
+                self.assertLessEqual(max(thumbnail.size), size)
+
+    def test_generate_thumbnails_command(self):
+        """Test that the thumbnails of every stored photo are made once."""
+        bird = Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK")
+        BirdPhoto.objects.create(bird=bird)
+        output = StringIO()
+
+        call_command("generate_thumbnails", stdout=output)
+        call_command("generate_thumbnails", "--force", stdout=output)
+
+        self.assertEqual(
+            output.getvalue().splitlines(),
+            [
+                "Made the thumbnails of 0 of 1 photo(s)",
+                "{}: thumbnails made".format(settings.BIRD_PICTURE_DEFAULT),
+                "Made the thumbnails of 1 of 1 photo(s)",
+            ],
+        )
+
+    def test_family_tree_shows_the_original_photo_without_thumbnail(self):
+        """Test that photos from before the thumbnails are shown in the tree."""
+        father = Bird.objects.create(user=self.pybudgie_user, ring_number="FATHER")
+        chick = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="CHICK", father=father
+        )
+        # Stored without the signal, like the photos uploaded before thumbnails
+        Bird.objects.filter(pk=chick.pk).update(
+            photo="{}/before-thumbnails.png".format(
+                settings.BIRD_PICTURE_UPLOAD_LOCATION
+            )
+        )
+        chick.refresh_from_db()
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        response = self.client.get(
+            reverse("admin:budgie_bird_bird_familytree", kwargs={"object_id": chick.pk})
+        )
+
+        self.assertContains(response, "'image': '{}'".format(chick.photo.url))
+        self.assertContains(
+            response,
+            "'image': '{}'".format(
+                father.photo.storage.url(thumbnail_name(father.photo.name, "tree"))
+            ),
+        )
+
+    def test_thumbnail_storage_error_does_not_fail_saving_the_bird(self):
+        """Test that a bird is saved when its thumbnails can't be stored."""
+        with open(
+            "{}/../budgie_bird/fixtures/testpic.png".format(settings.BASE_DIR), "rb"
+        ) as photo:
+            name = Bird._meta.get_field("photo").storage.save(
+                "{}/storage-error.png".format(settings.BIRD_PICTURE_UPLOAD_LOCATION),
+                photo,
+            )
+
+        with (
+            mock.patch(
+                "django.core.files.storage.FileSystemStorage.save",
+                side_effect=OSError("No space left on device"),
+            ),
+            self.assertLogs(thumbnails.logger, "WARNING") as logs,
+        ):
+            Bird.objects.create(
+                user=self.pybudgie_user, ring_number="CHICK", photo=name
+            )
+
+        self.assertTrue(Bird.objects.filter(ring_number="CHICK").exists())
+        self.assertIn("No space left on device", logs.output[0])
+
+    def test_bird_changelist_query_count_per_page(self):
+        """Test if a full changelist page costs as many queries as a small one"""
+
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        opaline = ColorProperty.objects.create(
+            user=self.pybudgie_user, color_name="Opaline", rank=1
+        )
+        father = Bird.objects.create(user=self.pybudgie_user, ring_number="FATHER")
+
+        def add_birds(count):
+            for number in range(count):
+                bird = Bird.objects.create(
+                    user=self.pybudgie_user,
+                    ring_number="5TJJ-{}-2021".format(Bird.objects.count()),
+                    father=father,
+                )
+                bird.color_property.add(opaline)
+                bird.split_property.add(opaline)
+
+        add_birds(1)
+        self.client.get(self.bird_overview_url)  # The admin theme is created once
+        invalidate_facet_counts(self.pybudgie_user.pk)
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(self.bird_overview_url)
+
+        add_birds(98)
+        with self.assertNumQueries(len(small_page)):
+            response = self.client.get(self.bird_overview_url)
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+        # Twice in each row with the property, plus once in both filters
+        self.assertContains(response, "Opaline", count=200)
+
+    def test_bird_parent_filters_only_list_own_parents(self):
+        """Test if the parent filters only offer the users' birds with offspring"""
+
+        father = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="FATHER", gender="male"
+        )
+        mother = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="MOTHER", gender="female"
+        )
+        Bird.objects.create(
+            user=self.pybudgie_user, ring_number="BACHELOR", gender="male"
+        )
+        Bird.objects.create(
+            user=self.pybudgie_user, ring_number="CHICK", father=father, mother=mother
+        )
+        other_father = Bird.objects.create(
+            user=self.pybudgie_admin, ring_number="OTHER", gender="male"
+        )
+        Bird.objects.create(
+            user=self.pybudgie_admin, ring_number="OTHER-CHICK", father=other_father
+        )
+
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        response = self.client.get(self.bird_overview_url)
+        filters = {
+            spec.parameter_name: [title for _pk, title in spec.lookup_choices]
+            for spec in response.context["cl"].filter_specs
+            if getattr(spec, "parameter_name", None) in ("father", "mother")
+        }
+        self.assertEqual(filters, {"father": ["FATHER"], "mother": ["MOTHER"]})
+
+        response = self.client.get(self.bird_overview_url, {"father": father.pk})
+        self.assertEqual(
+            [bird.ring_number for bird in response.context["cl"].result_list], ["CHICK"]
+        )
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_bird_changelist_facet_counts_are_cached(self):
+        """Test if facet counts come from the cache until the birds change"""
+
+        Bird.objects.create(user=self.pybudgie_user, ring_number="MALE", gender="male")
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        with CaptureQueriesContext(connection) as first_request:
+            response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (1)", _filter_choices(response, "gender"))
+
+        with CaptureQueriesContext(connection) as second_request:
+            response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (1)", _filter_choices(response, "gender"))
+        self.assertLess(len(second_request), len(first_request))
+        self.assertFalse(
+            any("FILTER (WHERE" in query["sql"] for query in second_request)
+        )
+
+        Bird.objects.create(user=self.pybudgie_user, ring_number="MALE2", gender="male")
+        response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (2)", _filter_choices(response, "gender"))
+
+        Bird.objects.filter(ring_number="MALE2").update(gender="female")
+        self.client.post(
+            self.bird_overview_url,
+            {
+                "action": "mark_as_owned",
+                "_selected_action": list(Bird.objects.values_list("pk", flat=True)),
+            },
+        )
+        response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (1)", _filter_choices(response, "gender"))
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_bird_bulk_action_on_filtered_changelist_invalidates_facet_counts(self):
+        """Test if an action that empties the filtered changelist updates the counts"""
+
+        for number in range(3):
+            Bird.objects.create(
+                user=self.pybudgie_user, ring_number="NEW-{}".format(number)
+            )
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        not_owned_url = "{}?is_owned__exact=0".format(self.bird_overview_url)
+        self.assertEqual(
+            _filter_choices(self.client.get(not_owned_url), "is_owned")[1:],
+            ["Ja (0)", "Nee (3)"],
+        )
+
+        self.client.post(
+            not_owned_url,
+            {
+                "action": "mark_as_owned",
+                "_selected_action": list(Bird.objects.values_list("pk", flat=True)),
+            },
+        )
+        self.assertEqual(Bird.objects.filter(is_owned=True).count(), 3)
+        self.assertEqual(
+            _filter_choices(self.client.get(not_owned_url), "is_owned")[1:],
+            ["Ja (3)", "Nee (0)"],
+        )
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_bird_facet_counts_invalidated_from_another_process(self):
+        """Test if counts are current after an import worker changed the birds"""
+
+        Bird.objects.create(user=self.pybudgie_user, ring_number="MALE", gender="male")
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (1)", _filter_choices(response, "gender"))
+
+        # Another process doesn't share the cache of the web server
+        with override_settings(
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+            }
+        ):
+            Bird.objects.bulk_create(
+                [Bird(user=self.pybudgie_user, ring_number="MALE2", gender="male")]
+            )
+            invalidate_facet_counts(self.pybudgie_user.pk)
+
+        response = self.client.get(self.bird_overview_url)
+        self.assertIn("Man (2)", _filter_choices(response, "gender"))
+
     def test_bird_get_queryset_mixin_called(self):
         """Test if the BudgieUser mixin is used in the admin"""
 
@@ -404,14 +780,16 @@ class BirdAppAdminTest(TestCase):
         response = self.client.post(self.bird_overview_url, post_data)
 
         self.assertEqual(response.status_code, 200)
-        self.assertContains(
-            response,
+        # The export is streamed, so the content can only be read once
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(
             "id,user,ring_number,gender,color,date_of_birth,date_of_death,father,"
             "mother,breeder,owner,is_owned,is_for_sale,notes,photo",
+            content,
         )
-        self.assertContains(response, "5TJJ-2802-2021")
-        self.assertContains(response, "5TJJ-0801-2021")
-        self.assertContains(response, "5TJJ-2710-2021")
+        self.assertIn("5TJJ-2802-2021", content)
+        self.assertIn("5TJJ-0801-2021", content)
+        self.assertIn("5TJJ-2710-2021", content)
         self.assertEqual(response.headers["Content-Type"], "text/csv")
 
     def test_bird_csv_all_export(self):
@@ -449,6 +827,45 @@ class BirdAppAdminTest(TestCase):
             self.assertContains(response, bird.ring_number)
         self.assertEqual(response.headers["Content-Type"], "text/csv")
 
+    def test_bird_csv_all_export_is_streamed(self):
+        """Test if the all CSV-export streams the rows with their color properties"""
+
+        opaline = ColorProperty.objects.create(
+            user=self.pybudgie_user, color_name="Opaline", rank=1
+        )
+        spangle = ColorProperty.objects.create(
+            user=self.pybudgie_user, color_name="Spangle", rank=2
+        )
+        father = Bird.objects.create(user=self.pybudgie_user, ring_number="FATHER")
+        for number in range(5):
+            bird = Bird.objects.create(
+                user=self.pybudgie_user,
+                ring_number="5TJJ-{}-2021".format(number),
+                father=father,
+            )
+            bird.color_property.set([opaline, spangle])
+
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        post_data = {
+            "action": "export_all_as_csv",
+            "_selected_action": [father.pk],
+        }
+        response = self.client.post(self.bird_overview_url, post_data)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.headers["Content-Type"], "text/csv")
+        # The birds with their fathers, the color and the split properties
+        with self.assertNumQueries(3):
+            content = b"".join(response.streaming_content).decode()
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[0].startswith("id,ring_number,gender,color,"))
+        self.assertIn(",FATHER,", lines[1])
+        self.assertIn('"Opaline, Spangle"', lines[1])
+
     def test_bird_family_tree_pdf_export_without_notes(self):
         """Test that the family tree action returns a PDF without notes."""
         father = Bird.objects.create(
@@ -475,8 +892,13 @@ class BirdAppAdminTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.headers["Content-Type"], "application/pdf")
-        self.assertTrue(response.content.startswith(b"%PDF"))
-        self.assertNotIn(b"Bird note", response.content)
+        self.assertEqual(
+            response.headers["Content-Disposition"],
+            'attachment; filename="CHICK-family-tree.pdf"',
+        )
+        content = response.getvalue()
+        self.assertTrue(content.startswith(b"%PDF"))
+        self.assertNotIn(b"Bird note", _pdf_content(content))
 
     def test_bird_family_tree_pdf_export_with_notes(self):
         """Test that the family tree action can include notes."""
@@ -498,7 +920,115 @@ class BirdAppAdminTest(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.headers["Content-Type"], "application/pdf")
-        self.assertIn(b"Bird note", response.content)
+        self.assertIn(b"Bird note", _pdf_content(response.getvalue()))
+
+    def test_bird_family_tree_pdf_export_is_streamed(self):
+        """Test that the PDF of several birds is streamed from a file."""
+        birds = [
+            Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK1"),
+            Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK/2"),
+        ]
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        response = self.client.post(
+            self.bird_overview_url,
+            {
+                "action": "export_family_tree_pdf",
+                "_selected_action": [bird.pk for bird in birds],
+            },
+        )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response.headers["Content-Disposition"],
+            'attachment; filename="bird-family-trees.pdf"',
+        )
+        self.assertEqual(
+            int(response.headers["Content-Length"]), len(response.getvalue())
+        )
+
+        response = self.client.get(
+            reverse("admin:budgie_bird_bird_familytree_pdf", args=[birds[1].pk])
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response.headers["Content-Disposition"],
+            'attachment; filename="CHICK_2-family-tree.pdf"',
+        )
+        self.assertTrue(response.getvalue().startswith(b"%PDF"))
+
+    def test_bird_family_tree_pdf_stores_every_photo_once(self):
+        """Test that a photo shown on many cards is stored once in the PDF."""
+        father = Bird.objects.create(user=self.pybudgie_user, ring_number="FATHER")
+        mother = Bird.objects.create(user=self.pybudgie_user, ring_number="MOTHER")
+        chicks = [
+            Bird.objects.create(
+                user=self.pybudgie_user,
+                ring_number="CHICK{}".format(number),
+                father=father,
+                mother=mother,
+            )
+            for number in range(3)
+        ]
+
+        uncompressed = render_bird_tree_pdf(chicks, compress=False)
+        compressed = render_bird_tree_pdf(chicks)
+
+        # The silhouette is an image with a separate transparency mask
+        self.assertEqual(compressed.count(b"/Subtype /Image"), 2)
+        self.assertEqual(compressed.count(b"/Subtype /Form"), 1)
+        # Three cards on each of the three pages, and the image in the form
+        self.assertEqual(
+            len(re.findall(rb"/FormXob\.\w+ Do", _pdf_content(compressed))), 10
+        )
+        self.assertLess(len(compressed), len(uncompressed))
+
+    def test_bird_family_tree_pdf_drawn_in_parallel_is_the_same(self):
+        """Test that drawing the pages in several processes gives the same pages."""
+        father = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="FATHER", notes="Father note"
+        )
+        birds = [father] + [
+            Bird.objects.create(
+                user=self.pybudgie_user,
+                ring_number="CHICK{}".format(number),
+                gender="female",
+                father=father,
+                date_of_birth=datetime.date(2024, 5, number + 1),
+            )
+            for number in range(4)
+        ]
+
+        serial = render_bird_tree_pdf(birds, include_notes=True)
+        parallel = render_bird_tree_pdf(birds, include_notes=True, processes=2)
+
+        self.assertEqual(page_texts(parallel), page_texts(serial))
+        self.assertIn("Father note", page_texts(parallel)[0])
+        # The parts each store the silhouette, the merged PDF keeps one of it
+        self.assertEqual(parallel.count(b"/Subtype /Image"), 2)
+
+    def test_benchmark_family_tree_pdf_command(self):
+        """Test that the benchmark compares both ways of drawing the PDF."""
+        Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK1")
+        Bird.objects.create(user=self.pybudgie_user, ring_number="CHICK2")
+        output = StringIO()
+
+        call_command(
+            "benchmark_family_tree_pdf",
+            "--user",
+            self.pybudgie_user.username,
+            "--processes",
+            "2",
+            stdout=output,
+        )
+
+        lines = output.getvalue().splitlines()
+        self.assertRegex(lines[0], r"^1 process\(es\): 2 page\(s\) in [0-9.]+s")
+        self.assertRegex(lines[1], r"^2 process\(es\): 2 page\(s\) in [0-9.]+s")
+        self.assertEqual(lines[2], "Same pages: True")
 
     def test_bird_excel_export(self):
         """Test if the Excel-export page returns an excel document"""
@@ -512,10 +1042,19 @@ class BirdAppAdminTest(TestCase):
             password=self.user_credentials["password"],
         )
 
-        Bird.objects.create(user=self.pybudgie_user, ring_number="5TJJ-2802-2023"),
+        father = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="5TJJ-2802-2023"
+        )
         Bird.objects.create(user=self.pybudgie_user, ring_number="5TJJ-0801-2021"),
         Bird.objects.create(user=self.pybudgie_user, ring_number="5TJJ-2710-2021"),
-        Bird.objects.create(user=self.pybudgie_user, ring_number="5TJJ-1805-2021"),
+        bird = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="5TJJ-1805-2021", father=father
+        )
+        bird.color_property.add(
+            ColorProperty.objects.create(
+                user=self.pybudgie_user, color_name="Opaline", rank=1
+            )
+        )
 
         view_response = self.client.get(bird_export_url)
         self.assertEqual(view_response.status_code, 200)
@@ -529,6 +1068,15 @@ class BirdAppAdminTest(TestCase):
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
 
+        workbook = openpyxl.load_workbook(
+            BytesIO(b"".join(post_response.streaming_content))
+        )
+        rows = list(workbook.active.values)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2][0], "5TJJ-1805-2021")
+        self.assertEqual(rows[2][3], "Opaline")
+        self.assertEqual(rows[2][5], "5TJJ-2802-2023")
+
     def test_admin_bird_familytree_pdf_urls(self):
         """Test that the family tree detail page exposes PDF actions."""
         self.client.login(
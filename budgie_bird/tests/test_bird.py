@@ -1,3 +1,6 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from django.db.utils import IntegrityError
 
@@ -175,3 +178,72 @@ class BreederModelTest(TestCase):
         self.assertEqual(new_bird.color_props(), "Dominant bont Cinnamon Geelmasker")
         ColorProperty.objects.filter(rank=2).update(rank=100)
         self.assertEqual(new_bird.color_props(), "Dominant bont Geelmasker Cinnamon")
+
+    def test_bird_color_cache(self):
+        """Test if the stored color notation follows the properties and the color"""
+
+        new_bird = Bird.objects.create(
+            user=self.app_user,
+            breeder=self.breeder1,
+            ring_number="5TJJ-81-2018",
+            color=Bird.Color.BLUE,
+        )
+        self.assertEqual(new_bird.color_description, "Hemelsblauw")
+        new_bird.color_property.add(2, 1)
+        new_bird.split_property.add(3)
+
+        new_bird = Bird.objects.get(pk=new_bird.pk)
+        self.assertEqual(new_bird.color_property_names, "Dominant bont Geelmasker")
+        self.assertEqual(new_bird.split_property_names, "Cinnamon")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                new_bird.descriptive_color(),
+                "Dominant bont Geelmasker Hemelsblauw / Cinnamon",
+            )
+
+        # Renaming or reranking a property updates every bird that has it
+        cinnamon = ColorProperty.objects.get(pk=3)
+        cinnamon.color_name = "Kaneel"
+        cinnamon.save()
+        geelmasker = ColorProperty.objects.get(pk=2)
+        geelmasker.rank = 0
+        geelmasker.save()
+        new_bird.refresh_from_db()
+        self.assertEqual(
+            new_bird.color_description, "Geelmasker Dominant bont Hemelsblauw / Kaneel"
+        )
+
+        # As does removing or deleting properties and changing the color
+        geelmasker.color_properties.clear()
+        cinnamon.delete()
+        new_bird.refresh_from_db()
+        self.assertEqual(new_bird.color_description, "Dominant bont Hemelsblauw")
+
+        new_bird.color = Bird.Color.LIGHT_GREEN
+        new_bird.save()
+        self.assertEqual(
+            Bird.objects.filter(color_description__icontains="lichtgroen").get(),
+            new_bird,
+        )
+
+    def test_rebuild_color_cache_command(self):
+        """Test if the command repairs the notation after changes without signals"""
+        new_bird = Bird.objects.create(
+            user=self.app_user,
+            breeder=self.breeder1,
+            ring_number="5TJJ-81-2018",
+            color=Bird.Color.BLUE,
+        )
+        new_bird.color_property.add(1)
+        ColorProperty.objects.filter(pk=1).update(color_name="Bont")
+        Bird.objects.filter(pk=new_bird.pk).update(color=Bird.Color.LIGHT_GREEN)
+        output = StringIO()
+
+        call_command("rebuild_color_cache", stdout=output)
+
+        new_bird.refresh_from_db()
+        self.assertEqual(new_bird.color_description, "Bont Lichtgroen")
+        self.assertIn(
+            "{}: updated the color notation of 1 bird(s)".format(self.app_user),
+            output.getvalue(),
+        )
@@ -0,0 +1,149 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import StringIO
+from multiprocessing import get_context
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from budgie_bird.models import Bird
+from budgie_bird.services.inbreeding import build_kinship, inbreeding_coefficients
+from budgie_user.models import BudgieUser
+
+
+class InbreedingCoefficientTest(TestCase):
+    def setUp(self):
+        self.app_user = BudgieUser.objects.create_user(
+            username="henk", breeding_reg_nr="OMG1337"
+        )
+        self.grandfather = Bird.objects.create(user=self.app_user, ring_number="GF")
+        self.grandmother = Bird.objects.create(user=self.app_user, ring_number="GM")
+        self.brother = Bird.objects.create(
+            user=self.app_user,
+            ring_number="B",
+            father=self.grandfather,
+            mother=self.grandmother,
+        )
+        self.sister = Bird.objects.create(
+            user=self.app_user,
+            ring_number="S",
+            father=self.grandfather,
+            mother=self.grandmother,
+        )
+
+    def test_known_coefficients(self):
+        """Check the textbook values of some common pairings"""
+        parents = {
+            "A": (None, None),
+            "B": (None, None),
+            "C": (None, None),
+            "full_1": ("A", "B"),
+            "full_2": ("A", "B"),
+            "half": ("A", "C"),
+            "full_siblings": ("full_1", "full_2"),
+            "half_siblings": ("full_1", "half"),
+            "parent_child": ("A", "full_2"),
+            "inbred_line": ("full_siblings", "full_2"),
+        }
+        coefficients = inbreeding_coefficients(parents)
+
+        self.assertEqual(coefficients["full_1"], 0)
+        self.assertAlmostEqual(coefficients["full_siblings"], 0.25)
+        self.assertAlmostEqual(coefficients["half_siblings"], 0.125)
+        self.assertAlmostEqual(coefficients["parent_child"], 0.25)
+        self.assertAlmostEqual(coefficients["inbred_line"], 0.375)
+
+    def test_long_and_broken_pedigrees(self):
+        """A deep pedigree doesn't hit the recursion limit, and loops don't hang"""
+        parents = {0: (None, None)}
+        for bird_id in range(1, 5000):
+            parents[bird_id] = (bird_id - 1, max(bird_id - 2, 0))
+        kinship, index = build_kinship(parents)
+        self.assertGreater(kinship.inbreeding[index[4999]], 0.5)
+
+        self.assertEqual(
+            inbreeding_coefficients({1: (2, None), 2: (1, None)}), {1: 0, 2: 0}
+        )
+
+    def test_coefficient_is_stored_and_follows_parent_changes(self):
+        """Check if the stored coefficient is updated for the bird and its descendants"""
+        chick = Bird.objects.create(
+            user=self.app_user, ring_number="CHICK", father=self.brother
+        )
+        grandchick = Bird.objects.create(
+            user=self.app_user,
+            ring_number="GRANDCHICK",
+            father=chick,
+            mother=self.sister,
+        )
+        self.assertEqual(chick.inbreeding_coefficient, 0)
+        grandchick.refresh_from_db()
+        self.assertAlmostEqual(grandchick.inbreeding_coefficient, 0.125)
+
+        chick.mother = self.sister
+        chick.save()
+        self.assertAlmostEqual(chick.inbreeding_coefficient, 0.25)
+        grandchick.refresh_from_db()
+        self.assertAlmostEqual(grandchick.inbreeding_coefficient, 0.375)
+        self.assertEqual(
+            list(
+                Bird.objects.filter(inbreeding_coefficient__gt=0.3).values_list(
+                    "ring_number", flat=True
+                )
+            ),
+            ["GRANDCHICK"],
+        )
+
+        self.sister.delete()
+        chick.refresh_from_db()
+        grandchick.refresh_from_db()
+        self.assertEqual(chick.inbreeding_coefficient, 0)
+        self.assertEqual(grandchick.inbreeding_coefficient, 0)
+
+    def test_recompute_coi_command(self):
+        """Check if the command repairs the coefficients of every flock"""
+        other_user = BudgieUser.objects.create_user(
+            username="piet", breeding_reg_nr="OMG7331"
+        )
+        other_father = Bird.objects.create(user=other_user, ring_number="OF")
+        Bird.objects.create(
+            user=other_user, ring_number="OC", father=other_father, mother=other_father
+        )
+        Bird.objects.create(
+            user=self.app_user,
+            ring_number="CHICK",
+            father=self.brother,
+            mother=self.sister,
+        )
+        Bird.objects.update(inbreeding_coefficient=0.9)
+
+        output = StringIO()
+        call_command("recompute_coi", processes=2, stdout=output)
+
+        self.assertEqual(
+            dict(Bird.objects.values_list("ring_number", "inbreeding_coefficient")),
+            {"GF": 0, "GM": 0, "B": 0, "S": 0, "CHICK": 0.25, "OF": 0, "OC": 0.5},
+        )
+        self.assertIn("henk: 5 bird(s), 5 updated", output.getvalue())
+        self.assertIn("birds/s", output.getvalue())
+
+    def test_recompute_coi_command_with_spawned_workers(self):
+        """The workers don't need Django, so they can also be spawned"""
+        Bird.objects.create(
+            user=self.app_user,
+            ring_number="CHICK",
+            father=self.brother,
+            mother=self.sister,
+        )
+        Bird.objects.update(inbreeding_coefficient=0.9)
+
+        with mock.patch(
+            "budgie_bird.management.commands.recompute_coi.ProcessPoolExecutor",
+            partial(ProcessPoolExecutor, mp_context=get_context("spawn")),
+        ):
+            call_command("recompute_coi", processes=2, stdout=StringIO())
+
+        self.assertEqual(
+            Bird.objects.get(ring_number="CHICK").inbreeding_coefficient, 0.25
+        )
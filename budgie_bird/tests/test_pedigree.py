@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from budgie_bird.models import Bird, BirdAncestor
+from budgie_bird.services.pedigree_loader import PedigreeLoader
+from budgie_user.models import BudgieUser
+
+
+class BirdPedigreeTest(TestCase):
+    def setUp(self):
+        self.app_user = BudgieUser.objects.create_user(
+            username="henk", breeding_reg_nr="OMG1337"
+        )
+        self.grandfather = Bird.objects.create(user=self.app_user, ring_number="GF")
+        self.grandmother = Bird.objects.create(user=self.app_user, ring_number="GM")
+        self.father = Bird.objects.create(
+            user=self.app_user,
+            ring_number="F",
+            father=self.grandfather,
+            mother=self.grandmother,
+        )
+        self.mother = Bird.objects.create(
+            user=self.app_user, ring_number="M", father=self.grandfather
+        )
+        self.chick = Bird.objects.create(
+            user=self.app_user,
+            ring_number="CHICK",
+            father=self.father,
+            mother=self.mother,
+        )
+
+    def links(self, bird):
+        return set(
+            BirdAncestor.objects.filter(bird=bird).values_list(
+                "ancestor__ring_number", "depth", "side"
+            )
+        )
+
+    def test_pedigree_links_are_created_on_save(self):
+        """Check if every path to an ancestor is stored with its generation and side"""
+        self.assertEqual(
+            self.links(self.chick),
+            {
+                ("F", 1, "father"),
+                ("M", 1, "mother"),
+                ("GF", 2, "father"),
+                ("GM", 2, "father"),
+                ("GF", 2, "mother"),
+            },
+        )
+
+    def test_pedigree_links_follow_parent_changes(self):
+        """Check if changing a parent also updates the pedigree of the descendants"""
+        great_grandfather = Bird.objects.create(user=self.app_user, ring_number="GGF")
+        self.grandmother.father = great_grandfather
+        self.grandmother.save()
+
+        self.assertIn(("GGF", 3, "father"), self.links(self.chick))
+
+        self.father.mother = None
+        self.father.save()
+
+        self.assertNotIn(("GGF", 3, "father"), self.links(self.chick))
+        self.assertNotIn(("GM", 2, "father"), self.links(self.chick))
+
+    def test_pedigree_links_follow_deletes(self):
+        """Check if descendants lose the ancestors of a deleted bird"""
+        self.father.delete()
+
+        self.assertEqual(
+            self.links(self.chick), {("M", 1, "mother"), ("GF", 2, "mother")}
+        )
+
+    def test_descendants(self):
+        """Check if all descendants are found in a single query"""
+        with self.assertNumQueries(1):
+            descendants = set(
+                self.grandfather.get_descendants().values_list("ring_number", flat=True)
+            )
+        self.assertEqual(descendants, {"F", "M", "CHICK"})
+
+    def test_family_tree_uses_one_query(self):
+        """Check if the whole family tree is loaded in one query"""
+        with self.assertNumQueries(1):
+            family_tree = self.chick.get_ancestors()
+            self.assertEqual(
+                family_tree["ancestors"]["mother"]["ancestors"]["father"]["bird"],
+                self.grandfather,
+            )
+            self.assertIsNone(family_tree["ancestors"]["mother"]["ancestors"]["mother"])
+
+        family_tree = self.chick.get_ancestors(generations=1)
+        self.assertIsNone(family_tree["ancestors"]["father"]["ancestors"]["father"])
+
+    def test_pedigree_loader_loads_every_bird_once(self):
+        """Check if the loader needs one query per generation"""
+        loader = PedigreeLoader()
+        with self.assertNumQueries(3):
+            chick = loader.load([self.chick.pk])[0]
+            self.assertEqual(chick.descriptive_color(), "")
+
+        father, mother = loader.parents(chick)
+        self.assertIs(loader.father(father), loader.father(mother))
+        self.assertEqual(len(loader.birds), 5)
+
+        with self.assertNumQueries(0):
+            loader.load([self.father, self.mother])
+
+    def test_rebuild_pedigree_command(self):
+        """Check if the pedigree can be rebuilt after changes that bypass save()"""
+        Bird.objects.filter(pk=self.mother.pk).update(father=None)
+        call_command("rebuild_pedigree", stdout=StringIO())
+
+        self.assertEqual(
+            self.links(self.chick),
+            {
+                ("F", 1, "father"),
+                ("M", 1, "mother"),
+                ("GF", 2, "father"),
+                ("GM", 2, "father"),
+            },
+        )
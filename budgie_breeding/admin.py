@@ -1,6 +1,8 @@
 import datetime
 
 from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 from django.db.models import Count
 from django.http import HttpResponseRedirect
 from django.template.response import TemplateResponse
@@ -11,6 +13,7 @@ from django.utils.translation import gettext_lazy as _
 from budgie_bird.models import Bird
 from budgie_user.mixins import BudgieUserMixin
 from .models import BreedingSeason, BreedingCouple, Egg, Location
+from .services.pairing import candidate_pairs
 
 
 class EggInline(BudgieUserMixin, admin.TabularInline):
@@ -71,6 +74,43 @@ class BreedingCoupleAdmin(BudgieUserMixin, admin.ModelAdmin):
     ]
     autocomplete_fields = ["male", "female"]
 
+    change_list_template = "budgie_breeding/admin/breedingcouple_changelist.html"
+
+    def get_urls(self):
+        # Add the pairing planner to the urls of Django Admin
+        urls = super().get_urls()
+        custom_url = [
+            path(
+                "pairings/",
+                self.admin_site.admin_view(self.pairings),
+                name="budgie_breeding_breedingcouple_pairings",
+            )
+        ]
+        return custom_url + urls
+
+    def pairings(self, request):
+        """Expected inbreeding of the offspring for every possible couple"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        pairs = candidate_pairs(request.user)
+        page = Paginator(pairs, 100).get_page(request.GET.get("page"))
+        birds = Bird.objects.in_bulk(
+            {male_id for _coi, male_id, _female_id in page}
+            | {female_id for _coi, _male_id, female_id in page}
+        )
+
+        context = dict(
+            self.admin_site.each_context(request),
+            page=page,
+            pairings=[
+                (coefficient * 100, birds[male_id], birds[female_id])
+                for coefficient, male_id, female_id in page
+            ],
+        )
+        return TemplateResponse(
+            request, "budgie_breeding/admin/breedingcouple_pairings.html", context
+        )
+
     @admin.display(description=_("Breeding couple"))
     def full_name(self, obj):
         return obj.__str__()
@@ -0,0 +1,43 @@
+import hashlib
+
+from django.core.cache import cache
+
+from budgie_bird.models import Bird
+from budgie_bird.services.inbreeding import pair_inbreeding_coefficients
+
+PAIRING_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def candidate_pairs(user):
+    """
+    Expected inbreeding of the offspring of every pairing of the living birds
+    the user owns, lowest first, as (coefficient, male_id, female_id) tuples.
+
+    The result is cached by a hash of the whole flock, so any change to the
+    pedigree or to the owned birds makes a fresh calculation.
+    """
+    rows = list(
+        Bird.objects.filter(user=user)
+        .order_by("pk")
+        .values_list(
+            "pk", "father_id", "mother_id", "gender", "is_owned", "date_of_death"
+        )
+    )
+    digest = hashlib.sha256(repr(rows).encode()).hexdigest()
+    cache_key = "pairing:{}:{}".format(user.pk, digest)
+    pairs = cache.get(cache_key)
+    if pairs is not None:
+        return pairs
+
+    parents = {}
+    candidates = {Bird.Gender.MALE: [], Bird.Gender.FEMALE: []}
+    for bird_id, father_id, mother_id, gender, is_owned, date_of_death in rows:
+        parents[bird_id] = (father_id, mother_id)
+        if is_owned and date_of_death is None and gender in candidates:
+            candidates[gender].append(bird_id)
+
+    pairs = pair_inbreeding_coefficients(
+        parents, candidates[Bird.Gender.MALE], candidates[Bird.Gender.FEMALE]
+    )
+    cache.set(cache_key, pairs, PAIRING_CACHE_TIMEOUT)
+    return pairs
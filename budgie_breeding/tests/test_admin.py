@@ -1,11 +1,11 @@
 import glob
 import os
-from unittest import skip
+from unittest import mock, skip
 
 from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from budgie_bird.models import Breeder, Bird
@@ -25,6 +25,7 @@ class BreedingAppAdminTest(TestCase):
     egg_overview_url = reverse("admin:budgie_breeding_egg_changelist")
     add_egg_url = reverse("admin:budgie_breeding_egg_add")
     bulkadd_egg_url = reverse("admin:budgie_breeding_egg_bulk_add")
+    pairings_url = reverse("admin:budgie_breeding_breedingcouple_pairings")
 
     def setUp(self):
         self.admin_credentials = {
@@ -621,6 +622,114 @@ class BreedingAppAdminTest(TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(1, Egg.objects.count())
 
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_admin_pairings_sorted_by_inbreeding(self):
+        """Test if the pairing planner lists the owned couples, lowest inbreeding first"""
+
+        father = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="FATHER", gender="male"
+        )
+        mother = Bird.objects.create(
+            user=self.pybudgie_user, ring_number="MOTHER", gender="female"
+        )
+        for ring_number, gender in [("SON", "male"), ("DAUGHTER", "female")]:
+            Bird.objects.create(
+                user=self.pybudgie_user,
+                ring_number=ring_number,
+                gender=gender,
+                father=father,
+                mother=mother,
+                is_owned=True,
+            )
+        Bird.objects.create(
+            user=self.pybudgie_user,
+            ring_number="STRANGER",
+            gender="female",
+            is_owned=True,
+        )
+        Bird.objects.create(
+            user=self.pybudgie_admin,
+            ring_number="OTHER",
+            gender="female",
+            is_owned=True,
+        )
+
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        view_page = self.client.get(self.couple_overview_url)
+        self.assertContains(view_page, self.pairings_url)
+
+        # No query per pair: the flock, the birds on the page and the admin basics
+        with self.assertNumQueries(6):
+            view_page = self.client.get(self.pairings_url)
+        self.assertEqual(view_page.status_code, 200)
+        self.assertEqual(
+            [
+                (coefficient, male.ring_number, female.ring_number)
+                for coefficient, male, female in view_page.context["pairings"]
+            ],
+            [(0, "SON", "STRANGER"), (25, "SON", "DAUGHTER")],
+        )
+
+        # The second time the pairings come from the cache
+        with mock.patch(
+            "budgie_breeding.services.pairing.pair_inbreeding_coefficients"
+        ) as calculate:
+            self.client.get(self.pairings_url)
+        calculate.assert_not_called()
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_admin_pairings_query_count_does_not_grow_with_flock(self):
+        """Test if a few hundred birds take as many queries as a small flock"""
+
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        parents = Bird.objects.bulk_create(
+            Bird(
+                user=self.pybudgie_user,
+                ring_number="PARENT-{}".format(number),
+                gender="male" if number % 2 else "female",
+            )
+            for number in range(20)
+        )
+        Bird.objects.bulk_create(
+            Bird(
+                user=self.pybudgie_user,
+                ring_number="CHICK-{}".format(number),
+                gender="male" if number % 2 else "female",
+                father=parents[(number % 10) * 2 + 1],
+                mother=parents[(number % 10) * 2],
+                is_owned=True,
+            )
+            for number in range(300)
+        )
+
+        with self.assertNumQueries(6):
+            view_page = self.client.get(self.pairings_url)
+        self.assertEqual(view_page.status_code, 200)
+        self.assertEqual(view_page.context["page"].paginator.count, 150 * 150)
+        self.assertEqual(len(view_page.context["pairings"]), 100)
+
+    def test_admin_pairings_needs_view_permission(self):
+        """Test if the pairing planner is hidden for users who can't view couples"""
+
+        self.pybudgie_user.user_permissions.clear()
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        view_page = self.client.get(self.pairings_url)
+        self.assertEqual(view_page.status_code, 403)
+
     def test_admin_location_overview(self):
         """Test the location overview"""
 
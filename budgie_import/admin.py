@@ -1,23 +1,66 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils.translation import gettext_lazy as _
 
 from budgie_user.mixins import BudgieUserMixin
+from .forms import ImportFileForm
 from .models import ImportFile
 
-import budgie_import.services.import_from_file
+from .services.import_jobs import (
+    file_hash,
+    find_previous_import,
+    queue_import,
+    reuse_previous_import,
+)
 
 
 @admin.register(ImportFile)
 class ImportFileAdmin(BudgieUserMixin, admin.ModelAdmin):
-    list_display = ["user", "import_file", "completed", "uploaded_date", "notes"]
+    form = ImportFileForm
+    list_display = [
+        "user",
+        "import_file",
+        "status",
+        "import_progress",
+        "uploaded_date",
+        "notes",
+    ]
+    change_list_template = "budgie_import/admin/importfile_changelist.html"
+    actions = ["import_again"]
+
+    # Reload the overview this often (in seconds) while imports are pending
+    progress_refresh = 3
 
     def get_readonly_fields(self, request, obj=None):
         """
         This makes sure the admin doesn't give away the other usernames to non-admins.
         """
+        readonly_fields = [
+            "status",
+            "progress",
+            "started_at",
+            "finished_at",
+            "imported_rows",
+            "checkpoint_at",
+            "heartbeat_at",
+        ]
         if request.user.is_superuser:
-            return {}
+            return readonly_fields
+
+        return ["user"] + readonly_fields
+
+    @admin.display(description=_("Progress"), ordering="progress")
+    def import_progress(self, obj):
+        return "{}%".format(obj.progress)
 
-        return ["user"]
+    def changelist_view(self, request, extra_context=None):
+        pending = self.get_queryset(request).filter(
+            status__in=[ImportFile.Status.QUEUED, ImportFile.Status.RUNNING]
+        )
+        extra_context = {
+            **(extra_context or {}),
+            "progress_refresh": self.progress_refresh if pending.exists() else None,
+        }
+        return super().changelist_view(request, extra_context)
 
     def save_model(self, request, obj, form, change):
         form.save()
@@ -29,21 +72,37 @@ class ImportFileAdmin(BudgieUserMixin, admin.ModelAdmin):
         if not obj.user:
             obj.user = request.user
 
-        if not obj.completed:
-            result = budgie_import.services.import_from_file.import_from_file(
-                obj.import_file.path, obj.user
-            )
-            summary = (
-                result.summary()
-                if hasattr(result, "summary")
-                else "Import completed successfully."
-            )
-            diagnostics = (
-                result.diagnostics_text() if hasattr(result, "diagnostics_text") else ""
-            )
-            report = "\n\n".join(part for part in (summary, diagnostics) if part)
-            if report and (not obj.notes or report not in obj.notes):
-                obj.notes = f"{obj.notes.rstrip()}\n\n{report}" if obj.notes else report
-            obj.completed = True
+        if not change or "import_file" in form.changed_data:
+            obj.content_hash = file_hash(obj.import_file)
+
+        # The import itself runs in the background, see `manage.py run_import_worker`.
+        # Only a new file is queued, the action "Import again" imports a file again.
+        if obj.completed:
+            obj.status = ImportFile.Status.COMPLETED
+        elif not change or "import_file" in form.changed_data:
+            queue_import(obj)
+            obj.card_rows = None
+            # A new upload of a file that was imported before is not imported again
+            previous = None if change else find_previous_import(obj)
+            if previous:
+                reuse_previous_import(obj, previous)
 
         obj.save()
+
+    @admin.action(description=_("Import again"))
+    def import_again(self, request, queryset):
+        """A failed import continues after its last saved row, others start over"""
+        for import_file in queryset.exclude(
+            status__in=[ImportFile.Status.QUEUED, ImportFile.Status.RUNNING]
+        ):
+            if import_file.status == ImportFile.Status.FAILED:
+                import_file.status = ImportFile.Status.QUEUED
+            else:
+                queue_import(import_file)
+            import_file.completed = False
+            import_file.save()
+        messages.add_message(
+            request,
+            messages.SUCCESS,
+            _("Selected import files are queued to be imported again"),
+        )
@@ -0,0 +1,78 @@
+import io
+import zipfile
+from pathlib import Path
+
+from django import forms
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from budgie_import.models import ImportFile
+from budgie_import.services.read_image_with_ai import SUPPORTED_IMAGE_EXTENSIONS
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """A file field that accepts several files at once"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)) and len(data) > 1:
+            return [single_file_clean(file, initial) for file in data]
+        if isinstance(data, (list, tuple)):
+            data = data[0] if data else None
+        return single_file_clean(data, initial)
+
+    def has_changed(self, initial, data):
+        # Without an upload the widget gives an empty list instead of None
+        return super().has_changed(initial, data or None)
+
+
+def pack_cards(files):
+    """Put several photographed breeding cards in a single zip file"""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        for number, file in enumerate(files, start=1):
+            zip_file.writestr(
+                "{:03d}-{}".format(number, Path(file.name).name), file.read()
+            )
+    return SimpleUploadedFile(
+        "breeding-cards-{:%Y%m%d-%H%M%S}.zip".format(timezone.localtime()),
+        archive.getvalue(),
+        content_type="application/zip",
+    )
+
+
+class ImportFileForm(forms.ModelForm):
+    import_file = MultipleFileField(
+        label=ImportFile._meta.get_field("import_file").verbose_name,
+        help_text=ImportFile._meta.get_field("import_file").help_text,
+    )
+
+    class Meta:
+        model = ImportFile
+        exclude = []
+
+    def clean_import_file(self):
+        files = self.cleaned_data["import_file"]
+        if not isinstance(files, list):
+            return files
+
+        for file in files:
+            if Path(file.name).suffix.lower() not in SUPPORTED_IMAGE_EXTENSIONS:
+                raise forms.ValidationError(
+                    _(
+                        "Only photographed breeding cards can be uploaded "
+                        "several at once, %(name)s is not a photo."
+                    ),
+                    params={"name": file.name},
+                    code="invalid",
+                )
+        return pack_cards(files)
@@ -0,0 +1,71 @@
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from budgie_import.services.card_photos import image_to_data_uri
+
+
+def _peak_memory():
+    """Peak resident memory of this process in bytes, Linux reports kilobytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(image_path, max_dimension, max_bytes):
+    """Runs in a fresh process, so the peak memory belongs to this photo only"""
+    baseline = _peak_memory()
+    start = time.perf_counter()
+    data_uri = image_to_data_uri(image_path, max_dimension, max_bytes)
+    return (
+        time.perf_counter() - start,
+        _peak_memory() - baseline,
+        len(data_uri),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the wall time and peak memory of preparing photographed "
+        "breeding cards for OpenAI, one photo at a time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("photos", nargs="+", type=Path)
+        parser.add_argument(
+            "--max-dimension",
+            type=int,
+            default=None,
+            help="Defaults to OPENAI_IMAGE_MAX_DIMENSION",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=None,
+            help="Defaults to OPENAI_IMAGE_MAX_BYTES",
+        )
+
+    def handle(self, *args, **options):
+        max_dimension = options["max_dimension"]
+        if max_dimension is None:
+            max_dimension = int(settings.OPENAI_IMAGE_MAX_DIMENSION or 2000)
+        max_bytes = options["max_bytes"]
+        if max_bytes is None:
+            max_bytes = int(settings.OPENAI_IMAGE_MAX_BYTES or 0)
+
+        # A new process per photo, the peak memory of a process never goes down
+        context = multiprocessing.get_context("spawn")
+        for photo in options["photos"]:
+            with context.Pool(1, maxtasksperchild=1) as pool:
+                seconds, memory, size = pool.apply(
+                    _measure, (str(photo), max_dimension, max_bytes)
+                )
+            self.stdout.write(
+                "{}: {:.3f}s, peak memory {:.1f} MB, data URI {:.0f} KB".format(
+                    photo.name, seconds, memory / 1024 / 1024, size / 1024
+                )
+            )
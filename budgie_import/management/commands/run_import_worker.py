@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from budgie_import.services.import_from_file import IMPORT_BATCH_SIZE
+from budgie_import.services.import_jobs import (
+    claim_next_import,
+    requeue_stale_imports,
+    run_import,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the uploaded import files in the background, the queue is kept "
+        "in the database so several workers can run next to each other"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Stop when the queue is empty, instead of waiting for new uploads",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking an empty queue again",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help="Number of rows that are saved (and committed) at once",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=float,
+            default=30,
+            help=(
+                "Minutes after which a running import without a sign of life is "
+                "considered interrupted, it then continues after its last saved row"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options["stale_after"])
+        while True:
+            requeue_stale_imports(stale_after)
+            import_file = claim_next_import()
+            if import_file is None:
+                if options["once"]:
+                    return
+                time.sleep(options["sleep"])
+                continue
+
+            self.stdout.write("{}: importing {}".format(import_file.user, import_file))
+            start = time.perf_counter()
+            run_import(
+                import_file,
+                chunk_size=options["chunk_size"],
+                # A few beats per stale period, so one late beat doesn't matter
+                heartbeat_interval=stale_after.total_seconds() / 3,
+            )
+            self.stdout.write(
+                "{}: {} in {:.2f}s".format(
+                    import_file, import_file.status, time.perf_counter() - start
+                )
+            )
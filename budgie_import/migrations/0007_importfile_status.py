@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+def set_status_of_earlier_imports(apps, schema_editor):
+    # Earlier imports ran while uploading, so they are either done or failed
+    ImportFile = apps.get_model("budgie_import", "ImportFile")
+    ImportFile.objects.filter(completed=True).update(
+        status="completed", progress=100, finished_at=models.F("uploaded_date")
+    )
+    ImportFile.objects.filter(completed=False).update(status="failed")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_import", "0006_alter_importfile_import_file"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="finished_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Finished at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="progress",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="The percentage of the rows that has been imported",
+                verbose_name="Progress",
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Started at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("running", "Running"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                default="queued",
+                max_length=10,
+                verbose_name="Status",
+            ),
+        ),
+        migrations.RunPython(set_status_of_earlier_imports, migrations.RunPython.noop),
+    ]
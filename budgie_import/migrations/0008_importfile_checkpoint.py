@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_import", "0007_importfile_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="checkpoint_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Last saved rows at"
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="imported_rows",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The rows up to here are saved, an interrupted import continues after it",
+                verbose_name="Imported rows",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_import", "0008_importfile_checkpoint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="content_hash",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="SHA-256 of the file, to recognize a file that is uploaded again",
+                max_length=64,
+                verbose_name="Content hash",
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="result",
+            field=models.JSONField(
+                blank=True, editable=False, null=True, verbose_name="Import result"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="importfile",
+            index=models.Index(
+                fields=["user", "content_hash"], name="budgie_impo_user_id_b7f9c5_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+import django.core.files.storage.filesystem
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_import", "0009_importfile_content_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importfile",
+            name="import_file",
+            field=models.FileField(
+                help_text="Upload an Excel file (.xlsx or .csv), ZooEasy file (.zoo), or photographed breeding cards (.jpg, .jpeg, or .png, several at once or as a .zip file) to import new birds or update them",
+                storage=django.core.files.storage.filesystem.FileSystemStorage,
+                upload_to="assets/uploads/import",
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        ["csv", "xlsx", "zoo", "jpg", "jpeg", "png", "zip"]
+                    )
+                ],
+                verbose_name="Import file",
+            ),
+        ),
+    ]
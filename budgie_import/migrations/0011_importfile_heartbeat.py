@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("budgie_import", "0010_importfile_zip"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="card_rows",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                null=True,
+                verbose_name="Rows read from the breeding cards",
+            ),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="heartbeat_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Updated by the worker while the import is running",
+                null=True,
+                verbose_name="Last sign of life at",
+            ),
+        ),
+    ]
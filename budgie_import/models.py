@@ -10,6 +10,12 @@ from budgie_user.models import BudgieUser
 class ImportFile(models.Model):
     """This represents all the import-uploads of a user, to complement/change their inventory"""
 
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        COMPLETED = "completed", _("Completed")
+        FAILED = "failed", _("Failed")
+
     user = models.ForeignKey(
         BudgieUser, on_delete=models.CASCADE, null=True, blank=True
     )
@@ -17,11 +23,11 @@ class ImportFile(models.Model):
         verbose_name=_("Import file"),
         help_text=_(
             "Upload an Excel file (.xlsx or .csv), ZooEasy file (.zoo), "
-            "or photographed breeding card (.jpg, .jpeg, or .png) "
-            "to import new birds or update them"
+            "or photographed breeding cards (.jpg, .jpeg, or .png, "
+            "several at once or as a .zip file) to import new birds or update them"
         ),
         validators=[
-            FileExtensionValidator(["csv", "xlsx", "zoo", "jpg", "jpeg", "png"])
+            FileExtensionValidator(["csv", "xlsx", "zoo", "jpg", "jpeg", "png", "zip"])
         ],
         upload_to=settings.BIRD_EXCELFILE_UPLOAD_LOCATION,
         storage=FileSystemStorage,
@@ -32,6 +38,56 @@ class ImportFile(models.Model):
     completed = models.BooleanField(
         verbose_name=_("Completed successfully"), default=False
     )
+    status = models.CharField(
+        choices=Status.choices,
+        max_length=10,
+        default=Status.QUEUED,
+        db_index=True,
+        verbose_name=_("Status"),
+    )
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Progress"),
+        help_text=_("The percentage of the rows that has been imported"),
+    )
+    started_at = models.DateTimeField(
+        verbose_name=_("Started at"), null=True, blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name=_("Finished at"), null=True, blank=True
+    )
+    imported_rows = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Imported rows"),
+        help_text=_(
+            "The rows up to here are saved, an interrupted import continues after it"
+        ),
+    )
+    checkpoint_at = models.DateTimeField(
+        verbose_name=_("Last saved rows at"), null=True, blank=True
+    )
+    heartbeat_at = models.DateTimeField(
+        verbose_name=_("Last sign of life at"),
+        null=True,
+        blank=True,
+        help_text=_("Updated by the worker while the import is running"),
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name=_("Content hash"),
+        help_text=_("SHA-256 of the file, to recognize a file that is uploaded again"),
+    )
+    result = models.JSONField(
+        null=True, blank=True, editable=False, verbose_name=_("Import result")
+    )
+    card_rows = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Rows read from the breeding cards"),
+    )
     notes = models.TextField(
         verbose_name=_("Notes after import"),
         help_text=_(
@@ -47,5 +103,6 @@ class ImportFile(models.Model):
 
     class Meta:
         ordering = ["uploaded_date"]
+        indexes = [models.Index(fields=["user", "content_hash"])]
         verbose_name = _("Import file")
         verbose_name_plural = _("Import files")
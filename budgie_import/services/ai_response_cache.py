@@ -0,0 +1,123 @@
+"""On-disk cache for the responses of the OpenAI breeding-card reader."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes of responses per cache directory as far as this process knows
+_cache_sizes = {}
+_cache_sizes_lock = threading.Lock()
+
+
+def response_cache_key(data_uri, model, prompt_version):
+    """The image is hashed as it is sent, so every photo of a card gets its own key"""
+    return hashlib.sha256(
+        f"{model}\0{prompt_version}\0{data_uri}".encode("ascii")
+    ).hexdigest()
+
+
+def _cache_dir():
+    return Path(settings.OPENAI_RESPONSE_CACHE_DIR)
+
+
+def _cache_path(key):
+    return _cache_dir() / key[:2] / f"{key}.json"
+
+
+def _cache_enabled():
+    return bool(settings.OPENAI_RESPONSE_CACHE_DIR) and (
+        settings.OPENAI_RESPONSE_CACHE_MAX_SIZE > 0
+    )
+
+
+def get_cached_response(key):
+    """The cached response, or None. A hit counts as a use for the eviction."""
+    if not _cache_enabled():
+        return None
+    path = _cache_path(key)
+    try:
+        with open(path, encoding="utf-8") as file:
+            response = json.load(file)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return response
+
+
+def cache_response(key, response):
+    """
+    Store the response and evict the least recently used ones over the size
+    limit. A response that can't be stored is logged, the import goes on.
+    """
+    if not _cache_enabled():
+        return
+    path = _cache_path(key)
+    temp_path = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so a reader never sees half a response
+        handle, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(response, file)
+        replaced_size = path.stat().st_size if path.exists() else 0
+        os.replace(temp_path, path)
+        size = path.stat().st_size
+    except OSError as error:
+        logger.warning("Could not cache the OpenAI response %s: %s", key, error)
+        if temp_path:
+            Path(temp_path).unlink(missing_ok=True)
+        return
+    _add_to_cache_size(size - replaced_size)
+
+
+def _add_to_cache_size(size):
+    """
+    The size of the cache is counted once and then kept up to date, so the
+    responses are only listed again when they have to be evicted. What other
+    processes store is counted at that next eviction.
+    """
+    max_size = settings.OPENAI_RESPONSE_CACHE_MAX_SIZE
+    cache_dir = _cache_dir()
+    with _cache_sizes_lock:
+        if cache_dir in _cache_sizes:
+            _cache_sizes[cache_dir] += size
+        else:
+            _cache_sizes[cache_dir] = sum(
+                entry_size for _mtime, entry_size, _path in _entries()
+            )
+        if _cache_sizes[cache_dir] > max_size:
+            _cache_sizes[cache_dir] = evict_responses(max_size)
+
+
+def _entries():
+    entries = []
+    for path in _cache_dir().glob("*/*.json"):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def evict_responses(max_size):
+    """
+    Remove the least recently used responses until the cache fits ``max_size``
+    bytes. Returns the size of the responses that are left.
+    """
+    entries = _entries()
+    total = sum(size for _mtime, size, _path in entries)
+    for _mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if total <= max_size:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    return total
@@ -0,0 +1,85 @@
+"""
+Prepares photographed breeding cards for OpenAI. This module doesn't use
+Django, so the processes that convert the photos can be started in any way.
+"""
+
+import base64
+import io
+
+from PIL import Image, ImageOps
+
+# Photos that shrink more than this factor are resized with a cheaper filter
+_LARGE_DOWNSCALE = 2
+# Qualities that are tried, one after the other, to fit OPENAI_IMAGE_MAX_BYTES
+_JPEG_QUALITIES = (92, 85, 75, 65)
+# A card is not readable anymore below this size, so it's sent as it is
+_MIN_DIMENSION = 800
+
+
+def image_to_data_uri(image_path, max_dimension, max_bytes):
+    """
+    The photo as a JPEG data URI of at most ``max_dimension`` pixels wide and
+    high, and when possible at most ``max_bytes`` bytes. A JPEG photo is decoded
+    at a reduced scale straight away, so the full photo is never in memory.
+    """
+    with Image.open(image_path) as image:
+        if max_dimension > 0:
+            # Decodes at 1/2, 1/4 or 1/8 of the size, but never below the size
+            # that is asked for. Other formats than JPEG ignore this.
+            image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if max_dimension > 0:
+            _downscale(image, max_dimension)
+        data = _encode_jpeg(image, max_bytes)
+    encoded = base64.b64encode(data).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def card_data_uri(image_path, max_dimension, max_bytes):
+    """The data URI of a card, or the reason it can't be read"""
+    try:
+        return image_to_data_uri(image_path, max_dimension, max_bytes), None
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        return None, f"Image could not be read: {error}"
+
+
+def _downscale(image, max_dimension):
+    """Shrink the image in place, large steps are done with a cheaper filter"""
+    scale = max(image.size) / max_dimension
+    if scale <= 1:
+        return
+    if scale > _LARGE_DOWNSCALE:
+        # LANCZOS hardly looks better than BICUBIC when shrinking this much,
+        # while it takes a lot more time on a full size photo
+        resample = Image.Resampling.BICUBIC
+    else:
+        resample = Image.Resampling.LANCZOS
+    image.thumbnail(
+        (max_dimension, max_dimension), resample, reducing_gap=_LARGE_DOWNSCALE
+    )
+
+
+def _encode_jpeg(image, max_bytes):
+    """
+    Lower the quality until the JPEG fits within ``max_bytes``, shrink the
+    image when even the lowest quality doesn't fit
+    """
+    while True:
+        for quality in _JPEG_QUALITIES:
+            buf = io.BytesIO()
+            image.save(buf, format="JPEG", quality=quality)
+            if not max_bytes or buf.tell() <= max_bytes:
+                return buf.getvalue()
+        if max(image.size) <= _MIN_DIMENSION:
+            return buf.getvalue()
+        # The size of a JPEG goes roughly with the number of pixels
+        factor = max(
+            min((max_bytes / buf.tell()) ** 0.5, 0.9),
+            _MIN_DIMENSION / max(image.size),
+        )
+        image = image.resize(
+            (max(1, int(image.width * factor)), max(1, int(image.height * factor))),
+            Image.Resampling.BICUBIC,
+        )
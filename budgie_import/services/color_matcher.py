@@ -0,0 +1,83 @@
+from collections import deque
+
+
+class ColorMatcher:
+    """
+    Finds the base color and the color properties that occur in the color
+    ("kleur") of an import row, in a single pass over the text.
+
+    All names are compiled into one Aho-Corasick automaton, which also finds
+    names that overlap or contain each other, like "Grijs" in "Grijsvleugel".
+    Breeding files repeat the same colors over and over, so the outcome per
+    text is remembered.
+    """
+
+    def __init__(self, colors, color_properties):
+        """
+        ``colors`` are the (value, label) choices of the base color, the first
+        one that matches is used. ``color_properties`` are (key, name) pairs,
+        all that match are returned, in the given order.
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._always = []
+        self._matches = {}
+
+        for index, (value, label) in enumerate(colors):
+            self._add(str(label).lower(), (0, index, value))
+        for index, (key, name) in enumerate(color_properties):
+            self._add(name.lower(), (1, index, key))
+        self._build()
+
+    def _add(self, word, match):
+        if not word:
+            # An empty name is part of every text
+            self._always.append(match)
+            return
+        node = 0
+        for char in word:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append(match)
+
+    def _build(self):
+        """Link every node to the longest suffix of it that is a node as well"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+                queue.append(child)
+
+    def _search(self, text):
+        found = set(self._always)
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            found.update(self._output[node])
+        return found
+
+    def match(self, text):
+        """The matching color (or None) and the keys of the matching properties"""
+        text = text.lower()
+        if text not in self._matches:
+            found = sorted(self._search(text))
+            colors = [value for kind, _index, value in found if kind == 0]
+            self._matches[text] = (
+                colors[0] if colors else None,
+                [key for kind, _index, key in found if kind == 1],
+            )
+        return self._matches[text]
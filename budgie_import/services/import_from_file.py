@@ -2,12 +2,38 @@ from collections.abc import Mapping
 from dataclasses import dataclass, field
 import json
 from datetime import datetime
+from itertools import islice
 
 import budgie_import.services.read_csv
 import budgie_import.services.read_xlsx
 import budgie_import.services.read_zooeasy
 import budgie_import.services.read_image_with_ai
+from django.db import transaction
+
 from budgie_bird.models import Bird, Breeder, ColorProperty
+from budgie_bird.services.color_cache import refresh_color_cache
+from budgie_bird.services.facet_cache import invalidate_facet_counts
+from budgie_bird.services.inbreeding import update_inbreeding_coefficients
+from budgie_bird.services.pedigree import rebuild_ancestor_links
+from budgie_import.services.color_matcher import ColorMatcher
+
+# Rows per bulk insert or update
+IMPORT_BATCH_SIZE = 500
+
+# The bird fields an import row can change
+IMPORT_FIELDS = [
+    "mother",
+    "father",
+    "gender",
+    "date_of_birth",
+    "date_of_death",
+    "breeder",
+    "is_owned",
+    "owner",
+    "notes",
+    "color",
+    "color_description",
+]
 
 
 @dataclass
@@ -83,36 +109,187 @@ class ImportResult:
         return " ".join(parts)
 
 
-def import_from_file(file_path, user):
+def import_from_file(
+    file_path,
+    user,
+    progress=None,
+    chunk_size=None,
+    start_row=0,
+    checkpoint=None,
+    card_rows=None,
+    save_card_rows=None,
+):
+    """
+    Import the birds in the file for the user. The readers yield the rows one
+    by one, so only a chunk of rows is kept in memory. ``progress`` is called
+    with what has been read so far and the total, in bytes or in rows.
+
+    Every chunk of rows is committed on its own, see `BirdImporter.import_rows`
+    for resuming an import with ``start_row`` and ``checkpoint``.
+
+    The rows read from breeding card photos are passed to ``save_card_rows``
+    before they are imported. A resumed import passes them back as
+    ``card_rows``, so the photos are not sent to OpenAI again.
+    """
     file_type = file_path.rsplit(".", 1)[-1].lower() if "." in file_path else ""
     image_result = None
 
     if file_type == "xlsx":
         bird_import_rows = budgie_import.services.read_xlsx.read_xlsx(
-            file_path, header=True
+            file_path, progress=progress, header=True
         )
     elif file_type == "csv":
         bird_import_rows = budgie_import.services.read_csv.read_csv(
-            file_path, header=True
+            file_path, progress=progress, header=True
         )
     elif file_type == "zoo":
-        bird_import_rows = budgie_import.services.read_zooeasy.read_zooeasy(file_path)
+        bird_import_rows = budgie_import.services.read_zooeasy.read_zooeasy(
+            file_path, progress=progress
+        )
     elif (
         f".{file_type}"
         in budgie_import.services.read_image_with_ai.SUPPORTED_IMAGE_EXTENSIONS
+        or file_type == "zip"
     ):
-        image_result = budgie_import.services.read_image_with_ai.read_image(
-            file_path, user.breeding_reg_nr
-        )
-        bird_import_rows = image_result
+        if card_rows is not None:
+            image_result = budgie_import.services.read_image_with_ai.OpenAIImportResult(
+                **card_rows
+            )
+        else:
+            image_result = _read_cards(file_path, file_type, user)
+            if save_card_rows:
+                save_card_rows(
+                    {
+                        "rows": list(image_result),
+                        "diagnostics": image_result.diagnostics,
+                    }
+                )
+        bird_import_rows = _counted(image_result, progress)
     else:
-        raise ValueError("No valid .xlsx, .csv, .zoo, .jpg, .jpeg, or .png file found.")
+        raise ValueError(
+            "No valid .xlsx, .csv, .zoo, .jpg, .jpeg, .png, or .zip file found."
+        )
 
     result = ImportResult()
     if hasattr(image_result, "diagnostics"):
         result.diagnostics = image_result.diagnostics
-    for row_number, import_bird in enumerate(bird_import_rows, start=1):
-        row_result = import_or_update_bird(import_bird, user)
+
+    return BirdImporter(user).import_rows(
+        bird_import_rows,
+        result,
+        chunk_size=chunk_size,
+        start_row=start_row,
+        checkpoint=checkpoint,
+    )
+
+
+def _read_cards(file_path, file_type, user):
+    """The rows read with OpenAI from a breeding card photo or a zip file of them"""
+    if file_type == "zip":
+        return budgie_import.services.read_image_with_ai.read_card_archive(
+            file_path, user.breeding_reg_nr
+        )
+    return budgie_import.services.read_image_with_ai.read_image(
+        file_path, user.breeding_reg_nr
+    )
+
+
+def _counted(rows, progress=None):
+    """Yield the rows of a list, reporting the progress per row"""
+    for row_number, row in enumerate(rows, start=1):
+        yield row
+        if progress:
+            progress(row_number, len(rows))
+
+
+def import_or_update_bird(bird_data, user, importer=None):
+    """
+    Import a single row, see `BirdImporter` for importing many rows at once.
+
+    Pass the same ``importer`` for every row of an import, so the birds,
+    breeders and color properties of the user are only loaded once.
+    """
+    importer = importer or BirdImporter(user)
+    row_result = importer.import_row(bird_data)
+    importer.save()
+    return row_result
+
+
+class BirdImporter:
+    """
+    Imports rows set-based: the birds, breeders and color properties of the
+    user are loaded once, every row is applied in memory and the changes are
+    written with a handful of bulk queries when calling `save()`.
+
+    The rows are applied in order, with the same outcome as saving them one
+    by one: a parent that doesn't exist yet is created, and a later row for
+    that parent updates it.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.birds = {bird.ring_number: bird for bird in Bird.objects.filter(user=user)}
+        self.original_parents = {
+            bird.pk: (bird.father_id, bird.mother_id) for bird in self.birds.values()
+        }
+        self.breeders = list(Breeder.objects.filter(user=user).order_by("pk"))
+        self.breeders_by_reg_nr = {}
+        for breeder in self.breeders:
+            self.breeders_by_reg_nr.setdefault(breeder.breeding_reg_nr, breeder)
+        self.color_matcher = ColorMatcher(
+            Bird.Color.choices,
+            ColorProperty.objects.filter(user=user)
+            .order_by("rank")
+            .values_list("pk", "color_name"),
+        )
+        self.new_birds = []
+        self.new_breeders = []
+        self.changed_birds = {}
+        self.new_color_properties = {}
+
+    def get_or_create_bird(self, ring_number, **defaults):
+        if ring_number in self.birds:
+            return self.birds[ring_number], False
+        bird = Bird(user=self.user, ring_number=ring_number, **defaults)
+        self.birds[ring_number] = bird
+        self.new_birds.append(bird)
+        return bird, True
+
+    def get_or_create_breeder(self, breeding_reg_nr, **defaults):
+        if breeding_reg_nr not in self.breeders_by_reg_nr:
+            breeder = Breeder(
+                user=self.user, breeding_reg_nr=breeding_reg_nr, **defaults
+            )
+            self.breeders.append(breeder)
+            self.breeders_by_reg_nr[breeding_reg_nr] = breeder
+            self.new_breeders.append(breeder)
+        return self.breeders_by_reg_nr[breeding_reg_nr]
+
+    def import_rows(
+        self, bird_import_rows, result, chunk_size=None, start_row=0, checkpoint=None
+    ):
+        """
+        Apply all rows to `result` (an `ImportResult`) and save them, in chunks
+        of ``chunk_size`` rows that are committed one by one.
+        ``bird_import_rows`` can be any iterable, it is consumed lazily.
+
+        The first ``start_row`` rows are skipped, they were committed by an
+        earlier run. ``checkpoint`` is called with the last row number and
+        the result, within the transaction of every chunk.
+        """
+        rows = islice(enumerate(bird_import_rows, start=1), start_row, None)
+        while chunk := list(islice(rows, chunk_size or IMPORT_BATCH_SIZE)):
+            with transaction.atomic():
+                for row_number, import_bird in chunk:
+                    self.import_result_row(result, row_number, import_bird)
+                self.save()
+                if checkpoint:
+                    checkpoint(row_number, result)
+        return result
+
+    def import_result_row(self, result, row_number, import_bird):
+        """Import a single row and add its outcome to `result`"""
+        row_result = self.import_row(import_bird)
         if not row_result:
             result.skipped_rows.append(
                 {
@@ -121,7 +298,7 @@ def import_from_file(file_path, user):
                     "reason": row_result.skipped_reason,
                 }
             )
-            continue
+            return
 
         result.imported_ring_numbers.append(row_result.ring_number)
         if row_result.created:
@@ -130,131 +307,192 @@ def import_from_file(file_path, user):
             result.updated_ring_numbers.append(row_result.ring_number)
         result.warnings.extend(row_result.warnings)
 
-    return result
+    def import_row(self, bird_data):
+        if not isinstance(bird_data, Mapping):
+            return ImportRowResult(
+                imported=False,
+                skipped_reason="row is not a mapping",
+            )
 
+        ring_number = bird_data.get("ringnummer")
+        if not isinstance(ring_number, str) or not ring_number.strip():
+            return ImportRowResult(
+                imported=False,
+                ring_number=ring_number,
+                skipped_reason="missing ring number",
+            )
+        ring_number = ring_number.strip()
 
-def import_or_update_bird(bird_data, user):
-    if not isinstance(bird_data, Mapping):
-        return ImportRowResult(
-            imported=False,
-            skipped_reason="row is not a mapping",
-        )
+        bird, created = self.get_or_create_bird(ring_number)
+        warnings = []
 
-    ring_number = bird_data.get("ringnummer")
-    if not isinstance(ring_number, str) or not ring_number.strip():
-        return ImportRowResult(
-            imported=False,
-            ring_number=ring_number,
-            skipped_reason="missing ring number",
-        )
-    ring_number = ring_number.strip()
-
-    bird, created = Bird.objects.get_or_create(user=user, ring_number=ring_number)
-    warnings = []
-
-    # Mother
-    if "moeder" in bird_data:
-        bird.mother = Bird.objects.get_or_create(
-            user=user,
-            ring_number=bird_data["moeder"],
-            defaults={"gender": Bird.Gender.FEMALE},
-        )[0]
-
-    # Father
-    if "vader" in bird_data:
-        bird.father = Bird.objects.get_or_create(
-            user=user, ring_number=bird_data["vader"]
-        )[0]
-
-    # Gender
-    if "geslacht" in bird_data:
-        gender_value = bird_data["geslacht"].lower()
-        if gender_value in {"pop", "female", "vrouw", "1"}:
-            bird.gender = Bird.Gender.FEMALE
-        if gender_value in {"man", "male", "0"}:
-            bird.gender = Bird.Gender.MALE
-
-    # Birth date
-    if "geboren" in bird_data and bird_data["geboren"]:
-        try:
-            bird.date_of_birth = datetime.strptime(
-                bird_data["geboren"], "%d-%m-%Y"
-            ).date()
-        except ValueError as error:
-            warnings.append(f"invalid birth date ({error})")
-
-    # Death date
-    if "overleden" in bird_data and bird_data["overleden"]:
-        try:
-            bird.date_of_death = datetime.strptime(
-                bird_data["overleden"], "%d-%m-%Y"
-            ).date()
-        except ValueError as error:
-            print("ERROR: ", error)
-            pass
-
-    # Breeder
-    if "kweker" in bird_data:
-        if "onbekend" not in bird_data["kweker"].lower():
-            try:
-                last_name = bird_data["kweker"].split(",")[0]
-                first_name = bird_data["kweker"].split(",")[1].strip()
-            except IndexError:
-                last_name = bird_data["kweker"]
-                first_name = ""
-
-            bird.breeder = Breeder.objects.get_or_create(
-                user=user,
-                breeding_reg_nr=ring_number.split("-")[0],
-                defaults={
-                    "last_name": last_name,
-                    "first_name": first_name,
-                },
+        # Mother
+        if "moeder" in bird_data:
+            bird.mother = self.get_or_create_bird(
+                bird_data["moeder"], gender=Bird.Gender.FEMALE
             )[0]
 
-    # Is the bird currently owned?
-    if "in bezit" in bird_data and bird_data["in bezit"].lower() == "ja":
-        bird.is_owned = True
+        # Father
+        if "vader" in bird_data:
+            bird.father = self.get_or_create_bird(bird_data["vader"])[0]
 
-    # Owner
-    if "eigenaar" in bird_data:
-        possible_owners = Breeder.objects.filter(
-            user=user, last_name__icontains=bird_data["eigenaar"].split(",")[0]
-        )
-
-        if possible_owners.count() > 1:
-            possible_owners.filter(
-                first_name__icontains=bird_data["eigenaar"].split(",")[1]
-            )
+        # Gender
+        if "geslacht" in bird_data:
+            gender_value = bird_data["geslacht"].lower()
+            if gender_value in {"pop", "female", "vrouw", "1"}:
+                bird.gender = Bird.Gender.FEMALE
+            if gender_value in {"man", "male", "0"}:
+                bird.gender = Bird.Gender.MALE
 
-        if possible_owners.count() == 1:
-            bird.owner = possible_owners[0]
+        # Birth date
+        if "geboren" in bird_data and bird_data["geboren"]:
+            try:
+                bird.date_of_birth = datetime.strptime(
+                    bird_data["geboren"], "%d-%m-%Y"
+                ).date()
+            except ValueError as error:
+                warnings.append(f"invalid birth date ({error})")
+
+        # Death date
+        if "overleden" in bird_data and bird_data["overleden"]:
+            try:
+                bird.date_of_death = datetime.strptime(
+                    bird_data["overleden"], "%d-%m-%Y"
+                ).date()
+            except ValueError as error:
+                warnings.append(f"invalid death date ({error})")
+
+        # Breeder
+        if "kweker" in bird_data:
+            if "onbekend" not in bird_data["kweker"].lower():
+                try:
+                    last_name = bird_data["kweker"].split(",")[0]
+                    first_name = bird_data["kweker"].split(",")[1].strip()
+                except IndexError:
+                    last_name = bird_data["kweker"]
+                    first_name = ""
+
+                bird.breeder = self.get_or_create_breeder(
+                    ring_number.split("-")[0],
+                    last_name=last_name,
+                    first_name=first_name,
+                )
+
+        # Is the bird currently owned?
+        if "in bezit" in bird_data and bird_data["in bezit"].lower() == "ja":
+            bird.is_owned = True
+
+        # Owner, only when the last name points to a single breeder
+        if "eigenaar" in bird_data:
+            last_name = bird_data["eigenaar"].split(",")[0].lower()
+            possible_owners = [
+                breeder
+                for breeder in self.breeders
+                if last_name in breeder.last_name.lower()
+            ]
+            if len(possible_owners) == 1:
+                bird.owner = possible_owners[0]
+
+        if "notes" in bird_data:
+            bird.notes = bird_data["notes"]
+
+        # All sorts of colors and properties
+        if "kleur" in bird_data:
+            # Primary color and color properties
+            color, color_prop_ids = self.color_matcher.match(bird_data["kleur"])
+            if color:
+                bird.color = color
+            if color_prop_ids:
+                self.new_color_properties.setdefault(ring_number, set()).update(
+                    color_prop_ids
+                )
+
+        self.changed_birds[ring_number] = bird
 
-    if "notes" in bird_data:
-        bird.notes = bird_data["notes"]
+        return ImportRowResult(
+            imported=True,
+            ring_number=ring_number,
+            created=created,
+            warnings=warnings,
+        )
 
-    # All sorts of colors and properties
-    if "kleur" in bird_data:
-        # Primary color
-        for color in Bird.Color.choices:
-            if color[1].lower() in bird_data["kleur"].lower():
-                bird.color = color[0]
-                break
+    def save(self):
+        """
+        Write all imported rows. Bulk queries don't send signals, so the
+        pedigree, inbreeding coefficients and color and facet caches are
+        updated here.
+        """
+        with transaction.atomic():
+            Breeder.objects.bulk_create(self.new_breeders, batch_size=IMPORT_BATCH_SIZE)
+            self._fetch_missing_pks(Breeder, self.new_breeders, "breeding_reg_nr")
+
+            # Parents can be new birds themselves, so insert the new birds
+            # bare and fill in all fields (and relations) in the update
+            inserted = Bird.objects.bulk_create(
+                [
+                    Bird(user=self.user, ring_number=bird.ring_number)
+                    for bird in self.new_birds
+                ],
+                batch_size=IMPORT_BATCH_SIZE,
+            )
+            for bird, inserted_bird in zip(self.new_birds, inserted):
+                bird.pk = inserted_bird.pk
+            self._fetch_missing_pks(Bird, self.new_birds, "ring_number")
+
+            birds = {bird.pk: bird for bird in self.new_birds}
+            birds.update((bird.pk, bird) for bird in self.changed_birds.values())
+            for bird in birds.values():
+                bird._state.adding = False
+                bird.update_color_description()
+            Bird.objects.bulk_update(
+                birds.values(), IMPORT_FIELDS, batch_size=IMPORT_BATCH_SIZE
+            )
 
-        # Color properties
-        matched_color_props = []
-        for color_prop in ColorProperty.objects.filter(user=user).order_by("rank"):
-            if color_prop.color_name.lower() in bird_data["kleur"].lower():
-                matched_color_props.append(color_prop)
+            Bird.color_property.through.objects.bulk_create(
+                [
+                    Bird.color_property.through(
+                        bird_id=self.birds[ring_number].pk,
+                        colorproperty_id=color_prop_id,
+                    )
+                    for ring_number, color_prop_ids in self.new_color_properties.items()
+                    for color_prop_id in color_prop_ids
+                ],
+                batch_size=IMPORT_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+            refresh_color_cache(
+                Bird.objects.filter(
+                    pk__in=[
+                        self.birds[ring_number].pk
+                        for ring_number in self.new_color_properties
+                    ]
+                )
+            )
 
-        for matched_color_prop in matched_color_props:
-            bird.color_property.add(matched_color_prop)
+            update_inbreeding_coefficients(
+                rebuild_ancestor_links(
+                    [
+                        bird.pk
+                        for bird in birds.values()
+                        if self.original_parents.get(bird.pk, (None, None))
+                        != (bird.father_id, bird.mother_id)
+                    ]
+                )
+            )
 
-    bird.save()
+        invalidate_facet_counts(self.user.pk)
 
-    return ImportRowResult(
-        imported=True,
-        ring_number=ring_number,
-        created=created,
-        warnings=warnings,
-    )
+        self.original_parents.update(
+            (bird.pk, (bird.father_id, bird.mother_id)) for bird in birds.values()
+        )
+        self.new_birds, self.new_breeders = [], []
+        self.changed_birds, self.new_color_properties = {}, {}
+
+    def _fetch_missing_pks(self, model, objects, field_name):
+        """Not every database hands back the primary keys of a bulk insert"""
+        missing = {getattr(obj, field_name): obj for obj in objects if obj.pk is None}
+        if missing:
+            for value, pk in model.objects.filter(
+                user=self.user, **{f"{field_name}__in": missing}
+            ).values_list(field_name, "pk"):
+                missing[value].pk = pk
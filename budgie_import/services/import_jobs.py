@@ -0,0 +1,240 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict, is_dataclass
+
+from django.db import connection
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+import budgie_import.services.import_from_file
+from budgie_bird.models import Bird
+from budgie_import.models import ImportFile
+from budgie_import.services.import_from_file import ImportResult
+
+
+def queue_import(import_file):
+    """
+    Put the import file (back) in the queue, `run_import_worker` picks it up.
+    The rows that were read from its breeding cards are kept, they belong to
+    the file.
+    """
+    import_file.status = ImportFile.Status.QUEUED
+    import_file.progress = 0
+    import_file.started_at = None
+    import_file.finished_at = None
+    import_file.imported_rows = 0
+    import_file.checkpoint_at = None
+    import_file.heartbeat_at = None
+
+
+def file_hash(file):
+    """The SHA-256 of an uploaded file, read in chunks"""
+    content_hash = hashlib.sha256()
+    file.open("rb")
+    for chunk in file.chunks():
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def find_previous_import(import_file):
+    """
+    The last completed import of the user with exactly the same content, as
+    long as the birds it imported still exist
+    """
+    previous = (
+        ImportFile.objects.filter(
+            user=import_file.user,
+            content_hash=import_file.content_hash,
+            status=ImportFile.Status.COMPLETED,
+            result__isnull=False,
+        )
+        .exclude(pk=import_file.pk)
+        .order_by("-finished_at")
+        .first()
+    )
+    if previous is None:
+        return None
+
+    ring_numbers = set(previous.result.get("imported_ring_numbers", []))
+    existing = Bird.objects.filter(
+        user=import_file.user, ring_number__in=ring_numbers
+    ).count()
+    return previous if existing == len(ring_numbers) else None
+
+
+def reuse_previous_import(import_file, previous):
+    """
+    Complete the import file with the result of an earlier upload of the same
+    content, the file is not read again (or sent to OpenAI again).
+    """
+    result = ImportResult(**previous.result)
+    add_report(
+        import_file,
+        f"Same content as {previous}, imported at "
+        f"{timezone.localtime(previous.finished_at):%d-%m-%Y %H:%M}, so it was not "
+        f'imported again. Use the action "Import again" to import it anyway.'
+        f"\n\n{result.summary()}",
+    )
+    import_file.result = previous.result
+    import_file.status = ImportFile.Status.COMPLETED
+    import_file.progress = 100
+    import_file.completed = True
+    import_file.started_at = import_file.finished_at = timezone.now()
+
+
+def requeue_stale_imports(stale_after):
+    """
+    Put running imports without a sign of life for ``stale_after`` (a
+    timedelta) back in the queue, their worker has stopped. They continue
+    after the last saved row.
+    """
+    return (
+        ImportFile.objects.filter(status=ImportFile.Status.RUNNING)
+        .alias(last_activity=Coalesce("heartbeat_at", "checkpoint_at", "started_at"))
+        .filter(last_activity__lt=timezone.now() - stale_after)
+        .update(status=ImportFile.Status.QUEUED)
+    )
+
+
+@contextmanager
+def heartbeat(import_file, interval):
+    """
+    Update the ``heartbeat_at`` of the import file every ``interval`` seconds,
+    so `requeue_stale_imports` leaves it alone while it is running, also
+    while it waits for OpenAI.
+    """
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                ImportFile.objects.filter(pk=import_file.pk).update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            # The thread has a database connection of its own
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def claim_next_import():
+    """
+    Take the oldest queued import file from the queue, or return None when the
+    queue is empty. Claiming is a conditional update, so when several workers
+    run, every import file is handled by only one of them.
+    """
+    queued = ImportFile.objects.filter(status=ImportFile.Status.QUEUED).order_by(
+        "uploaded_date", "pk"
+    )
+    for pk in queued.values_list("pk", flat=True)[:10]:
+        started_at = timezone.now()
+        claimed = ImportFile.objects.filter(
+            pk=pk, status=ImportFile.Status.QUEUED
+        ).update(status=ImportFile.Status.RUNNING, progress=0, started_at=started_at)
+        if claimed:
+            return ImportFile.objects.select_related("user").get(pk=pk)
+    return None
+
+
+def add_report(import_file, report):
+    if report and (not import_file.notes or report not in import_file.notes):
+        import_file.notes = (
+            f"{import_file.notes.rstrip()}\n\n{report}" if import_file.notes else report
+        )
+
+
+def run_import(import_file, chunk_size=None, heartbeat_interval=60):
+    """
+    Import the birds of a claimed import file and store the outcome. An
+    import that was interrupted continues after its last saved row, without
+    reading its breeding cards with OpenAI again.
+    """
+    start_row = import_file.imported_rows
+    resumed = f"Resumed after row {start_row}." if start_row else ""
+    notes = import_file.notes
+
+    def update_progress(handled, total):
+        percentage = handled * 100 // total if total else 0
+        if percentage != import_file.progress:
+            import_file.progress = percentage
+            ImportFile.objects.filter(pk=import_file.pk).update(progress=percentage)
+
+    def save_checkpoint(row_number, result):
+        # The report so far stays visible when the import is interrupted
+        import_file.notes = notes
+        add_report(
+            import_file,
+            " ".join(
+                part
+                for part in (
+                    resumed,
+                    f"Saved up to row {row_number}.",
+                    result.summary(),
+                )
+                if part
+            ),
+        )
+        import_file.imported_rows = row_number
+        import_file.checkpoint_at = timezone.now()
+        import_file.save(update_fields=["imported_rows", "checkpoint_at", "notes"])
+
+    def save_card_rows(card_rows):
+        import_file.card_rows = card_rows
+        import_file.save(update_fields=["card_rows"])
+
+    try:
+        with heartbeat(import_file, heartbeat_interval):
+            result = budgie_import.services.import_from_file.import_from_file(
+                import_file.import_file.path,
+                import_file.user,
+                progress=update_progress,
+                chunk_size=chunk_size,
+                start_row=start_row,
+                checkpoint=save_checkpoint,
+                card_rows=import_file.card_rows,
+                save_card_rows=save_card_rows,
+            )
+    except Exception as error:
+        add_report(import_file, f"Import failed: {error}")
+        import_file.status = ImportFile.Status.FAILED
+    else:
+        import_file.notes = notes
+        summary = (
+            result.summary()
+            if hasattr(result, "summary")
+            else "Import completed successfully."
+        )
+        diagnostics = (
+            result.diagnostics_text() if hasattr(result, "diagnostics_text") else ""
+        )
+        add_report(
+            import_file,
+            "\n\n".join(part for part in (resumed, summary, diagnostics) if part),
+        )
+        import_file.status = ImportFile.Status.COMPLETED
+        import_file.progress = 100
+        import_file.completed = True
+        if is_dataclass(result) and not start_row:
+            # Only a complete result can be reused for the same content
+            import_file.result = asdict(result)
+
+    import_file.finished_at = timezone.now()
+    import_file.save(
+        update_fields=[
+            "status",
+            "progress",
+            "completed",
+            "finished_at",
+            "notes",
+            "result",
+        ]
+    )
+    return import_file
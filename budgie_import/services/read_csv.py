@@ -1,19 +1,19 @@
 import csv
+import os
 
 
-def read_csv(file_path, **args):
-    # if "header" in args:
-    #     has_header = args["header"]
-    # else:
-    #     has_header = False
+def read_csv(file_path, progress=None, **args):
+    """
+    Yield the rows of the CSV file one by one, as a mapping of the lowercased
+    header to the value. ``progress`` is called with the number of bytes read
+    and the size of the file.
+    """
+    size = os.path.getsize(file_path)
 
-    rows = []
-
-    # opening the CSV file
     with open(file_path, mode="r") as file:
         reader = csv.reader(file)
-        headers = next(reader)
+        headers = [key.lower() for key in next(reader)]
         for row in reader:
-            rows.append({key.lower(): value for key, value in zip(headers, row)})
-
-    return rows
+            yield dict(zip(headers, row))
+            if progress:
+                progress(file.buffer.tell(), size)
@@ -1,22 +1,37 @@
 """OpenAI-powered image import for the fixed-layout breeding card."""
 
-import base64
 import io
 import json
+import os
 import re
+import shutil
 import ssl
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from tempfile import TemporaryDirectory
+from http.client import HTTPSConnection, RemoteDisconnected
 from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
 from urllib.request import Request, urlopen
 
 import certifi
 from django.conf import settings
-from PIL import Image, ImageOps
 
 from budgie_bird.utils import format_ringnumber
+from budgie_import.services.ai_response_cache import (
+    cache_response,
+    get_cached_response,
+    response_cache_key,
+)
+from budgie_import.services.card_photos import card_data_uri, image_to_data_uri
 
 SUPPORTED_IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg"]
+# Raise this when the prompt changes, so cached responses aren't used anymore
+PROMPT_VERSION = 1
 _OPENAI_ERROR_TEXT_LIMIT = 1200
 _JSON_TEXT_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL | re.IGNORECASE)
 
@@ -80,20 +95,13 @@ def _parse_gender(value):
     return None
 
 
-def _image_to_data_uri(image_path):
-    with Image.open(image_path) as image:
-        image = ImageOps.exif_transpose(image)
-        if image.mode not in ("RGB", "L"):
-            image = image.convert("RGB")
-        elif image.mode == "L":
-            image = image.convert("RGB")
+def _image_to_data_uri(image_path, max_dimension=None, max_bytes=None):
+    """`image_to_data_uri`, by default with the sizes of the settings"""
+    if max_dimension is None:
         max_dimension = int(settings.OPENAI_IMAGE_MAX_DIMENSION or 2000)
-        if max_dimension > 0:
-            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-        buf = io.BytesIO()
-        image.save(buf, format="JPEG", quality=92)
-    encoded = base64.b64encode(buf.getvalue()).decode("ascii")
-    return f"data:image/jpeg;base64,{encoded}"
+    if max_bytes is None:
+        max_bytes = int(settings.OPENAI_IMAGE_MAX_BYTES or 0)
+    return image_to_data_uri(image_path, max_dimension, max_bytes)
 
 
 def _openai_http_error_detail(error, api_key):
@@ -145,14 +153,16 @@ def _extract_json_text(content):
         ) from error
 
 
-def _openai_chat_completion(image_path, model):
+def _openai_api_key():
     api_key = getattr(settings, "OPENAI_API_KEY", "")
     if not api_key:
         raise OpenAIImportError("OpenAI import requires OPENAI_API_KEY.")
+    return api_key
+
 
-    data_uri = _image_to_data_uri(image_path)
-    payload = {
-        "model": model or settings.OPENAI_IMAGE_MODEL,
+def _openai_payload(data_uri, model):
+    return {
+        "model": model,
         "temperature": 0,
         "response_format": {"type": "json_object"},
         "messages": [
@@ -195,25 +205,63 @@ def _openai_chat_completion(image_path, model):
             },
         ],
     }
+
+
+def _openai_chat_completion(image_path, model):
+    _openai_api_key()
+    return _openai_data_uri_completion(_image_to_data_uri(image_path), model)
+
+
+def _openai_data_uri_completion(data_uri, model, connection=None):
+    """
+    The OpenAI response for an image that is converted with `_image_to_data_uri`.
+    Without an `OpenAIConnection`, a new connection is used for the request.
+    """
+    api_key = _openai_api_key()
+    model = model or settings.OPENAI_IMAGE_MODEL
+    cache_key = response_cache_key(data_uri, model, PROMPT_VERSION)
+    cached = get_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    body = json.dumps(_openai_payload(data_uri, model)).encode("utf-8")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    if connection is None:
+        result = _urlopen_completion(body, headers, api_key)
+    else:
+        result = connection.post(body, headers, api_key)
+
+    # Only responses that can be read are worth keeping
+    _parse_response_json(result)
+    cache_response(cache_key, result)
+    return result
+
+
+def _http_error(status, detail):
+    suffix = f": {detail}" if detail else ""
+    return OpenAIImportError(
+        f"OpenAI image import request failed with HTTP {status}{suffix}."
+    )
+
+
+def _urlopen_completion(body, headers, api_key):
     request = Request(
         settings.OPENAI_API_ENDPOINT,
-        data=json.dumps(payload).encode("utf-8"),
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
+        data=body,
+        headers=headers,
         method="POST",
     )
     ssl_context = ssl.create_default_context(cafile=certifi.where())
 
     try:
         with urlopen(request, timeout=60, context=ssl_context) as response:
-            result = json.loads(response.read().decode("utf-8"))
+            return json.loads(response.read().decode("utf-8"))
     except HTTPError as error:
-        detail = _openai_http_error_detail(error, api_key)
-        suffix = f": {detail}" if detail else ""
-        raise OpenAIImportError(
-            f"OpenAI image import request failed with HTTP {error.code}{suffix}."
+        raise _http_error(
+            error.code, _openai_http_error_detail(error, api_key)
         ) from error
     except URLError as error:
         raise OpenAIImportError(
@@ -224,7 +272,60 @@ def _openai_chat_completion(image_path, model):
             "OpenAI image import returned an unreadable response."
         ) from error
 
-    return result
+
+class OpenAIConnection:
+    """
+    An HTTPS connection to the OpenAI endpoint that is kept open, so a batch
+    of cards doesn't set up a new (TLS) connection for every request.
+    """
+
+    def __init__(self, timeout=60):
+        endpoint = urlsplit(settings.OPENAI_API_ENDPOINT)
+        self.host = endpoint.netloc
+        self.path = endpoint.path or "/"
+        self.timeout = timeout
+        self.connection = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _request(self, body, headers):
+        if self.connection is None:
+            self.connection = HTTPSConnection(
+                self.host,
+                timeout=self.timeout,
+                context=ssl.create_default_context(cafile=certifi.where()),
+            )
+        self.connection.request("POST", self.path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        return response.status, response.read()
+
+    def post(self, body, headers, api_key):
+        try:
+            try:
+                status, data = self._request(body, headers)
+            except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed the kept-alive connection, try a new one once
+                self.close()
+                status, data = self._request(body, headers)
+        except OSError as error:
+            self.close()
+            raise OpenAIImportError(
+                f"OpenAI image import request failed: {error}"
+            ) from error
+
+        if status >= 400:
+            raise _http_error(
+                status, _openai_http_error_detail(io.BytesIO(data), api_key)
+            )
+        try:
+            return json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as error:
+            raise OpenAIImportError(
+                "OpenAI image import returned an unreadable response."
+            ) from error
 
 
 def _parse_response_json(result):
@@ -306,6 +407,14 @@ def _parse_import_rows(payload, breeder_number):
     return OpenAIImportResult(rows=rows, diagnostics=diagnostics)
 
 
+def _card_result(result, breeder_number, model):
+    payload = _parse_response_json(result)
+    payload["model"] = (result.get("model") if isinstance(result, dict) else None) or (
+        model or settings.OPENAI_IMAGE_MODEL
+    )
+    return _parse_import_rows(payload, breeder_number)
+
+
 def read_image(image_path, breeder_number, model=None, client=None):
     path = validate_image_path(image_path)
     result = (
@@ -313,8 +422,132 @@ def read_image(image_path, breeder_number, model=None, client=None):
         if client
         else _openai_chat_completion(path, model)
     )
-    payload = _parse_response_json(result)
-    payload["model"] = (result.get("model") if isinstance(result, dict) else None) or (
-        model or settings.OPENAI_IMAGE_MODEL
+    return _card_result(result, breeder_number, model)
+
+
+def _extract_cards(archive_path, directory):
+    """Extract the photos in a zip file, other files and folders are skipped"""
+    cards = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            name = PurePosixPath(member.filename)
+            if (
+                member.is_dir()
+                or name.name.startswith(".")
+                or "__MACOSX" in name.parts
+                or name.suffix.lower() not in SUPPORTED_IMAGE_EXTENSIONS
+            ):
+                continue
+            path = Path(directory) / f"{len(cards):04d}{name.suffix.lower()}"
+            with archive.open(member) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target)
+            cards.append((str(name), path))
+    return cards
+
+
+def _map_ahead(pool, function, items, ahead):
+    """
+    The results of ``function`` for every item (a tuple of arguments) in
+    order, like ``pool.map``. Only ``ahead`` items are handed to the pool
+    before their results are taken, so ``items`` is consumed lazily.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(function, *item))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _card_data_uris(paths, ahead):
+    """
+    Decode and resize the photos in parallel, this is where the CPU time goes.
+    The processes only import `card_photos`, so they don't need Django.
+    """
+    max_dimension = int(settings.OPENAI_IMAGE_MAX_DIMENSION or 2000)
+    max_bytes = int(settings.OPENAI_IMAGE_MAX_BYTES or 0)
+    items = ((path, max_dimension, max_bytes) for path in paths)
+    if len(paths) < 2:
+        yield from (card_data_uri(*item) for item in items)
+        return
+    with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        yield from _map_ahead(pool, card_data_uri, items, ahead)
+
+
+def read_card_archive(archive_path, breeder_number, model=None, client=None):
+    """
+    Read all breeding cards in a zip file. At most
+    OPENAI_MAX_CONCURRENT_REQUESTS cards are sent to OpenAI at the same time,
+    every thread keeps its connection open for the next card. The rows of all
+    cards are merged, the diagnostics are kept per card.
+    """
+    local = threading.local()
+    connections = []
+
+    def read_card(name, converted):
+        data_uri, error = converted
+        if error:
+            return name, None, error
+        try:
+            if client:
+                result = client(data_uri, breeder_number, model)
+            else:
+                if not hasattr(local, "connection"):
+                    local.connection = OpenAIConnection()
+                    connections.append(local.connection)
+                result = _openai_data_uri_completion(data_uri, model, local.connection)
+            return name, _card_result(result, breeder_number, model), None
+        except OpenAIImportError as error:
+            return name, None, str(error)
+
+    concurrent_requests = max(1, int(settings.OPENAI_MAX_CONCURRENT_REQUESTS))
+    try:
+        with (
+            TemporaryDirectory() as directory,
+            ThreadPoolExecutor(max_workers=concurrent_requests) as pool,
+        ):
+            cards = _extract_cards(archive_path, directory)
+            if not cards:
+                raise OpenAIImportError(
+                    "The zip file contains no breeding card photos."
+                )
+            # A photo is converted when a thread is about to send it, so only a
+            # few data URIs are in memory at the same time
+            data_uris = _card_data_uris(
+                [path for _name, path in cards], ahead=concurrent_requests
+            )
+            results = list(
+                _map_ahead(
+                    pool,
+                    read_card,
+                    zip((name for name, _path in cards), data_uris),
+                    ahead=concurrent_requests,
+                )
+            )
+    finally:
+        for connection in connections:
+            connection.close()
+
+    errors = [error for _name, _card, error in results if error]
+    if len(errors) == len(results):
+        raise OpenAIImportError(
+            f"None of the {len(results)} breeding cards could be read: {errors[0]}"
+        )
+
+    rows = []
+    diagnostics = []
+    for name, card, error in results:
+        if error:
+            diagnostics.append({"card": name, "error": error})
+        else:
+            rows.extend(card)
+            diagnostics.append({"card": name, **card.diagnostics})
+    return OpenAIImportResult(
+        rows=rows,
+        diagnostics={
+            "parser_source": "openai",
+            "cards": diagnostics,
+            "imported_ring_numbers": [row["ringnummer"] for row in rows],
+        },
     )
-    return _parse_import_rows(payload, breeder_number)
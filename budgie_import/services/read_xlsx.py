@@ -2,60 +2,91 @@ import zipfile
 from xml.etree.ElementTree import iterparse
 
 
+def _read_shared_strings(z):
+    """The shared strings of the workbook, every element is cleared after reading"""
+    strings = []
+    if "xl/sharedStrings.xml" not in z.namelist():
+        return strings
+
+    text = []
+    for e, el in iterparse(z.open("xl/sharedStrings.xml")):
+        if el.tag.endswith("}t"):
+            text.append(el.text or "")
+        elif el.tag.endswith("}si"):
+            # Rich text is split over multiple <t> elements in one <si>
+            strings.append("".join(text))
+            text = []
+            el.clear()
+    return strings
+
+
 # readXlsx("mysheet.xlsx", sheet=1, header=True)
-def read_xlsx(file_path, **args):
+def read_xlsx(file_path, progress=None, **args):
+    """
+    Yield the rows of a worksheet one by one, the parsed rows are cleared so
+    only the current row is kept in memory. ``progress`` is called with the
+    number of bytes read and the (uncompressed) size of the worksheet.
+    """
     has_header = False
     sheet = 1
 
     if "header" in args:
         has_header = args["header"]
 
-    rows = []
+    is_first_row = True
     row = {}
     header = {}
-    z = zipfile.ZipFile(file_path)
-
-    # Get shared strings
-    strings = [
-        el.text
-        for e, el in iterparse(z.open("xl/sharedStrings.xml"))
-        if el.tag.endswith("}t")
-    ]
-    value = ""
-
-    # Open specified worksheet
-    for e, el in iterparse(z.open("xl/worksheets/sheet{}.xml".format(sheet))):
-        # get value or index to shared strings
-        if el.tag.endswith("}v"):  # <v>84</v>
-            value = el.text
-        if el.tag.endswith("}c"):  # <c r="A3" t="s"><v>84</v></c>
-            # If value is a shared string, use value as an index
-            if el.attrib.get("t") == "s":
-                value = strings[int(value)]
-
-            # split the row/col information so that the row leter(s) can be separate
-            letter = el.attrib["r"]  # AZ22
-            while letter[-1].isdigit():
-                letter = letter[:-1]
-
-            # if it is the first row, then create a header hash for the names
-            # that COULD be used
-            if not rows:
-                header[letter] = value
-            else:
-                if value != "":
-                    # if there is a header row, use the first row's names as the row hash index
-                    if has_header and letter in header:
-                        row[header[letter].lower()] = value
-                    else:
-                        row[letter] = value
+    worksheet = "xl/worksheets/sheet{}.xml".format(sheet)
 
-            value = ""
-        if el.tag.endswith("}row"):
-            rows.append(row)
-            row = {}
-    z.close()
+    with zipfile.ZipFile(file_path) as z:
+        # Get shared strings
+        strings = _read_shared_strings(z)
+        size = z.getinfo(worksheet).file_size
+        value = ""
 
-    rows.pop(0)
+        # Open specified worksheet
+        with z.open(worksheet) as sheet_file:
+            sheet_data = None
+            for e, el in iterparse(sheet_file, events=("start", "end")):
+                if e == "start":
+                    if el.tag.endswith("}sheetData"):
+                        sheet_data = el
+                    continue
+
+                # get value or index to shared strings
+                if el.tag.endswith("}v"):  # <v>84</v>
+                    value = el.text
+                if el.tag.endswith("}c"):  # <c r="A3" t="s"><v>84</v></c>
+                    # If value is a shared string, use value as an index
+                    if el.attrib.get("t") == "s":
+                        value = strings[int(value)]
+
+                    # split the row/col information so that the row leter(s) can be separate
+                    letter = el.attrib["r"]  # AZ22
+                    while letter[-1].isdigit():
+                        letter = letter[:-1]
+
+                    # if it is the first row, then create a header hash for the names
+                    # that COULD be used
+                    if is_first_row:
+                        header[letter] = value
+                    else:
+                        if value != "":
+                            # if there is a header row, use the first row's names
+                            # as the row hash index
+                            if has_header and letter in header:
+                                row[header[letter].lower()] = value
+                            else:
+                                row[letter] = value
 
-    return rows
+                    value = ""
+                if el.tag.endswith("}row"):
+                    # The first row only holds the header
+                    if not is_first_row:
+                        yield row
+                        if progress:
+                            progress(sheet_file.tell(), size)
+                    is_first_row = False
+                    row = {}
+                    # Drop the parsed rows, not only their cells
+                    (sheet_data if sheet_data is not None else el).clear()
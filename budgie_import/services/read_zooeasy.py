@@ -1,3 +1,4 @@
+import os
 import xml.etree.ElementTree as ET
 
 
@@ -16,35 +17,54 @@ def _map_gender(raw_value):
     return value
 
 
-def read_zooeasy(file_path):
-    rows = []
-
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-
-    for dier in root.findall("Dier"):
-        item = {}
-        for child in dier:
-            tag = child.tag.lower()
-            value = _clean_text(child.text)
-
-            if tag == "registratienummer":
-                item["ringnummer"] = value
-            elif tag == "geboortedatum":
-                item["geboren"] = value
-            elif tag == "overlijdingsdatum":
-                item["overleden"] = value
-            elif tag == "geslacht":
-                item["geslacht"] = _map_gender(value)
-            elif tag == "registratienummervader":
-                item["vader"] = value
-            elif tag == "registratienummermoeder":
-                item["moeder"] = value
-            elif tag == "kleur":
-                item["kleur"] = value
-            else:
-                item[tag] = value
-
-        rows.append(item)
-
-    return rows
+def _read_dier(dier):
+    item = {}
+    for child in dier:
+        tag = child.tag.lower()
+        value = _clean_text(child.text)
+
+        if tag == "registratienummer":
+            item["ringnummer"] = value
+        elif tag == "geboortedatum":
+            item["geboren"] = value
+        elif tag == "overlijdingsdatum":
+            item["overleden"] = value
+        elif tag == "geslacht":
+            item["geslacht"] = _map_gender(value)
+        elif tag == "registratienummervader":
+            item["vader"] = value
+        elif tag == "registratienummermoeder":
+            item["moeder"] = value
+        elif tag == "kleur":
+            item["kleur"] = value
+        else:
+            item[tag] = value
+    return item
+
+
+def read_zooeasy(file_path, progress=None):
+    """
+    Yield the animals (the ``Dier`` elements) of a ZooEasy export one by one.
+    Every animal is removed from the tree after it is read, so the export
+    never has to fit in memory. ``progress`` is called with the number of
+    bytes read and the size of the file.
+    """
+    size = os.path.getsize(file_path)
+
+    with open(file_path, "rb") as file:
+        depth = 0
+        root = None
+        for event, element in ET.iterparse(file, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+
+            depth -= 1
+            # Only the animals directly below the root element
+            if depth == 1 and element.tag == "Dier":
+                yield _read_dier(element)
+                root.clear()
+                if progress:
+                    progress(file.tell(), size)
@@ -1,11 +1,14 @@
 import datetime
 import glob
 import os
+import zipfile
+from io import StringIO
 
 from django.conf import settings
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 
@@ -94,6 +97,7 @@ class ImportFileAdminTest(TestCase):
 
         response = self.client.post(self.add_file_url, import_form)
         self.assertEqual(response.status_code, 302)
+        call_command("run_import_worker", "--once", stdout=StringIO())
 
         response = self.client.get(self.importfile_overview_url)
         self.assertContains(response, upload_filename)
@@ -147,6 +151,7 @@ class ImportFileAdminTest(TestCase):
 
         response = self.client.post(self.add_file_url, import_form)
         self.assertEqual(response.status_code, 302)
+        call_command("run_import_worker", "--once", stdout=StringIO())
 
         response = self.client.get(self.importfile_overview_url)
         self.assertContains(response, upload_filename)
@@ -198,6 +203,7 @@ class ImportFileAdminTest(TestCase):
 
         response = self.client.post(self.add_file_url, import_form)
         self.assertEqual(response.status_code, 302)
+        call_command("run_import_worker", "--once", stdout=StringIO())
 
         response = self.client.get(self.importfile_overview_url)
         self.assertContains(response, upload_filename)
@@ -233,6 +239,203 @@ class ImportFileAdminTest(TestCase):
         response = self.client.post(change_file, {"completed": True})
         self.assertEqual(302, response.status_code)
 
+    def test_admin_upload_is_imported_in_the_background(self):
+        """The upload is queued, the worker imports it and reports the progress"""
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+
+        upload_filename = "test_test_import_excel_{}.csv".format(
+            datetime.datetime.now().timestamp()
+        )
+        csv_file = open(
+            "{}/../budgie_import/fixtures/test_bird_data.csv".format(settings.BASE_DIR),
+            "rb",
+        ).read()
+        import_form = {
+            "import_file": SimpleUploadedFile(upload_filename, csv_file),
+            "completed": False,
+        }
+
+        response = self.client.post(self.add_file_url, import_form)
+        self.assertEqual(response.status_code, 302)
+
+        import_file = ImportFile.objects.get(import_file__endswith=upload_filename)
+        self.assertEqual(import_file.status, ImportFile.Status.QUEUED)
+        self.assertFalse(Bird.objects.filter(user=self.pybudgie_user).exists())
+
+        # The overview reloads itself while the import is pending
+        response = self.client.get(self.importfile_overview_url)
+        self.assertContains(response, 'http-equiv="refresh"')
+
+        call_command("run_import_worker", "--once", stdout=StringIO())
+
+        import_file.refresh_from_db()
+        self.assertEqual(import_file.status, ImportFile.Status.COMPLETED)
+        self.assertEqual(import_file.progress, 100)
+        self.assertTrue(import_file.completed)
+        self.assertIsNotNone(import_file.started_at)
+        self.assertIsNotNone(import_file.finished_at)
+        self.assertEqual(Bird.objects.filter(user=self.pybudgie_user).count(), 9)
+
+        response = self.client.get(self.importfile_overview_url)
+        self.assertNotContains(response, 'http-equiv="refresh"')
+
+    def test_same_file_is_not_imported_again(self):
+        """An upload with the same content reuses the result of the earlier import"""
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        csv_file = open(
+            "{}/../budgie_import/fixtures/test_bird_data.csv".format(settings.BASE_DIR),
+            "rb",
+        ).read()
+
+        def upload():
+            upload_filename = "test_test_import_excel_{}.csv".format(
+                datetime.datetime.now().timestamp()
+            )
+            self.client.post(
+                self.add_file_url,
+                {"import_file": SimpleUploadedFile(upload_filename, csv_file)},
+            )
+            return ImportFile.objects.get(import_file__endswith=upload_filename)
+
+        first_upload = upload()
+        call_command("run_import_worker", "--once", stdout=StringIO())
+        first_upload.refresh_from_db()
+        self.assertEqual(len(first_upload.content_hash), 64)
+        self.assertEqual(len(first_upload.result["imported_ring_numbers"]), 6)
+
+        second_upload = upload()
+
+        self.assertEqual(second_upload.status, ImportFile.Status.COMPLETED)
+        self.assertEqual(second_upload.content_hash, first_upload.content_hash)
+        self.assertEqual(second_upload.result, first_upload.result)
+        self.assertIn("was not imported again", second_upload.notes)
+        self.assertIn("Imported 6 bird(s):", second_upload.notes)
+
+        # The action imports the file anyway
+        response = self.client.post(
+            self.importfile_overview_url,
+            {"action": "import_again", "_selected_action": [second_upload.pk]},
+        )
+        self.assertEqual(response.status_code, 302)
+        second_upload.refresh_from_db()
+        self.assertEqual(second_upload.status, ImportFile.Status.QUEUED)
+        call_command("run_import_worker", "--once", stdout=StringIO())
+        second_upload.refresh_from_db()
+        self.assertEqual(second_upload.status, ImportFile.Status.COMPLETED)
+
+        # Once its birds are deleted, the file is imported again
+        Bird.objects.filter(user=self.pybudgie_user).delete()
+        third_upload = upload()
+        self.assertEqual(third_upload.status, ImportFile.Status.QUEUED)
+        call_command("run_import_worker", "--once", stdout=StringIO())
+        self.assertEqual(Bird.objects.filter(user=self.pybudgie_user).count(), 9)
+
+    def test_failed_import_is_reported(self):
+        """A broken file fails its own import, not the worker"""
+        import_file = ImportFile.objects.create(
+            user=self.pybudgie_user,
+            import_file=SimpleUploadedFile(
+                "test_test_import_broken_{}.xlsx".format(
+                    datetime.datetime.now().timestamp()
+                ),
+                b"not a spreadsheet",
+            ),
+        )
+
+        call_command("run_import_worker", "--once", stdout=StringIO())
+
+        import_file.refresh_from_db()
+        self.assertEqual(import_file.status, ImportFile.Status.FAILED)
+        self.assertFalse(import_file.completed)
+        self.assertIn("Import failed", import_file.notes)
+
+    def test_only_the_import_again_action_queues_an_import_again(self):
+        """Saving an import doesn't queue it again, a failed one resumes"""
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        running, failed = (
+            ImportFile.objects.create(
+                user=self.pybudgie_user,
+                import_file=SimpleUploadedFile(
+                    "test_test_import_{}_{}.csv".format(
+                        status, datetime.datetime.now().timestamp()
+                    ),
+                    b"Ringnummer\nA-1\n",
+                ),
+                status=status,
+                imported_rows=1,
+            )
+            for status in (ImportFile.Status.RUNNING, ImportFile.Status.FAILED)
+        )
+
+        for import_file in (running, failed):
+            change_url = reverse(
+                "admin:budgie_import_importfile_change", args=[import_file.pk]
+            )
+            response = self.client.post(change_url, {"completed": False})
+            self.assertEqual(response.status_code, 302)
+        running.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(running.status, ImportFile.Status.RUNNING)
+        self.assertEqual(failed.status, ImportFile.Status.FAILED)
+
+        self.client.post(
+            self.importfile_overview_url,
+            {"action": "import_again", "_selected_action": [running.pk, failed.pk]},
+        )
+        running.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(running.status, ImportFile.Status.RUNNING)
+        self.assertEqual(failed.status, ImportFile.Status.QUEUED)
+        self.assertEqual(failed.imported_rows, 1)
+
+    def test_admin_upload_several_cards_at_once(self):
+        """Several photographed cards are uploaded as one zip file"""
+        self.client.login(
+            username=self.user_credentials["username"],
+            password=self.user_credentials["password"],
+        )
+        timestamp = datetime.datetime.now().timestamp()
+
+        response = self.client.post(
+            self.add_file_url,
+            {
+                "import_file": [
+                    SimpleUploadedFile("card-1.jpg", b"first card"),
+                    SimpleUploadedFile("card-2.jpg", b"second card"),
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+        import_file = ImportFile.objects.get()
+        self.addCleanup(import_file.import_file.delete, save=False)
+        self.assertTrue(import_file.import_file.name.endswith(".zip"))
+        with zipfile.ZipFile(import_file.import_file.path) as archive:
+            self.assertEqual(archive.namelist(), ["001-card-1.jpg", "002-card-2.jpg"])
+
+        response = self.client.post(
+            self.add_file_url,
+            {
+                "import_file": [
+                    SimpleUploadedFile("card-1.jpg", b"first card"),
+                    SimpleUploadedFile(
+                        "test_test_import_{}.csv".format(timestamp), b"Ringnummer"
+                    ),
+                ],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "is geen foto")
+
     def test_admin_upload_invalid_extension(self):
         """Test if the extension 'validation' works"""
         self.client.login(
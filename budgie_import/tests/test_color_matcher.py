@@ -0,0 +1,34 @@
+from django.test import SimpleTestCase
+
+from budgie_import.services.color_matcher import ColorMatcher
+
+COLORS = [
+    ("18.001.001", "Lichtgroen"),
+    ("18.004.001", "Hemelsblauw"),
+    ("18.004.004", "Grijs"),
+]
+
+
+class ColorMatcherTest(SimpleTestCase):
+    def test_color_matcher_finds_first_color_and_all_properties(self):
+        """Names that overlap or contain each other are all found"""
+        matcher = ColorMatcher(
+            COLORS,
+            [(1, "Grijsvleugel"), (2, "Grijs"), (3, "Spangle"), (4, "vleugel")],
+        )
+
+        self.assertEqual(
+            matcher.match("Spangle GRIJSVLEUGEL hemelsblauw"),
+            ("18.004.001", [1, 2, 3, 4]),
+        )
+        self.assertEqual(matcher.match("Grijs lichtgroen"), ("18.001.001", [2]))
+        self.assertEqual(matcher.match("Albino"), (None, []))
+
+    def test_color_matcher_remembers_colors(self):
+        """The same color in another case gives the remembered outcome"""
+        matcher = ColorMatcher(COLORS, [(1, "Opaline")])
+
+        first = matcher.match("Opaline Grijs")
+
+        self.assertEqual(first, ("18.004.004", [1]))
+        self.assertIs(matcher.match("opaline grijs"), first)
@@ -5,7 +5,9 @@ from unittest.mock import patch
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import budgie_import.services.import_from_file
@@ -114,3 +116,130 @@ class ImportFileAdminTest(TestCase):
             [row["reason"] for row in result.skipped_rows],
             ["missing ring number", "missing ring number"],
         )
+
+    @patch(
+        "budgie_import.services.import_from_file.budgie_import.services.read_csv.read_csv"
+    )
+    def test_import_query_count_does_not_grow_with_rows(self, read_csv):
+        """The rows are written in bulk, not with queries per row"""
+        ColorProperty.objects.create(
+            user=self.pybudgie_user, color_name="Grijs", rank=1
+        )
+
+        def rows(prefix, count):
+            return [
+                {
+                    "ringnummer": "{}-{}".format(prefix, number),
+                    "vader": "{}-FATHER".format(prefix),
+                    "moeder": "{}-MOTHER".format(prefix),
+                    "kleur": "Grijs",
+                    "kweker": "Velzen, Henk",
+                    "eigenaar": "Velzen, Henk",
+                    "in bezit": "Ja",
+                }
+                for number in range(count)
+            ]
+
+        read_csv.return_value = rows("FEW", 5)
+        with CaptureQueriesContext(connection) as few_rows:
+            budgie_import.services.import_from_file.import_from_file(
+                "birds.csv", self.pybudgie_user
+            )
+        read_csv.return_value = rows("MANY", 50)
+        with CaptureQueriesContext(connection) as many_rows:
+            budgie_import.services.import_from_file.import_from_file(
+                "birds.csv", self.pybudgie_user
+            )
+
+        self.assertEqual(len(few_rows), len(many_rows))
+
+        bird = Bird.objects.get(ring_number="MANY-49")
+        self.assertEqual(bird.father.ring_number, "MANY-FATHER")
+        self.assertEqual(bird.mother.gender, Bird.Gender.FEMALE)
+        self.assertEqual(bird.breeder.breeding_reg_nr, "MANY")
+        self.assertTrue(bird.is_owned)
+        self.assertEqual(bird.color_property_names, "Grijs")
+        self.assertEqual(
+            set(bird.ancestor_links.values_list("ancestor__ring_number", flat=True)),
+            {"MANY-FATHER", "MANY-MOTHER"},
+        )
+
+    @patch("budgie_import.services.import_from_file.IMPORT_BATCH_SIZE", 2)
+    @patch(
+        "budgie_import.services.import_from_file.budgie_import.services.read_csv.read_csv"
+    )
+    def test_import_rows_lazily_in_batches(self, read_csv):
+        """Rows are consumed one by one and saved per batch"""
+        consumed = []
+
+        def rows():
+            for row in [
+                {"ringnummer": "CHICK-1", "vader": "DAD", "moeder": "MUM"},
+                {"ringnummer": "CHICK-2", "vader": "DAD", "moeder": "MUM"},
+                {"ringnummer": "DAD", "geslacht": "man", "vader": "GRANDDAD"},
+                {"ringnummer": "MUM", "geboren": "01-02-2020"},
+                {"ringnummer": "CHICK-1", "geslacht": "pop"},
+            ]:
+                consumed.append(row["ringnummer"])
+                yield row
+
+        read_csv.return_value = rows()
+
+        result = budgie_import.services.import_from_file.import_from_file(
+            "birds.csv", self.pybudgie_user
+        )
+
+        self.assertEqual(len(consumed), 5)
+        self.assertEqual(result.created_ring_numbers, ["CHICK-1", "CHICK-2"])
+        self.assertEqual(result.updated_ring_numbers, ["DAD", "MUM", "CHICK-1"])
+
+        chick = Bird.objects.get(ring_number="CHICK-1")
+        self.assertEqual(chick.gender, Bird.Gender.FEMALE)
+        self.assertEqual(chick.mother.date_of_birth, datetime.date(2020, 2, 1))
+        self.assertEqual(chick.father.gender, Bird.Gender.MALE)
+        self.assertEqual(
+            set(chick.ancestor_links.values_list("ancestor__ring_number", flat=True)),
+            {"DAD", "MUM", "GRANDDAD"},
+        )
+
+    @patch(
+        "budgie_import.services.import_from_file.budgie_import.services.read_csv.read_csv"
+    )
+    def test_import_reports_invalid_dates_as_warnings(self, read_csv):
+        read_csv.return_value = [
+            {"ringnummer": "DATES-1", "geboren": "yesterday", "overleden": "today"},
+        ]
+
+        result = budgie_import.services.import_from_file.import_from_file(
+            "birds.csv", self.pybudgie_user
+        )
+
+        self.assertEqual(len(result.warnings), 2)
+        self.assertTrue(result.warnings[0].startswith("invalid birth date"))
+        self.assertTrue(result.warnings[1].startswith("invalid death date"))
+        self.assertIsNone(Bird.objects.get(ring_number="DATES-1").date_of_death)
+
+    def test_import_or_update_bird_reuses_the_importer(self):
+        """The birds of the user are loaded once for all rows of an import"""
+        importer = budgie_import.services.import_from_file.BirdImporter(
+            self.pybudgie_user
+        )
+
+        with patch.object(
+            budgie_import.services.import_from_file, "BirdImporter"
+        ) as bird_importer:
+            for row in [
+                {"ringnummer": "REUSE-A", "geslacht": "man"},
+                {"ringnummer": "REUSE-B", "vader": "REUSE-A"},
+            ]:
+                budgie_import.services.import_from_file.import_or_update_bird(
+                    row, self.pybudgie_user, importer
+                )
+
+        bird_importer.assert_not_called()
+        self.assertEqual(
+            Bird.objects.filter(ring_number__startswith="REUSE-").count(), 2
+        )
+        self.assertEqual(
+            Bird.objects.get(ring_number="REUSE-B").father.gender, Bird.Gender.MALE
+        )
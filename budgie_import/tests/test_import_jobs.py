@@ -0,0 +1,164 @@
+import datetime
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from budgie_bird.models import Bird
+from budgie_import.models import ImportFile
+from budgie_import.services.import_from_file import BirdImporter
+from budgie_import.services.import_jobs import (
+    claim_next_import,
+    heartbeat,
+    requeue_stale_imports,
+    run_import,
+)
+from budgie_import.services.read_image_with_ai import OpenAIImportResult
+from budgie_user.models import BudgieUser
+
+
+class ImportJobTest(TestCase):
+    def setUp(self):
+        self.user = BudgieUser.objects.create_user(
+            username="m.scott", breeding_reg_nr="DM-01"
+        )
+        self.import_file = ImportFile.objects.create(
+            user=self.user,
+            import_file=SimpleUploadedFile(
+                "test_test_import_chunks_{}.csv".format(
+                    datetime.datetime.now().timestamp()
+                ),
+                b"Ringnummer,Geslacht\nA-1,Man\nA-2,Pop\nA-3,Man\nA-4,Pop\nA-5,Man\n",
+            ),
+        )
+        self.addCleanup(self.import_file.import_file.delete, save=False)
+
+    def test_interrupted_import_resumes_after_the_checkpoint(self):
+        """Every chunk is committed, a rerun continues after the last one"""
+        import_row = BirdImporter.import_row
+
+        def crash_on_fourth_bird(importer, bird_data):
+            if bird_data["ringnummer"] == "A-4":
+                raise RuntimeError("Worker stopped")
+            return import_row(importer, bird_data)
+
+        with patch.object(BirdImporter, "import_row", crash_on_fourth_bird):
+            run_import(claim_next_import(), chunk_size=2)
+
+        self.import_file.refresh_from_db()
+        self.assertEqual(self.import_file.status, ImportFile.Status.FAILED)
+        self.assertEqual(self.import_file.imported_rows, 2)
+        self.assertIn("Saved up to row 2.", self.import_file.notes)
+        self.assertIn("Import failed: Worker stopped", self.import_file.notes)
+        # The third bird was part of the chunk that was rolled back
+        self.assertEqual(
+            list(Bird.objects.values_list("ring_number", flat=True)), ["A-1", "A-2"]
+        )
+
+        # A worker that stops halfway leaves the import running
+        ImportFile.objects.filter(pk=self.import_file.pk).update(
+            status=ImportFile.Status.RUNNING,
+            checkpoint_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        call_command(
+            "run_import_worker", "--once", "--chunk-size", "2", stdout=StringIO()
+        )
+
+        self.import_file.refresh_from_db()
+        self.assertEqual(self.import_file.status, ImportFile.Status.COMPLETED)
+        self.assertEqual(self.import_file.imported_rows, 5)
+        self.assertIn(
+            "Resumed after row 2.\n\nImported 3 bird(s): A-3, A-4, A-5.",
+            self.import_file.notes,
+        )
+        self.assertEqual(Bird.objects.count(), 5)
+
+    def test_running_import_is_left_alone(self):
+        """Only imports without recent progress are taken over"""
+        ImportFile.objects.filter(pk=self.import_file.pk).update(
+            status=ImportFile.Status.RUNNING, checkpoint_at=timezone.now()
+        )
+
+        call_command("run_import_worker", "--once", stdout=StringIO())
+
+        self.import_file.refresh_from_db()
+        self.assertEqual(self.import_file.status, ImportFile.Status.RUNNING)
+        self.assertFalse(Bird.objects.exists())
+
+    def test_import_with_a_recent_heartbeat_is_left_alone(self):
+        """A worker that waits long for OpenAI still has a recent heartbeat"""
+        an_hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        ImportFile.objects.filter(pk=self.import_file.pk).update(
+            status=ImportFile.Status.RUNNING,
+            started_at=an_hour_ago,
+            checkpoint_at=an_hour_ago,
+            heartbeat_at=timezone.now(),
+        )
+
+        self.assertEqual(requeue_stale_imports(datetime.timedelta(minutes=30)), 0)
+
+    @patch("budgie_import.services.read_image_with_ai.read_image")
+    def test_resumed_card_import_does_not_read_the_card_again(self, read_image):
+        """The rows read from a card are kept, a resume imports those"""
+        read_image.return_value = OpenAIImportResult(
+            rows=[
+                {"ringnummer": "DM-01-001-26", "geslacht": "man"},
+                {"ringnummer": "DM-01-002-26", "geslacht": "pop"},
+            ],
+            diagnostics={"parser_source": "openai"},
+        )
+        card = ImportFile.objects.create(
+            user=self.user,
+            import_file=SimpleUploadedFile("test_test_import_card.jpg", b"photo"),
+        )
+        self.addCleanup(card.import_file.delete, save=False)
+        self.import_file.delete()
+        import_row = BirdImporter.import_row
+
+        def crash_on_second_bird(importer, bird_data):
+            if bird_data["ringnummer"] == "DM-01-002-26":
+                raise RuntimeError("Worker stopped")
+            return import_row(importer, bird_data)
+
+        with patch.object(BirdImporter, "import_row", crash_on_second_bird):
+            run_import(claim_next_import(), chunk_size=1)
+        ImportFile.objects.filter(pk=card.pk).update(status=ImportFile.Status.QUEUED)
+        run_import(claim_next_import(), chunk_size=1)
+
+        card.refresh_from_db()
+        self.assertEqual(card.status, ImportFile.Status.COMPLETED)
+        self.assertEqual(read_image.call_count, 1)
+        self.assertEqual(
+            list(
+                Bird.objects.order_by("ring_number").values_list(
+                    "ring_number", flat=True
+                )
+            ),
+            ["DM-01-001-26", "DM-01-002-26"],
+        )
+
+
+class ImportHeartbeatTest(TransactionTestCase):
+    def test_heartbeat_is_updated_while_running(self):
+        """The heartbeat is saved from another thread, outside the import"""
+        user = BudgieUser.objects.create_user(username="d.schrute")
+        import_file = ImportFile.objects.create(
+            user=user,
+            import_file="test_test_import_heartbeat.csv",
+            status=ImportFile.Status.RUNNING,
+            started_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+
+        with heartbeat(import_file, interval=0.01):
+            deadline = time.monotonic() + 5
+            while not ImportFile.objects.filter(
+                pk=import_file.pk, heartbeat_at__isnull=False
+            ).exists():
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+
+        self.assertEqual(requeue_stale_imports(datetime.timedelta(minutes=30)), 0)
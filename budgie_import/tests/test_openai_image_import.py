@@ -1,23 +1,40 @@
 import io
 import json
 import base64
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from multiprocessing import get_context
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from unittest.mock import Mock, patch
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from io import StringIO
+from unittest.mock import ANY, Mock, patch
 from urllib.error import HTTPError
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase, override_settings
 from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
 
 from budgie_bird.models import Bird
 from budgie_import.admin import ImportFileAdmin
 from budgie_import.models import ImportFile
+from budgie_import.services import ai_response_cache
+from budgie_import.services.ai_response_cache import (
+    cache_response,
+    evict_responses,
+    get_cached_response,
+)
 from budgie_import.services.import_from_file import import_from_file
+from budgie_import.services.import_jobs import claim_next_import, run_import
 from budgie_import.services.read_image_with_ai import (
     OpenAIImportError,
+    _map_ahead,
     _openai_chat_completion,
     _image_to_data_uri,
+    read_card_archive,
     read_image,
     validate_image_path,
 )
@@ -32,6 +49,30 @@ def _write_temp_image(suffix=".jpg"):
     return Path(handle.name)
 
 
+def _image_bytes(color):
+    output = io.BytesIO()
+    Image.new("RGB", (800, 600), color=color).save(output, format="JPEG")
+    return output.getvalue()
+
+
+def _image_to_data_uri_for_test(color):
+    image_path = _write_temp_image()
+    image_path.write_bytes(_image_bytes(color))
+    try:
+        return _image_to_data_uri(image_path)
+    finally:
+        image_path.unlink()
+
+
+def _write_temp_archive(files):
+    handle = NamedTemporaryFile(suffix=".zip", delete=False)
+    with zipfile.ZipFile(handle, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    handle.close()
+    return Path(handle.name)
+
+
 class OpenAIImageImportTest(TestCase):
     def setUp(self):
         self.user = BudgieUser.objects.create_user(
@@ -59,6 +100,59 @@ class OpenAIImageImportTest(TestCase):
             self.assertLessEqual(max(resized.size), 2000)
             self.assertEqual(resized.size, (2000, 1500))
 
+    @override_settings(OPENAI_IMAGE_MAX_DIMENSION=2000, OPENAI_IMAGE_MAX_BYTES=0)
+    def test_image_to_data_uri_decodes_large_jpegs_at_reduced_scale(self):
+        image_path = _write_temp_image()
+        self.addCleanup(image_path.unlink, missing_ok=True)
+        Image.new("RGB", (8000, 6000), color=(200, 200, 200)).save(
+            image_path, format="JPEG"
+        )
+
+        with patch.object(
+            JpegImageFile, "draft", autospec=True, side_effect=JpegImageFile.draft
+        ) as draft:
+            _image_to_data_uri(image_path)
+        draft.assert_called_once_with(ANY, "RGB", (2000, 2000))
+
+        data_uri = _image_to_data_uri(image_path)
+        raw = base64.b64decode(data_uri.split(",", 1)[1])
+        with Image.open(io.BytesIO(raw)) as resized:
+            self.assertEqual(resized.size, (2000, 1500))
+
+    @override_settings(OPENAI_IMAGE_MAX_DIMENSION=2000)
+    def test_image_to_data_uri_keeps_within_the_byte_budget(self):
+        image_path = _write_temp_image(".png")
+        self.addCleanup(image_path.unlink, missing_ok=True)
+        Image.effect_noise((1600, 1200), 100).convert("RGB").save(
+            image_path, format="PNG"
+        )
+
+        with override_settings(OPENAI_IMAGE_MAX_BYTES=0):
+            unlimited = base64.b64decode(
+                _image_to_data_uri(image_path).split(",", 1)[1]
+            )
+        with override_settings(OPENAI_IMAGE_MAX_BYTES=200 * 1024):
+            limited = base64.b64decode(_image_to_data_uri(image_path).split(",", 1)[1])
+
+        self.assertGreater(len(unlimited), 200 * 1024)
+        self.assertLessEqual(len(limited), 200 * 1024)
+        with Image.open(io.BytesIO(limited)) as image:
+            self.assertGreaterEqual(max(image.size), 800)
+
+    def test_benchmark_card_photos_reports_every_photo(self):
+        image_path = _write_temp_image()
+        self.addCleanup(image_path.unlink, missing_ok=True)
+        output = StringIO()
+
+        call_command("benchmark_card_photos", str(image_path), stdout=output)
+
+        self.assertRegex(
+            output.getvalue(),
+            r"{}: [0-9.]+s, peak memory [0-9.]+ MB, data URI [0-9]+ KB".format(
+                re.escape(image_path.name)
+            ),
+        )
+
     def test_parse_openai_image_maps_json_to_import_rows(self):
         image_path = _write_temp_image()
         self.addCleanup(image_path.unlink, missing_ok=True)
@@ -110,6 +204,89 @@ class OpenAIImageImportTest(TestCase):
         with self.assertRaisesMessage(OpenAIImportError, "requires OPENAI_API_KEY"):
             _openai_chat_completion(image_path, "gpt-4.1-mini")
 
+    @override_settings(OPENAI_API_KEY="test-key")
+    @patch("budgie_import.services.read_image_with_ai.urlopen")
+    def test_openai_responses_are_cached(self, urlopen):
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        image_path = _write_temp_image()
+        self.addCleanup(image_path.unlink, missing_ok=True)
+        response = {"choices": [{"message": {"content": '{"card_year": 26}'}}]}
+        urlopen.return_value.__enter__.return_value.read.return_value = json.dumps(
+            response
+        ).encode()
+
+        with self.settings(
+            OPENAI_RESPONSE_CACHE_DIR=cache_dir.name,
+            OPENAI_RESPONSE_CACHE_MAX_SIZE=1024,
+        ):
+            first = _openai_chat_completion(image_path, "gpt-4.1-mini")
+            second = _openai_chat_completion(image_path, "gpt-4.1-mini")
+            self.assertEqual(urlopen.call_count, 1)
+            self.assertEqual(first, response)
+            self.assertEqual(second, response)
+
+            # Another model has its own responses
+            _openai_chat_completion(image_path, "gpt-4.1")
+            self.assertEqual(urlopen.call_count, 2)
+
+            # The least recently used responses are removed when the cache is full
+            evict_responses(0)
+            _openai_chat_completion(image_path, "gpt-4.1-mini")
+            self.assertEqual(urlopen.call_count, 3)
+
+    def test_response_cache_evicts_only_over_the_size_limit(self):
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        response = {"card_year": 26, "notes": "x" * 400}
+
+        with (
+            self.settings(
+                OPENAI_RESPONSE_CACHE_DIR=cache_dir.name,
+                OPENAI_RESPONSE_CACHE_MAX_SIZE=1024,
+            ),
+            patch(
+                "budgie_import.services.ai_response_cache.evict_responses",
+                wraps=evict_responses,
+            ) as evict,
+        ):
+            cache_response("aa01", response)
+            cache_response("aa02", response)
+            self.assertEqual(evict.call_count, 0)
+
+            # The third response doesn't fit, the oldest one makes room for it
+            cache_response("aa03", response)
+            self.assertEqual(evict.call_count, 1)
+            self.assertLessEqual(
+                sum(
+                    path.stat().st_size
+                    for path in Path(cache_dir.name).glob("*/*.json")
+                ),
+                1024,
+            )
+            self.assertEqual(get_cached_response("aa03"), response)
+
+    def test_response_cache_write_error_is_logged(self):
+        cache_dir = TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+
+        with (
+            self.settings(
+                OPENAI_RESPONSE_CACHE_DIR=cache_dir.name,
+                OPENAI_RESPONSE_CACHE_MAX_SIZE=1024,
+            ),
+            patch(
+                "budgie_import.services.ai_response_cache.json.dump",
+                side_effect=OSError("No space left on device"),
+            ),
+            self.assertLogs(ai_response_cache.logger, "WARNING") as logs,
+        ):
+            cache_response("aa01", {"card_year": 26})
+
+        self.assertIn("No space left on device", logs.output[0])
+        # The temporary file is removed again
+        self.assertEqual(list(Path(cache_dir.name).glob("*/*")), [])
+
     @override_settings(OPENAI_API_KEY="test-key")
     @patch("budgie_import.services.read_image_with_ai.urlopen")
     def test_openai_http_error_includes_details(self, urlopen):
@@ -138,6 +315,92 @@ class OpenAIImageImportTest(TestCase):
         self.assertIn("insufficient_quota", str(raised.exception))
         self.assertNotIn("test-key", str(raised.exception))
 
+    def test_card_archive_merges_the_rows_of_all_cards(self):
+        archive_path = _write_temp_archive(
+            {
+                "season/card-1.jpg": _image_bytes((255, 255, 255)),
+                "season/card-2.jpg": _image_bytes((0, 0, 0)),
+                "__MACOSX/season/._card-1.jpg": b"resource fork",
+                "season/readme.txt": b"not a card",
+            }
+        )
+        self.addCleanup(archive_path.unlink, missing_ok=True)
+        white = _image_to_data_uri_for_test((255, 255, 255))
+
+        def client(data_uri, breeder_number, model):
+            if data_uri != white:
+                return {"choices": []}
+            content = {
+                "card_year": 26,
+                "parents": {"vader": "ALOG-109-2024"},
+                "rows": [
+                    {"hatched": "6/10", "ring_number": "1", "gender": "P"},
+                    {"hatched": "7/10", "ring_number": "2", "gender": "M"},
+                ],
+            }
+            return {"choices": [{"message": {"content": json.dumps(content)}}]}
+
+        result = read_card_archive(archive_path, "PROFILE-001", client=client)
+
+        self.assertEqual(
+            [row["ringnummer"] for row in result],
+            ["PROFILE-001-001-2026", "PROFILE-001-002-2026"],
+        )
+        cards = result.diagnostics["cards"]
+        self.assertEqual(
+            [card["card"] for card in cards], ["season/card-1.jpg", "season/card-2.jpg"]
+        )
+        self.assertEqual(cards[0]["card_year"], 2026)
+        self.assertIn("no choices", cards[1]["error"])
+
+    def test_card_archive_photos_can_be_converted_by_spawned_processes(self):
+        archive_path = _write_temp_archive(
+            {
+                "card-1.jpg": _image_bytes((255, 255, 255)),
+                "card-2.jpg": _image_bytes((255, 255, 255)),
+            }
+        )
+        self.addCleanup(archive_path.unlink, missing_ok=True)
+        white = _image_to_data_uri_for_test((255, 255, 255))
+        content = {"card_year": 26, "rows": []}
+        client = Mock(
+            return_value={"choices": [{"message": {"content": json.dumps(content)}}]}
+        )
+
+        with patch(
+            "budgie_import.services.read_image_with_ai.ProcessPoolExecutor",
+            partial(ProcessPoolExecutor, mp_context=get_context("spawn")),
+        ):
+            result = read_card_archive(archive_path, "PROFILE-001", client=client)
+
+        self.assertEqual(len(result.diagnostics["cards"]), 2)
+        self.assertEqual(
+            [call.args[0] for call in client.call_args_list], [white, white]
+        )
+
+    def test_map_ahead_takes_the_items_lazily(self):
+        taken = []
+
+        def items():
+            for number in range(10):
+                taken.append(number)
+                yield (number,)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = _map_ahead(pool, lambda number: number * 2, items(), ahead=2)
+            self.assertEqual(next(results), 0)
+            self.assertEqual(taken, [0, 1])
+            self.assertEqual(list(results), [number * 2 for number in range(1, 10)])
+
+    def test_card_archive_without_readable_cards_fails(self):
+        archive_path = _write_temp_archive({"card.jpg": b"not an image"})
+        self.addCleanup(archive_path.unlink, missing_ok=True)
+
+        with self.assertRaisesMessage(
+            OpenAIImportError, "None of the 1 breeding cards could be read"
+        ):
+            read_card_archive(archive_path, "PROFILE-001", client=Mock())
+
     @patch("budgie_import.services.read_image_with_ai.read_image")
     def test_image_import_uses_existing_bird_import_logic(self, parse_image):
         image_path = _write_temp_image()
@@ -158,9 +421,7 @@ class OpenAIImageImportTest(TestCase):
         self.assertEqual(bird.gender, Bird.Gender.FEMALE)
         self.assertEqual(bird.notes, "C6m HB")
 
-    @patch(
-        "budgie_import.admin.budgie_import.services.import_from_file.import_from_file"
-    )
+    @patch("budgie_import.services.import_from_file.import_from_file")
     def test_admin_report_contains_image_diagnostics(self, import_file):
         import_file.return_value = Mock(
             summary=Mock(return_value="Imported 1 bird(s): PROFILE-001-001-2026."),
@@ -178,6 +439,7 @@ class OpenAIImageImportTest(TestCase):
         ImportFileAdmin(ImportFile, Mock()).save_model(
             request, imported_file, Mock(), False
         )
+        run_import(claim_next_import())
 
         imported_file.refresh_from_db()
         self.assertIn("Image diagnostics", imported_file.notes)
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+from django.test import TestCase
+
+from budgie_import.services.read_xlsx import read_xlsx
+
+
+class ReadXlsxTest(TestCase):
+    def test_read_xlsx_yields_rows_lazily(self):
+        """The rows are read one by one, not all at once"""
+        rows = read_xlsx(
+            Path(__file__).parent.parent / "fixtures" / "test_bird_data.xlsx",
+            header=True,
+        )
+
+        first_row = next(rows)
+        self.assertEqual(first_row["ringnummer"], "5TJJ-81-2018")
+        self.assertEqual(first_row["kleur"], "Grijs")
+        self.assertEqual(len(list(rows)), 19)
@@ -20,7 +20,7 @@ def test_read_zooeasy_maps_known_fields(tmp_path):
     zoo_file = tmp_path / "birds.zoo"
     zoo_file.write_text(xml_content, encoding="utf-8")
 
-    rows = read_zooeasy(zoo_file)
+    rows = list(read_zooeasy(zoo_file))
 
     assert rows == [
         {
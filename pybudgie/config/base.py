@@ -126,6 +126,14 @@ STATIC_URL = "/static/"
 AUTH_USER_MODEL = "budgie_user.BudgieUser"
 BIRD_PICTURE_DEFAULT = "assets/budgie-silhouette.png"
 BIRD_PICTURE_UPLOAD_LOCATION = "assets/uploads/bird_pics"
+# Bird photos of the PDF family trees that are downloaded at the same time
+PDF_PHOTO_FETCH_WORKERS = 8
+# Small versions of those photos are kept here, leave empty to download them every time
+PDF_PHOTO_CACHE_DIR = BASE_DIR.parent / "assets" / "cache" / "pdf-photos"
+# Bytes of those small photos, the least recently used go first, 0 disables the cache
+PDF_PHOTO_CACHE_MAX_SIZE = 50 * 1024 * 1024
+# Processes that draw the pages of a PDF export with several family trees
+PDF_RENDER_PROCESSES = 1
 BIRD_EXCELFILE_UPLOAD_LOCATION = "assets/uploads/import"
 
 # OPEN AI SETTINGS
@@ -133,6 +141,13 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_API_ENDPOINT = "https://api.openai.com/v1/chat/completions"
 OPENAI_IMAGE_MODEL = "gpt-4.1-mini"
 OPENAI_IMAGE_MAX_DIMENSION = 2000
+# Photos are sent with a lower JPEG quality (or smaller) above this size, 0 is no limit
+OPENAI_IMAGE_MAX_BYTES = 1536 * 1024
+# Breeding cards of a zip file that are sent to OpenAI at the same time
+OPENAI_MAX_CONCURRENT_REQUESTS = 4
+# Responses are cached per image, model and prompt, a max size of 0 disables it
+OPENAI_RESPONSE_CACHE_DIR = BASE_DIR.parent / "assets" / "cache" / "openai"
+OPENAI_RESPONSE_CACHE_MAX_SIZE = 50 * 1024 * 1024
 
 LANGUAGE_CODE = "nl"
 TIME_ZONE = "Europe/Amsterdam"
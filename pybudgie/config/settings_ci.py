@@ -1,3 +1,8 @@
+import atexit
+import shutil
+import tempfile
+from pathlib import Path
+
 from pybudgie.config.base import *
 
 DEBUG = True
@@ -5,7 +10,19 @@ SECRET_KEY = "CIciCIciCIciCIciCI"
 ALLOWED_HOSTS = [
     "*",
 ]
-MEDIA_ROOT = "/tmp/"
+# Uploads and the thumbnails made of them go to a temporary directory, which
+# only holds the default photo at the start
+MEDIA_ROOT = tempfile.mkdtemp(prefix="pybudgie-media-")
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+Path(MEDIA_ROOT, BIRD_PICTURE_DEFAULT).parent.mkdir(parents=True)
+shutil.copy(
+    BASE_DIR.parent / BIRD_PICTURE_DEFAULT, Path(MEDIA_ROOT, BIRD_PICTURE_DEFAULT)
+)
+PDF_PHOTO_CACHE_DIR = Path(MEDIA_ROOT, "cache", "pdf-photos")
+# Nothing is cached between requests, tests of the caching turn it on themselves
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+# Tests that use the OpenAI response cache give it a directory of their own
+OPENAI_RESPONSE_CACHE_MAX_SIZE = 0
 #
 # DATABASES = {
 #     "default": {